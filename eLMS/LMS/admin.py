@@ -11,6 +11,7 @@ from .forms import AnswerForm, CustomUserCreationForm, CustomUserChangeForm, Cou
     ReplyForm, QuestionForm, EssayAnswerForm, CourseMembershipForm, StudentAnswerForm
 from .models import User, Category, Course, Module, Post, Reply, Notification, Forum, File, Test, Question, \
     Answer, EssayAnswer, CourseMembership, StudentScore, StudentAnswer, TeacherRegister
+from .notifications import change_unread_counts
 
 
 class CustomUserAdmin(UserAdmin):
@@ -100,6 +101,12 @@ class NotificationAdmin(admin.ModelAdmin):
         # Cho phép sửa thông báo
         return True
 
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        # Sửa trạng thái đã đọc trên adminsite thì cập nhật luôn bộ đếm chưa đọc
+        if change and 'is_read' in form.changed_data:
+            change_unread_counts({obj.user_id: -1 if obj.is_read else 1})
+
     def has_delete_permission(self, request, obj=None):
         # Cho phép xóa thông báo
         return True
@@ -233,17 +240,17 @@ class TeacherRegisterAdmin(admin.ModelAdmin):
     user_email.short_description = 'Email'
 
     def degree_images(self, obj):
-        from cloudinary.utils import cloudinary_url
-
-        front_image_url = cloudinary_url(obj.front_degree_image.public_id)[0] if obj.front_degree_image else ''
-        back_image_url = cloudinary_url(obj.back_degree_image.public_id)[0] if obj.back_degree_image else ''
+        # Link ảnh gốc và ảnh thu nhỏ đã được tính sẵn khi upload
+        front_urls = obj.front_degree_image_urls
+        back_urls = obj.back_degree_image_urls
 
         return format_html(
             '<a href="{}" target="_blank">'
             '<img src="{}" width="100" height="100" style="cursor: pointer;"/></a> '
             '<a href="{}" target="_blank">'
             '<img src="{}" width="100" height="100" style="cursor: pointer;"/></a>',
-            front_image_url, front_image_url, back_image_url, back_image_url
+            front_urls.get('original', ''), front_urls.get('thumbnail', ''),
+            back_urls.get('original', ''), back_urls.get('thumbnail', '')
         )
     degree_images.short_description = 'Degree Images'
 
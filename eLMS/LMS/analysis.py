@@ -0,0 +1,135 @@
+# Phân tích câu hỏi trắc nghiệm (độ khó, độ phân biệt, tỉ lệ chọn từng lựa chọn)
+# eLMS/LMS/analysis.py
+import numpy as np
+from django.core.cache import cache
+
+from .grading import answer_key_version, load_answer_key
+from .models import StudentScore, StudentSelection
+
+ITEM_ANALYSIS_CACHE_TIMEOUT = 24 * 60 * 60
+
+
+def _cache_key(test_id):
+    return f'item_analysis:{test_id}'
+
+
+def invalidate_item_analysis(test_id):
+    """Drop the cached item analysis of a test after a new submission."""
+    cache.delete(_cache_key(test_id))
+
+
+def get_item_analysis(test):
+    """Return the item analysis of a test, cached until the next submission or answer key change."""
+    version = answer_key_version(test.id)
+    cached = cache.get(_cache_key(test.id))
+    if cached is not None and cached[0] == version:
+        return cached[1]
+
+    result = compute_item_analysis(test)
+    cache.set(_cache_key(test.id), (version, result), ITEM_ANALYSIS_CACHE_TIMEOUT)
+    return result
+
+
+def _popcount(values):
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(values).astype(np.int64)
+    # Đếm số bit bật theo kiểu SWAR cho NumPy < 2.0
+    values = values - ((values >> np.uint64(1)) & np.uint64(0x5555555555555555))
+    values = (values & np.uint64(0x3333333333333333)) + ((values >> np.uint64(2)) & np.uint64(0x3333333333333333))
+    values = (values + (values >> np.uint64(4))) & np.uint64(0x0F0F0F0F0F0F0F0F)
+    return ((values * np.uint64(0x0101010101010101)) >> np.uint64(56)).astype(np.int64)
+
+
+def _rounded(value):
+    return None if np.isnan(value) else round(float(value), 4)
+
+
+def compute_item_analysis(test):
+    """Compute difficulty, point-biserial discrimination and choice selection rates for every question."""
+    answer_key = load_answer_key(test.id)
+    question_ids = np.array(answer_key.question_ids, dtype=np.int64)
+
+    scores = StudentScore.objects.filter(test=test).order_by('user_id').values_list('user_id', 'score')
+    user_ids = np.array([user_id for user_id, _ in scores], dtype=np.int64)
+    totals = np.array([float(score) for _, score in scores], dtype=np.float64)
+
+    # Ma trận bitmask: mỗi dòng là 1 lượt làm bài, mỗi cột là 1 câu hỏi
+    masks = np.zeros((len(user_ids), len(question_ids)), dtype=np.uint64)
+    rows = np.array(
+        StudentSelection.objects.filter(question__test=test).values_list('user_id', 'question_id', 'selected_mask'),
+        dtype=np.int64,
+    ).reshape(-1, 3)
+    if len(rows) and len(user_ids) and len(question_ids):
+        row_index = np.minimum(np.searchsorted(user_ids, rows[:, 0]), len(user_ids) - 1)
+        col_index = np.minimum(np.searchsorted(question_ids, rows[:, 1]), len(question_ids) - 1)
+        valid = (user_ids[row_index] == rows[:, 0]) & (question_ids[col_index] == rows[:, 1])
+        masks[row_index[valid], col_index[valid]] = rows[valid, 2].astype(np.uint64)
+
+    max_position = max((position for choices in answer_key.choices.values() for position in choices.values()),
+                       default=-1)
+    correct_masks = np.array([
+        sum(1 << answer_key.choices[question_id][answer_id] for answer_id in answer_key.correct[question_id])
+        for question_id in answer_key.question_ids
+    ], dtype=np.uint64)
+
+    attempts = len(user_ids)
+    if attempts:
+        difficulty, mean_credit, discrimination, selection_rates = _item_statistics(
+            masks, correct_masks, totals, max_position
+        )
+    else:
+        difficulty = mean_credit = discrimination = np.full(len(question_ids), np.nan)
+        selection_rates = np.full((len(question_ids), max_position + 1), np.nan)
+
+    questions = []
+    for index, question_id in enumerate(answer_key.question_ids):
+        questions.append({
+            'question': question_id,
+            'difficulty': _rounded(difficulty[index]),
+            'mean_credit': _rounded(mean_credit[index]),
+            'discrimination': _rounded(discrimination[index]),
+            'choices': [{
+                'answer': answer_id,
+                'is_correct': answer_id in answer_key.correct[question_id],
+                'selection_rate': _rounded(selection_rates[index, position]),
+            } for answer_id, position in answer_key.choices[question_id].items()],
+        })
+
+    return {
+        'test': test.id,
+        'attempts': attempts,
+        'mean_score': _rounded(totals.mean()) if attempts else None,
+        'questions': questions,
+    }
+
+
+def _item_statistics(masks, correct_masks, totals, max_position):
+    attempts = len(totals)
+
+    # Điểm từng câu theo đúng luật chấm: chọn thừa = 0, còn lại theo tỉ lệ đáp án đúng đã chọn
+    correct_counts = _popcount(correct_masks)
+    selected_counts = _popcount(masks)
+    hit_counts = _popcount(masks & correct_masks)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        credit = np.where((selected_counts > correct_counts) | (correct_counts == 0), 0.0,
+                          hit_counts / correct_counts)
+    full_credit = credit == 1.0
+
+    difficulty = full_credit.mean(axis=0)
+    mean_credit = credit.mean(axis=0)
+
+    # Hệ số point-biserial giữa việc làm đúng câu hỏi và tổng điểm, tính cho mọi câu hỏi cùng lúc
+    correct_n = full_credit.sum(axis=0)
+    std = totals.std()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean_correct = (full_credit.T @ totals) / correct_n
+        mean_incorrect = ((~full_credit).T @ totals) / (attempts - correct_n)
+        discrimination = (mean_correct - mean_incorrect) / std * np.sqrt(difficulty * (1 - difficulty))
+    discrimination[(correct_n == 0) | (correct_n == attempts) | (std == 0)] = np.nan
+
+    # Tỉ lệ chọn của từng vị trí lựa chọn, mỗi vòng lặp xử lý 1 bit trên toàn bộ ma trận
+    selection_rates = np.zeros((masks.shape[1], max_position + 1))
+    for position in range(max_position + 1):
+        selection_rates[:, position] = ((masks >> np.uint64(position)) & np.uint64(1)).mean(axis=0)
+
+    return difficulty, mean_credit, discrimination, selection_rates
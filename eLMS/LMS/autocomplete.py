@@ -0,0 +1,200 @@
+# Gợi ý khi gõ (typeahead) từ chỉ mục tiền tố nằm trong bộ nhớ của tiến trình
+# eLMS/LMS/autocomplete.py
+import threading
+import time
+from bisect import bisect_left, insort
+
+from django.core.cache import cache
+from django.db import DatabaseError
+
+from .models import Category, Course
+from .text import normalize_text
+
+COURSE = 'course'
+CATEGORY = 'category'
+
+# Chỉ đánh chỉ mục từ các vị trí này trở đi trong tên (đủ cho gợi ý, tránh tên quá dài làm phình chỉ mục)
+MAX_INDEXED_WORDS = 8
+
+# Mỗi tiến trình tối đa 1 lần/giây hỏi cache xem tiến trình khác có sửa gì không
+SYNC_INTERVAL = 1.0
+CHANGE_TIMEOUT = 24 * 60 * 60
+SEQUENCE_KEY = 'autocomplete:sequence'
+
+
+def _change_key(sequence):
+    return f'autocomplete:change:{sequence}'
+
+
+def _label_keys(kind, item_id, label):
+    # "Lập trình Python" -> "lap trinh python", "trinh python", "python": gõ từ đầu của bất kỳ từ nào cũng khớp
+    words = normalize_text(label).split()
+    return [(' '.join(words[i:]), kind, item_id) for i in range(min(len(words), MAX_INDEXED_WORDS))]
+
+
+class PrefixIndex:
+    """
+    Sorted array of (normalized suffix, kind, id) searched with bisect.
+
+    One instance lives in each worker process; it is built on first use and
+    kept up to date by model signals plus a change log in the shared cache.
+    """
+
+    def __init__(self):
+        self._keys = []
+        self._items = {}  # (kind, id) -> (label, keys)
+        self._lock = threading.RLock()
+        self._built = False
+        self._sequence = 0
+        self._checked_at = 0.0
+
+    def build(self):
+        """Load every course title and category name; the only step that reads the database."""
+        sequence = cache.get(SEQUENCE_KEY, 0)
+        items = {}
+        for course_id, title in Course.objects.values_list('id', 'title').iterator(chunk_size=5000):
+            items[(COURSE, course_id)] = title
+        for category_id, name in Category.objects.values_list('id', 'name'):
+            items[(CATEGORY, category_id)] = name
+
+        entries = {}
+        keys = []
+        for (kind, item_id), label in items.items():
+            item_keys = _label_keys(kind, item_id, label)
+            entries[(kind, item_id)] = (label, item_keys)
+            keys.extend(item_keys)
+        keys.sort()
+
+        with self._lock:
+            self._keys = keys
+            self._items = entries
+            self._sequence = sequence
+            self._checked_at = time.monotonic()
+            self._built = True
+
+    def _remove(self, kind, item_id):
+        entry = self._items.pop((kind, item_id), None)
+        if entry is None:
+            return
+        for key in entry[1]:
+            index = bisect_left(self._keys, key)
+            if index < len(self._keys) and self._keys[index] == key:
+                del self._keys[index]
+
+    def _put(self, kind, item_id, label):
+        self._remove(kind, item_id)
+        item_keys = _label_keys(kind, item_id, label)
+        for key in item_keys:
+            insort(self._keys, key)
+        self._items[(kind, item_id)] = (label, item_keys)
+
+    def update(self, kind, item_id, label):
+        with self._lock:
+            if self._built:
+                self._put(kind, item_id, label)
+
+    def remove(self, kind, item_id):
+        with self._lock:
+            if self._built:
+                self._remove(kind, item_id)
+
+    def sync(self):
+        """Build the index on first use, then replay changes made by other processes."""
+        if not self._built:
+            self.build()
+            return
+        now = time.monotonic()
+        if now - self._checked_at < SYNC_INTERVAL:
+            return
+        self._checked_at = now
+
+        latest = cache.get(SEQUENCE_KEY, 0)
+        if latest == self._sequence:
+            return
+        if latest < self._sequence:
+            # Cache bị xóa nên số thứ tự đếm lại từ đầu
+            self.build()
+            return
+        change_keys = [_change_key(sequence) for sequence in range(self._sequence + 1, latest + 1)]
+        changes = cache.get_many(change_keys)
+        if len(changes) < len(change_keys):
+            # Nhật ký thay đổi đã hết hạn hoặc bị xóa: dựng lại toàn bộ
+            self.build()
+            return
+
+        changed = {COURSE: set(), CATEGORY: set()}
+        for kind, item_id in changes.values():
+            changed[kind].add(item_id)
+        labels = {
+            (COURSE, course_id): title
+            for course_id, title in Course.objects.filter(id__in=changed[COURSE]).values_list('id', 'title')
+        }
+        labels.update({
+            (CATEGORY, category_id): name
+            for category_id, name in Category.objects.filter(id__in=changed[CATEGORY]).values_list('id', 'name')
+        })
+        with self._lock:
+            for kind, item_ids in changed.items():
+                for item_id in item_ids:
+                    if (kind, item_id) in labels:
+                        self._put(kind, item_id, labels[(kind, item_id)])
+                    else:
+                        self._remove(kind, item_id)
+            self._sequence = max(self._sequence, latest)
+
+    def acknowledge(self, sequence):
+        # Thay đổi do chính tiến trình này ghi, đã áp dụng rồi thì không cần đọc lại từ CSDL
+        with self._lock:
+            if sequence == self._sequence + 1:
+                self._sequence = sequence
+
+    def search(self, prefix, limit=10):
+        """Return up to limit courses/categories having a word that starts with the prefix."""
+        prefix = normalize_text(prefix)
+        if not prefix:
+            return []
+        results = []
+        seen = set()
+        with self._lock:
+            index = bisect_left(self._keys, (prefix,))
+            while index < len(self._keys) and len(results) < limit:
+                key, kind, item_id = self._keys[index]
+                if not key.startswith(prefix):
+                    break
+                if (kind, item_id) not in seen:
+                    seen.add((kind, item_id))
+                    results.append({'type': kind, 'id': item_id, 'label': self._items[(kind, item_id)][0]})
+                index += 1
+        return results
+
+
+autocomplete_index = PrefixIndex()
+
+
+def record_change(kind, item_id, label=None):
+    """Apply a change to this process's index and log it so other processes replay it."""
+    if label is None:
+        autocomplete_index.remove(kind, item_id)
+    else:
+        autocomplete_index.update(kind, item_id, label)
+    cache.add(SEQUENCE_KEY, 0, None)
+    try:
+        sequence = cache.incr(SEQUENCE_KEY)
+    except ValueError:
+        return
+    cache.set(_change_key(sequence), (kind, item_id), CHANGE_TIMEOUT)
+    autocomplete_index.acknowledge(sequence)
+
+
+def suggest(prefix, limit=10):
+    autocomplete_index.sync()
+    return autocomplete_index.search(prefix, limit)
+
+
+def warm_up():
+    """Build the index when the worker starts instead of on its first request."""
+    try:
+        autocomplete_index.build()
+    except DatabaseError:
+        # CSDL chưa sẵn sàng (vd. chưa migrate) thì để request đầu tiên dựng
+        pass
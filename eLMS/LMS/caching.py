@@ -0,0 +1,146 @@
+# Cache response của các API danh mục/khóa học công khai
+# eLMS/LMS/caching.py
+import hashlib
+import uuid
+from urllib.parse import urlencode
+
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.response import Response
+
+from .text import normalize_text
+
+CATALOG_CACHE_TIMEOUT = 5 * 60
+
+# Các phạm vi cache, mỗi phạm vi có 1 version; đổi version là bỏ toàn bộ response cũ của phạm vi đó
+CATALOG_LIST = 'list'
+CATALOG_CATEGORIES = 'categories'
+
+STATS_KEYS = {'hits': 'catalog_cache:hits', 'misses': 'catalog_cache:misses'}
+
+
+def course_scope(course_id):
+    return f'course:{course_id}'
+
+
+def dashboard_scope(user_id):
+    return f'dashboard:{user_id}'
+
+
+def _version_key(scope):
+    return f'catalog_version:{scope}'
+
+
+def catalog_version(scope):
+    """Return the current version of a catalog cache scope."""
+    version_key = _version_key(scope)
+    version = cache.get(version_key)
+    if version is None:
+        version = uuid.uuid4().hex
+        if not cache.add(version_key, version, None):
+            version = cache.get(version_key, version)
+    return version
+
+
+def invalidate_catalog(*scopes):
+    """Drop every cached response of the given scopes."""
+    cache.delete_many([_version_key(scope) for scope in scopes])
+
+
+def invalidate_courses(course_ids):
+    """Drop the cached course list and the cached details of the given courses."""
+    invalidate_catalog(CATALOG_LIST, *[course_scope(course_id) for course_id in course_ids])
+
+
+def _viewer(request):
+    # Giáo viên chỉ thấy khóa học của mình nên phải tách cache theo từng giáo viên
+    user = request.user
+    if not user.is_authenticated:
+        return 'anonymous'
+    if user.role == 1:
+        return f'teacher:{user.id}'
+    return 'student'
+
+
+def _normalized_params(request):
+    params = []
+    for name in sorted(request.query_params):
+        values = [value for value in request.query_params.getlist(name) if value != '']
+        if name in ('q', 'letter'):
+            values = [normalize_text(value) for value in values]
+        params.extend((name, value) for value in sorted(values))
+    return urlencode(params)
+
+
+def _count(name):
+    key = STATS_KEYS[name]
+    cache.add(key, 0, None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Bộ đếm vừa bị xóa khỏi cache
+        cache.set(key, 1, None)
+
+
+def _cache_key(scope, key_source):
+    return f'catalog:{scope}:{catalog_version(scope)}:{hashlib.sha1(key_source.encode()).hexdigest()}'
+
+
+def cached_response(scope, request, build):
+    """Return the cached response of a catalog request, calling build() and caching its data on a miss."""
+    key_source = '|'.join([request.get_host(), request.path, _viewer(request), _normalized_params(request)])
+    cache_key = _cache_key(scope, key_source)
+
+    data = cache.get(cache_key)
+    if data is not None:
+        _count('hits')
+        return Response(data)
+
+    _count('misses')
+    response = build()
+    if response.status_code == status.HTTP_200_OK:
+        cache.set(cache_key, response.data, CATALOG_CACHE_TIMEOUT)
+    return response
+
+
+def cached_facets(request, build):
+    """Return the facet counts of the current ?q= filter, shared by every page and sort order of that query."""
+    key_source = '|'.join([
+        'facets', request.query_params.get('facets', ''), _viewer(request),
+        normalize_text(request.query_params.get('q', '')),
+    ])
+    cache_key = _cache_key(CATALOG_LIST, key_source)
+    facets = cache.get(cache_key)
+    if facets is None:
+        facets = build()
+        cache.set(cache_key, facets, CATALOG_CACHE_TIMEOUT)
+    return facets
+
+
+def cached_dashboard(request, build):
+    """Return the cached dashboard of the current user, calling build() on a miss."""
+    scope = dashboard_scope(request.user.id)
+    cache_key = _cache_key(scope, str(request.user.id))
+    data = cache.get(cache_key)
+    if data is None:
+        data = build()
+        cache.set(cache_key, data, CATALOG_CACHE_TIMEOUT)
+    return Response(data)
+
+
+def catalog_cache_stats():
+    """Return the hit/miss counters of the catalog cache."""
+    counts = cache.get_many(list(STATS_KEYS.values()))
+    hits = counts.get(STATS_KEYS['hits'], 0)
+    misses = counts.get(STATS_KEYS['misses'], 0)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': round(hits / total, 4) if total else None,
+        'timeout': CATALOG_CACHE_TIMEOUT,
+    }
+
+
+def reset_catalog_cache_stats():
+    cache.delete_many(list(STATS_KEYS.values()))
@@ -0,0 +1,85 @@
+# Cập nhật bảng CourseCard (read model cho danh sách khóa học)
+# eLMS/LMS/cards.py
+from django.db import connection
+from django.db.models import Count, OuterRef, Prefetch, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Category, Course, CourseCard, CourseMembership
+
+CARD_FIELDS = [
+    'title', 'description', 'cover_image_url', 'created_at', 'is_active', 'author', 'author_email',
+    'author_first_name', 'author_last_name', 'author_gender', 'author_date_of_birth', 'author_avatar_url',
+    'category_ids', 'category_names', 'enrollment_count',
+]
+
+
+def _card_courses():
+    return Course.objects.select_related('author').prefetch_related(
+        Prefetch('categories', queryset=Category.objects.only('id', 'name').order_by('id'))
+    ).annotate(
+        active_members=Count('course_memberships', filter=Q(course_memberships__is_active=True))
+    )
+
+
+def build_card(course):
+    """Build the CourseCard of a course loaded by _card_courses()."""
+    author = course.author
+    categories = list(course.categories.all())
+    return CourseCard(
+        course_id=course.id,
+        title=course.title,
+        description=course.description,
+        cover_image_url=course.get_cover_image_url() or '',
+        created_at=course.created_at,
+        is_active=course.is_active,
+        author=author,
+        author_email=author.email if author else '',
+        author_first_name=author.first_name if author else '',
+        author_last_name=author.last_name if author else '',
+        author_gender=author.gender if author else None,
+        author_date_of_birth=author.date_of_birth if author else None,
+        author_avatar_url=(author.get_avatar_url() or '') if author else '',
+        category_ids=[category.id for category in categories],
+        category_names=[category.name for category in categories],
+        enrollment_count=course.active_members,
+    )
+
+
+def save_cards(cards):
+    # MySQL dùng ON DUPLICATE KEY UPDATE nên không nhận unique_fields
+    unique_fields = ['course'] if connection.features.supports_update_conflicts_with_target else None
+    CourseCard.objects.bulk_create(cards, batch_size=500, update_conflicts=True, unique_fields=unique_fields,
+                                   update_fields=CARD_FIELDS)
+
+
+def refresh_course_cards(course_ids):
+    """Rebuild the cards of the given courses in three queries."""
+    course_ids = list(course_ids)
+    if course_ids:
+        save_cards([build_card(course) for course in _card_courses().filter(id__in=course_ids)])
+
+
+def refresh_course_card(course_id):
+    refresh_course_cards([course_id])
+
+
+def refresh_enrollment_count(course_id):
+    """Recount the active members of a course directly into its card."""
+    active_members = CourseMembership.objects.filter(course=OuterRef('course'), is_active=True) \
+        .values('course').annotate(total=Count('id')).values('total')
+    CourseCard.objects.filter(course_id=course_id).update(enrollment_count=Coalesce(Subquery(active_members), 0))
+
+
+def rebuild_course_cards(chunk_size=500):
+    """Rebuild every card and drop cards left over from deleted courses; returns the number of cards."""
+    count = 0
+    cards = []
+    for course in _card_courses().order_by('id').iterator(chunk_size=chunk_size):
+        cards.append(build_card(course))
+        count += 1
+        if len(cards) >= chunk_size:
+            save_cards(cards)
+            cards = []
+    save_cards(cards)
+    CourseCard.objects.exclude(course__in=Course.objects.values('id')).delete()
+    return count
@@ -0,0 +1,77 @@
+# Trang tổng quan của học viên: các khóa đang học, tiến độ, bài Test tiếp theo, hoạt động forum chưa đọc
+# eLMS/LMS/dashboard.py
+from django.db.models import F, Func, IntegerField, JSONField, OuterRef, Subquery
+from django.db.models.functions import Coalesce, JSONObject
+
+from .caching import dashboard_scope, invalidate_catalog
+from .models import CourseCard, CourseMembership, Post, Reply, StudentScore, Test
+from .serializers import CourseCardSerializer, CourseMembershipSerializer
+
+
+def _count(queryset):
+    # COUNT viết bằng Func (không phải aggregate) nên Django không thêm GROUP BY: subquery luôn trả về đúng 1 dòng
+    return Coalesce(Subquery(
+        queryset.order_by().annotate(count=Func(F('pk'), function='COUNT')).values('count'),
+        output_field=IntegerField(),
+    ), 0)
+
+
+def dashboard_memberships(user):
+    """
+    Return the active memberships of a user with everything the dashboard shows, in a single query.
+
+    Each membership has its course card (course.card) and the annotations
+    next_test (dict or None), unread_posts and unread_replies.
+    """
+    scored_tests = StudentScore.objects.filter(user=user).values('test_id')
+    next_test = Test.objects.filter(
+        module__course=OuterRef('course_id'),
+    ).exclude(id__in=scored_tests).order_by('module__created_at', 'created_at', 'id').values(
+        data=JSONObject(id='id', name='name', module_id='module_id', test_type='test_type'),
+    )[:1]
+
+    # Bài viết/trả lời của người khác đăng sau lần cuối học viên xem forum
+    unread_posts = Post.objects.filter(
+        forum__course=OuterRef('course_id'), created_at__gt=OuterRef('forum_read_at'),
+    ).exclude(user=user)
+    unread_replies = Reply.objects.filter(
+        question__forum__course=OuterRef('course_id'), created_at__gt=OuterRef('forum_read_at'),
+    ).exclude(user=user)
+
+    return CourseMembership.objects.filter(
+        user=user, is_active=True, course__card__isnull=False,
+    ).select_related('course__card').only(
+        'id', 'user_id', 'course_id', 'attend_date', 'finish_date', 'progress', 'is_active', 'forum_read_at',
+        'course__id', *[f'course__card__{field.name}' for field in CourseCard._meta.concrete_fields],
+    ).annotate(
+        next_test=Subquery(next_test, output_field=JSONField()),
+        unread_posts=_count(unread_posts),
+        unread_replies=_count(unread_replies),
+    ).order_by('-attend_date', '-id')
+
+
+def build_dashboard(user):
+    courses = []
+    for membership in dashboard_memberships(user):
+        data = CourseCardSerializer(membership.course.card).data
+        progress = CourseMembershipSerializer(membership).data
+        data.update({
+            'attend_date': progress['attend_date'],
+            'progress': progress['progress'],
+            'finish_date': progress['finish_date'],
+            'next_test': membership.next_test,
+            'unread_forum_activity': membership.unread_posts + membership.unread_replies,
+        })
+        courses.append(data)
+    return {'courses': courses}
+
+
+def invalidate_dashboards(user_ids):
+    invalidate_catalog(*[dashboard_scope(user_id) for user_id in user_ids])
+
+
+def invalidate_course_dashboards(course_id):
+    """Drop the cached dashboards of every active member of a course (course_id may be a subquery)."""
+    invalidate_dashboards(
+        CourseMembership.objects.filter(course_id=course_id, is_active=True).values_list('user_id', flat=True)
+    )
@@ -0,0 +1,125 @@
+# Sparse fieldsets: ?fields=id,title chỉ trả về (và chỉ đọc từ CSDL) các trường được yêu cầu
+# eLMS/LMS/fieldsets.py
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+
+FIELDS_PARAM = 'fields'
+EXPAND_PARAM = 'expand'
+
+
+def query_list(request, name):
+    """Return the comma separated names of a query parameter as a set, or None when it is missing or empty."""
+    value = request.query_params.get(name, '')
+    names = {part.strip() for part in value.split(',') if part.strip()}
+    return names or None
+
+
+class SparseFieldsetMixin:
+    """
+    Serializer mixin for ?fields=id,title and ?expand=author on GET requests.
+
+    ?fields= keeps only the listed fields, and nested serializers among them are
+    rendered as primary keys unless they are also listed in ?expand=. Without
+    ?fields= the output is unchanged.
+
+    Meta.field_sources maps SerializerMethodFields to the model columns they
+    read, so sparse_queryset() can still trim the query when they are requested.
+    """
+
+    def _is_root(self):
+        parent = self.parent
+        return parent is None or (isinstance(parent, serializers.ListSerializer) and parent.parent is None)
+
+    def get_fields(self):
+        fields = super().get_fields()
+        request = self.context.get('request')
+        if request is None or request.method not in SAFE_METHODS or not self._is_root():
+            return fields
+        requested = query_list(request, FIELDS_PARAM)
+        if requested is None:
+            return fields
+
+        expand = query_list(request, EXPAND_PARAM) or set()
+        sparse = {}
+        for name, field in fields.items():
+            if name not in requested:
+                continue
+            if isinstance(field, serializers.BaseSerializer) and name not in expand:
+                # Quan hệ lồng nhau không được expand thì chỉ trả về khóa chính
+                field = serializers.PrimaryKeyRelatedField(
+                    read_only=True, source=field.source, many=isinstance(field, serializers.ListSerializer)
+                )
+            sparse[name] = field
+        return sparse
+
+
+def serializer_columns(serializer, model):
+    """Return the names of the model columns read by the serializer, or None when some field can't be mapped."""
+    field_sources = getattr(getattr(serializer, 'Meta', None), 'field_sources', {})
+    columns = set()
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        if name in field_sources:
+            columns.update(field_sources[name])
+            continue
+        source = (field.source or name).split('.')[0]
+        if source == 'pk':
+            continue
+        if source == '*':
+            return None
+        try:
+            model_field = model._meta.get_field(source)
+        except FieldDoesNotExist:
+            # Property/method của model: không biết nó đọc cột nào
+            return None
+        # Quan hệ nhiều - nhiều/ngược được prefetch, không phải cột của bảng
+        if model_field.concrete:
+            columns.add(model_field.name)
+    return columns
+
+
+def _select_related_lookups(related, prefix=''):
+    for name, nested in related.items():
+        if nested:
+            yield from _select_related_lookups(nested, f'{prefix}{name}__')
+        else:
+            yield f'{prefix}{name}'
+
+
+def sparse_queryset(queryset, serializer):
+    """
+    Load only the columns the serializer reads (plus the ordering columns), so large
+    text columns that weren't requested are never fetched.
+    """
+    model = queryset.model
+    columns = serializer_columns(serializer, model)
+    if columns is None:
+        return queryset
+
+    concrete = {field.name for field in model._meta.concrete_fields}
+    for ordering in queryset.query.order_by or model._meta.ordering:
+        if isinstance(ordering, str) and ordering.lstrip('-') in concrete:
+            columns.add(ordering.lstrip('-'))
+    if concrete <= columns:
+        return queryset
+
+    # Không được select_related qua một khóa ngoại đã bị defer
+    related = queryset.query.select_related
+    if isinstance(related, dict):
+        lookups = list(_select_related_lookups(related))
+        kept = [lookup for lookup in lookups if lookup.split('__')[0] in columns]
+        if kept != lookups:
+            queryset = queryset.select_related(None).select_related(*kept) if kept else queryset.select_related(None)
+    return queryset.only(*columns)
+
+
+class SparseQuerysetMixin:
+    """Viewset mixin: on GET, trim the queryset to the columns of the (sparse) serializer."""
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.request.method in SAFE_METHODS:
+            queryset = sparse_queryset(queryset, self.get_serializer())
+        return queryset
@@ -0,0 +1,188 @@
+# Chấm điểm bài trắc nghiệm
+# eLMS/LMS/grading.py
+import threading
+import uuid
+from collections import OrderedDict, defaultdict, namedtuple
+
+from django.core.cache import cache
+from django.db import connection, transaction
+
+from .models import Question, StudentScore, StudentSelection
+
+# Đáp án của một bài Test: danh sách id câu hỏi, vị trí (bit) của từng lựa chọn và tập id đáp án đúng của từng câu
+AnswerKey = namedtuple('AnswerKey', ['question_ids', 'choices', 'correct'])
+
+# Cache đáp án: LRU trong tiến trình, phía sau là cache của Django để các worker dùng chung
+ANSWER_KEY_CACHE_SIZE = 256
+ANSWER_KEY_CACHE_TIMEOUT = 60 * 60
+
+_answer_keys = OrderedDict()  # test_id -> (version, AnswerKey)
+_answer_keys_lock = threading.Lock()
+
+
+def _answer_key_version_key(test_id):
+    return f'answer_key_version:{test_id}'
+
+
+def answer_key_version(test_id):
+    """Return the current version of a test's answer key; it changes whenever the key is invalidated."""
+    version_key = _answer_key_version_key(test_id)
+    version = cache.get(version_key)
+    if version is None:
+        # Version ngẫu nhiên để bản cũ trong LRU không bao giờ trùng sau khi bị xóa khỏi cache
+        version = uuid.uuid4().hex
+        if not cache.add(version_key, version, None):
+            version = cache.get(version_key, version)
+    return version
+
+
+def load_answer_key(test_id):
+    """Return the answer key of a test, served from cache when it has not changed."""
+    version = answer_key_version(test_id)
+
+    with _answer_keys_lock:
+        entry = _answer_keys.get(test_id)
+        if entry is not None and entry[0] == version:
+            _answer_keys.move_to_end(test_id)
+            return entry[1]
+
+    cache_key = f'answer_key:{test_id}:{version}'
+    answer_key = cache.get(cache_key)
+    if answer_key is None:
+        answer_key = build_answer_key(test_id)
+        cache.set(cache_key, answer_key, ANSWER_KEY_CACHE_TIMEOUT)
+
+    with _answer_keys_lock:
+        _answer_keys[test_id] = (version, answer_key)
+        _answer_keys.move_to_end(test_id)
+        while len(_answer_keys) > ANSWER_KEY_CACHE_SIZE:
+            _answer_keys.popitem(last=False)
+
+    return answer_key
+
+
+def invalidate_answer_key(test_id):
+    """Drop the cached answer key of a test after its questions or answers change."""
+    cache.delete(_answer_key_version_key(test_id))
+    with _answer_keys_lock:
+        _answer_keys.pop(test_id, None)
+
+
+def build_answer_key(test_id):
+    """Load the answer key of a test from the database in a single query."""
+    question_ids = []
+    choices = defaultdict(dict)
+    correct = defaultdict(set)
+    rows = Question.objects.filter(test_id=test_id).order_by('id').values_list(
+        'id', 'answers__id', 'answers__is_correct', 'answers__position'
+    )
+    for question_id, answer_id, is_correct, position in rows:
+        if not question_ids or question_ids[-1] != question_id:
+            question_ids.append(question_id)
+        if answer_id is None:
+            continue
+        choices[question_id][answer_id] = position
+        if is_correct:
+            correct[question_id].add(answer_id)
+
+    return AnswerKey(
+        question_ids=tuple(question_ids),
+        choices={question_id: dict(sorted(choices[question_id].items())) for question_id in question_ids},
+        correct={question_id: frozenset(correct[question_id]) for question_id in question_ids},
+    )
+
+
+def encode_selection(answer_key, question_id, answer_ids):
+    """Pack the selected answer ids of a question into a bitmask of answer positions."""
+    positions = answer_key.choices[question_id]
+    mask = 0
+    for answer_id in answer_ids:
+        mask |= 1 << positions[answer_id]
+    return mask
+
+
+def decode_selection(answer_key, question_id, mask):
+    """Unpack a bitmask of answer positions into the selected answer ids."""
+    return [answer_id for answer_id, position in answer_key.choices.get(question_id, {}).items()
+            if mask >> position & 1]
+
+
+def load_selections(answer_key, user_id, test_id):
+    """Load the answers selected by a student for a test in a single query."""
+    rows = StudentSelection.objects.filter(user_id=user_id, question__test_id=test_id).values_list(
+        'question_id', 'selected_mask'
+    )
+    return {question_id: decode_selection(answer_key, question_id, mask) for question_id, mask in rows}
+
+
+def load_selections_for_users(answer_key, test_id, user_ids):
+    """Load the selections of many students for a test in a single query, keyed by user id."""
+    selections = defaultdict(dict)
+    rows = StudentSelection.objects.filter(user_id__in=user_ids, question__test_id=test_id).values_list(
+        'user_id', 'question_id', 'selected_mask'
+    )
+    for user_id, question_id, mask in rows:
+        selections[user_id][question_id] = decode_selection(answer_key, question_id, mask)
+    return selections
+
+
+def save_selections(user, answer_key, selections):
+    """Upsert one StudentSelection row per question in a single statement."""
+    # MySQL dùng ON DUPLICATE KEY UPDATE nên không nhận unique_fields
+    unique_fields = ['user', 'question'] if connection.features.supports_update_conflicts_with_target else None
+    StudentSelection.objects.bulk_create([
+        StudentSelection(user=user, question_id=question_id,
+                         selected_mask=encode_selection(answer_key, question_id, answer_ids))
+        for question_id, answer_ids in selections.items()
+    ], update_conflicts=True, unique_fields=unique_fields, update_fields=['selected_mask', 'updated_at'])
+
+
+def score_question(correct_answers, selected_answers, total_questions):
+    """Score one question: over-selection gives 0, otherwise partial credit per correct choice."""
+    correct_count = len(correct_answers)
+
+    # Chọn nhiều hơn số đáp án đúng thì câu này được 0 điểm
+    if len(selected_answers) > correct_count:
+        return 0
+
+    if correct_count > 0:
+        selected_correct_count = len(correct_answers.intersection(selected_answers))
+        return (selected_correct_count / correct_count) * (100 / total_questions)
+    return 0
+
+
+def score_selections(answer_key, selections):
+    """Compute the total score (0 - 100) of a set of selections against an answer key."""
+    total_questions = len(answer_key.question_ids)
+    total_score = 0
+
+    for question_id in answer_key.question_ids:
+        total_score += score_question(answer_key.correct[question_id], selections.get(question_id, ()),
+                                      total_questions)
+
+    return total_score
+
+
+def grade_student(user, test):
+    """Recompute and store the score of a student for a test."""
+    answer_key = load_answer_key(test.id)
+    selections = load_selections(answer_key, user.id, test.id)
+    return save_score(user, test, score_selections(answer_key, selections))
+
+
+def record_attempt(user, test, answer_key, selections):
+    """Replace all stored selections of a student for a test and score the attempt once."""
+    with transaction.atomic():
+        StudentSelection.objects.filter(user=user, question__test=test) \
+            .exclude(question_id__in=list(selections)).delete()
+        if selections:
+            save_selections(user, answer_key, selections)
+        return save_score(user, test, score_selections(answer_key, selections))
+
+
+def save_score(user, test, score):
+    """Create or update the StudentScore of a student for a test."""
+    score_record, _ = StudentScore.objects.get_or_create(user=user, test=test)
+    score_record.score = score
+    score_record.save()
+    return score_record
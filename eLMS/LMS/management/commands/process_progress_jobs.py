@@ -0,0 +1,47 @@
+# eLMS/LMS/management/commands/process_progress_jobs.py
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from LMS.models import CourseMembership, ProgressJob
+
+
+class Command(BaseCommand):
+    help = "Recompute course progress for the pending ProgressJob entries."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Process the due jobs once and exit.")
+        parser.add_argument('--interval', type=float, default=1.0, help="Seconds to sleep when the queue is empty.")
+        parser.add_argument('--batch-size', type=int, default=500, help="Maximum number of jobs fetched per round.")
+
+    def handle(self, *args, **options):
+        while True:
+            processed = self.process_due_jobs(options['batch_size'])
+            if processed:
+                self.stdout.write(f"Recomputed progress for {processed} membership(s).")
+            if options['once']:
+                break
+            if not processed:
+                time.sleep(options['interval'])
+
+    def process_due_jobs(self, batch_size):
+        jobs = list(
+            ProgressJob.objects.filter(run_after__lte=timezone.now())
+            .order_by('run_after')
+            .values_list('id', 'user_id', 'course_id')[:batch_size]
+        )
+
+        processed = 0
+        for job_id, user_id, course_id in jobs:
+            # Xóa trước khi tính: điểm thay đổi sau thời điểm này sẽ tạo công việc mới
+            deleted, _ = ProgressJob.objects.filter(id=job_id).delete()
+            if not deleted:
+                continue  # Worker khác đã nhận công việc này
+
+            membership = CourseMembership.objects.filter(user_id=user_id, course_id=course_id).first()
+            if membership is not None:
+                membership.update_progress()
+                processed += 1
+
+        return processed
@@ -0,0 +1,16 @@
+# eLMS/LMS/management/commands/rebuild_course_cards.py
+from django.core.management.base import BaseCommand
+
+from LMS.cards import rebuild_course_cards
+
+
+class Command(BaseCommand):
+    help = "Rebuild the CourseCard read model from Course, its author, categories and memberships."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500,
+                            help="Number of courses loaded and written per batch.")
+
+    def handle(self, *args, **options):
+        count = rebuild_course_cards(chunk_size=options['chunk_size'])
+        self.stdout.write(f"Rebuilt {count} course card(s).")
@@ -0,0 +1,31 @@
+# eLMS/LMS/management/commands/rebuild_progress_counters.py
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from LMS.models import Course, CourseMembership, StudentScore, Test
+
+
+class Command(BaseCommand):
+    help = "Rebuild Course.total_tests and CourseMembership.completed_tests from scratch."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recompute-progress', action='store_true',
+                            help="Also recompute the progress of every membership from the rebuilt counters.")
+
+    def handle(self, *args, **options):
+        total_tests = Test.objects.filter(module__course=OuterRef('pk')).values('module__course') \
+            .annotate(total=Count('id')).values('total')
+        completed_tests = StudentScore.objects.filter(user=OuterRef('user'), test__module__course=OuterRef('course')) \
+            .values('user').annotate(total=Count('id')).values('total')
+
+        with transaction.atomic():
+            courses = Course.objects.update(total_tests=Coalesce(Subquery(total_tests), 0))
+            memberships = CourseMembership.objects.update(completed_tests=Coalesce(Subquery(completed_tests), 0))
+        self.stdout.write(f"Rebuilt counters for {courses} course(s) and {memberships} membership(s).")
+
+        if options['recompute_progress']:
+            for membership in CourseMembership.objects.iterator(chunk_size=1000):
+                membership.update_progress()
+            self.stdout.write("Recomputed progress for all memberships.")
@@ -0,0 +1,16 @@
+# eLMS/LMS/management/commands/rebuild_search_index.py
+from django.core.management.base import BaseCommand
+
+from LMS.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = "Rebuild the course search index (CourseSearchTerm) from scratch."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500,
+                            help="Number of courses loaded per query.")
+
+    def handle(self, *args, **options):
+        count = rebuild_index(chunk_size=options['chunk_size'])
+        self.stdout.write(f"Indexed {count} course(s).")
@@ -0,0 +1,132 @@
+# eLMS/LMS/management/commands/regrade.py
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from LMS.analysis import invalidate_item_analysis
+from LMS.grading import build_answer_key, invalidate_answer_key, load_selections_for_users, score_selections
+from LMS.models import StudentScore, Test
+
+# Đáp án dùng chung trong mỗi process con, được gán 1 lần khi khởi tạo pool
+_worker_answer_key = None
+
+
+def _init_worker(answer_key):
+    global _worker_answer_key
+    _worker_answer_key = answer_key
+
+
+def _score_chunk(chunk):
+    return [(score_id, score_selections(_worker_answer_key, selections)) for score_id, selections in chunk]
+
+
+def _to_decimal(score):
+    return Decimal(str(round(score, 2)))
+
+
+class Command(BaseCommand):
+    help = "Recompute the StudentScore rows of a test or of every multiple-choice test in a course."
+
+    def add_arguments(self, parser):
+        target = parser.add_mutually_exclusive_group(required=True)
+        target.add_argument('--test', type=int, help="Id of the test to regrade.")
+        target.add_argument('--course', type=int, help="Id of the course whose tests are regraded.")
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help="Number of scoring processes (1 scores in this process).")
+        parser.add_argument('--chunk-size', type=int, default=2000, help="Number of students per chunk.")
+
+    def handle(self, *args, **options):
+        if options['test'] is not None:
+            tests = Test.objects.filter(id=options['test'])
+            if not tests.exists():
+                raise CommandError(f"Test {options['test']} does not exist.")
+        else:
+            tests = Test.objects.filter(module__course_id=options['course'])
+        tests = list(tests.filter(test_type=0).order_by('id'))
+        if not tests:
+            raise CommandError("No multiple-choice test to regrade.")
+
+        total_students = total_changed = 0
+        started = time.perf_counter()
+        for test in tests:
+            students, changed, elapsed = self.regrade_test(test, options['workers'], options['chunk_size'])
+            total_students += students
+            total_changed += changed
+            self.stdout.write(f"Test {test.id}: {students} student(s), {changed} changed, "
+                              f"{self.throughput(students, elapsed)} students/sec")
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Regraded {total_students} student(s) in {len(tests)} test(s), {total_changed} score(s) changed, "
+            f"{elapsed:.2f}s, {self.throughput(total_students, elapsed)} students/sec"
+        ))
+
+    def regrade_test(self, test, workers, chunk_size):
+        started = time.perf_counter()
+        # Đọc thẳng từ database để không dùng bản đáp án cũ trong cache
+        invalidate_answer_key(test.id)
+        answer_key = build_answer_key(test.id)
+
+        students = changed = 0
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                       initargs=(answer_key,)) if workers > 1 else None
+        try:
+            pending = []
+            for records in self.stream_chunks(test, chunk_size):
+                selections = load_selections_for_users(answer_key, test.id, [record.user_id for record in records])
+                chunk = [(record.id, selections.get(record.user_id, {})) for record in records]
+                students += len(records)
+
+                if executor is None:
+                    _init_worker(answer_key)
+                    changed += self.save_scores(records, _score_chunk(chunk))
+                    continue
+
+                # Giới hạn số chunk đang xử lý để bộ nhớ không tăng theo số học sinh
+                pending.append((records, executor.submit(_score_chunk, chunk)))
+                while len(pending) > workers * 2:
+                    done_records, future = pending.pop(0)
+                    changed += self.save_scores(done_records, future.result())
+
+            for done_records, future in pending:
+                changed += self.save_scores(done_records, future.result())
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+        if changed:
+            invalidate_item_analysis(test.id)
+
+        return students, changed, time.perf_counter() - started
+
+    def stream_chunks(self, test, chunk_size):
+        records = []
+        queryset = StudentScore.objects.filter(test=test).only('id', 'user_id', 'score').order_by('id')
+        for record in queryset.iterator(chunk_size=chunk_size):
+            records.append(record)
+            if len(records) >= chunk_size:
+                yield records
+                records = []
+        if records:
+            yield records
+
+    def save_scores(self, records, results):
+        scores = dict(results)
+        now = timezone.now()
+        updated = []
+        for record in records:
+            score = _to_decimal(scores[record.id])
+            if record.score != score:
+                record.score = score
+                record.last_modified = now
+                updated.append(record)
+
+        StudentScore.objects.bulk_update(updated, ['score', 'last_modified'], batch_size=1000)
+        return len(updated)
+
+    def throughput(self, students, elapsed):
+        return f"{students / elapsed:.0f}" if elapsed > 0 else "n/a"
@@ -0,0 +1,25 @@
+# eLMS/LMS/management/commands/send_reply_notifications.py
+import time
+
+from django.core.management.base import BaseCommand
+
+from LMS.notifications import send_reply_notifications
+
+
+class Command(BaseCommand):
+    help = "Send the coalesced reply notifications whose window has passed."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Send the due notifications once and exit.")
+        parser.add_argument('--interval', type=float, default=1.0, help="Seconds to sleep when the queue is empty.")
+        parser.add_argument('--batch-size', type=int, default=500, help="Maximum number of jobs sent per round.")
+
+    def handle(self, *args, **options):
+        while True:
+            sent = len(send_reply_notifications(options['batch_size']))
+            if sent:
+                self.stdout.write(f"Sent {sent} reply notification(s).")
+            if options['once']:
+                break
+            if not sent:
+                time.sleep(options['interval'])
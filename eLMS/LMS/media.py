@@ -0,0 +1,53 @@
+# Tính sẵn link ảnh Cloudinary khi upload để không phải dựng link mỗi lần serialize
+# eLMS/LMS/media.py
+from cloudinary import CloudinaryResource
+from cloudinary.utils import cloudinary_url
+
+# Các kích thước chuẩn của từng loại ảnh
+AVATAR_VARIANTS = {
+    'thumbnail': {'width': 150, 'height': 150, 'crop': 'fill', 'gravity': 'face'},
+}
+COVER_IMAGE_VARIANTS = {
+    'card': {'width': 480, 'height': 270, 'crop': 'fill'},
+    'thumbnail': {'width': 160, 'height': 90, 'crop': 'fill'},
+}
+DEGREE_IMAGE_VARIANTS = {
+    'thumbnail': {'width': 100, 'height': 100, 'crop': 'fill'},
+}
+
+
+def build_media_urls(resource, variants, versioned=False):
+    """
+    Build the delivery URLs of a Cloudinary image: 'original' plus one URL per variant.
+
+    versioned=True keeps the version and format in 'original' (CloudinaryResource.url),
+    otherwise it is built from the public id only.
+    """
+    if not resource:
+        return {}
+    public_id = resource.public_id if isinstance(resource, CloudinaryResource) else str(resource)
+    if versioned and isinstance(resource, CloudinaryResource):
+        original = resource.url
+    else:
+        original = cloudinary_url(public_id)[0]
+
+    urls = {'original': original}
+    for name, options in variants.items():
+        urls[name] = cloudinary_url(public_id, **options)[0]
+    return urls
+
+
+def refresh_media_urls(instance, field, urls_field, variants, versioned=False, update_fields=None):
+    """
+    Upload a pending file of a CloudinaryField and store its URLs on the instance, before it is saved.
+
+    Returns update_fields with urls_field added, so the URLs are written in the same UPDATE.
+    """
+    if update_fields is not None:
+        if field not in update_fields:
+            return update_fields
+        update_fields = [*update_fields, urls_field]
+    # Upload ngay để có public id; khi save() giá trị đã là CloudinaryResource nên không bị upload lần nữa
+    instance._meta.get_field(field).pre_save(instance, instance._state.adding)
+    setattr(instance, urls_field, build_media_urls(getattr(instance, field), variants, versioned))
+    return update_fields
@@ -0,0 +1,41 @@
+# Generated by Django 5.0.7 on 2026-10-18 01:58
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_counters(apps, schema_editor):
+    Course = apps.get_model('LMS', 'Course')
+    CourseMembership = apps.get_model('LMS', 'CourseMembership')
+    StudentScore = apps.get_model('LMS', 'StudentScore')
+    Test = apps.get_model('LMS', 'Test')
+
+    total_tests = Test.objects.filter(module__course=OuterRef('pk')).values('module__course') \
+        .annotate(total=Count('id')).values('total')
+    completed_tests = StudentScore.objects.filter(user=OuterRef('user'), test__module__course=OuterRef('course')) \
+        .values('user').annotate(total=Count('id')).values('total')
+
+    Course.objects.update(total_tests=Coalesce(Subquery(total_tests), 0))
+    CourseMembership.objects.update(completed_tests=Coalesce(Subquery(completed_tests), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('LMS', '0026_progressjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='total_tests',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='coursemembership',
+            name='completed_tests',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,75 @@
+# Generated by Django 5.0.7 on 2026-10-18 02:01
+
+import django.db.models.deletion
+from collections import defaultdict
+from django.conf import settings
+from django.db import migrations, models
+
+
+def fill_answer_positions(apps, schema_editor):
+    Answer = apps.get_model('LMS', 'Answer')
+
+    positions = defaultdict(int)
+    updated = []
+    for answer in Answer.objects.order_by('question_id', 'id').only('id', 'question_id').iterator(chunk_size=2000):
+        answer.position = positions[answer.question_id]
+        positions[answer.question_id] += 1
+        updated.append(answer)
+        if len(updated) >= 2000:
+            Answer.objects.bulk_update(updated, ['position'])
+            updated = []
+    Answer.objects.bulk_update(updated, ['position'])
+
+
+def copy_student_answers(apps, schema_editor):
+    StudentAnswer = apps.get_model('LMS', 'StudentAnswer')
+    StudentSelection = apps.get_model('LMS', 'StudentSelection')
+
+    masks = defaultdict(int)
+    rows = StudentAnswer.objects.values_list('user_id', 'question_id', 'selected_answer__position')
+    for user_id, question_id, position in rows.iterator(chunk_size=5000):
+        masks[(user_id, question_id)] |= 1 << position
+
+    StudentSelection.objects.bulk_create([
+        StudentSelection(user_id=user_id, question_id=question_id, selected_mask=mask)
+        for (user_id, question_id), mask in masks.items()
+    ], batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('LMS', '0028_question_answer_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='answer',
+            name='position',
+            field=models.PositiveSmallIntegerField(editable=False, null=True),
+        ),
+        migrations.RunPython(fill_answer_positions, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='answer',
+            name='position',
+            field=models.PositiveSmallIntegerField(editable=False),
+        ),
+        migrations.AlterUniqueTogether(
+            name='answer',
+            unique_together={('question', 'position')},
+        ),
+        migrations.CreateModel(
+            name='StudentSelection',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('selected_mask', models.PositiveBigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='selections', to='LMS.question')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='selections', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('user', 'question')},
+            },
+        ),
+        migrations.RunPython(copy_student_answers, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,79 @@
+# Generated by Django 5.0.7 on 2026-10-18 02:07
+
+import re
+from collections import Counter
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils.html import strip_tags
+
+# Bản sao của LMS.search lúc tạo migration này, để migration không đổi khi code tìm kiếm đổi
+FIELD_WEIGHTS = {
+    'title': 8,
+    'categories': 4,
+    'author': 4,
+    'description': 1,
+}
+MAX_TERM_LENGTH = 64
+TOKEN_RE = re.compile(r'\w+')
+
+
+def tokenize(text):
+    if not text:
+        return []
+    return [token[:MAX_TERM_LENGTH] for token in TOKEN_RE.findall(text.lower())]
+
+
+def document_terms(title, description, category_names, author_names):
+    terms = Counter()
+    fields = (
+        ('title', [title]),
+        ('description', [strip_tags(description or '')]),
+        ('categories', category_names),
+        ('author', author_names),
+    )
+    for field, texts in fields:
+        for text in texts:
+            for token in tokenize(text):
+                terms[token] += FIELD_WEIGHTS[field]
+    return terms
+
+
+def build_search_index(apps, schema_editor):
+    Course = apps.get_model('LMS', 'Course')
+    CourseSearchTerm = apps.get_model('LMS', 'CourseSearchTerm')
+
+    rows = []
+    courses = Course.objects.select_related('author').prefetch_related('categories').order_by('id')
+    for course in courses.iterator(chunk_size=500):
+        author_names = [course.author.first_name, course.author.last_name] if course.author else []
+        terms = document_terms(course.title, course.description,
+                               [category.name for category in course.categories.all()], author_names)
+        rows.extend(CourseSearchTerm(course_id=course.id, term=term, weight=weight) for term, weight in terms.items())
+        if len(rows) >= 5000:
+            CourseSearchTerm.objects.bulk_create(rows, batch_size=1000)
+            rows = []
+    CourseSearchTerm.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('LMS', '0029_studentselection_answer_position'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CourseSearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64)),
+                ('weight', models.PositiveIntegerField(default=0)),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to='LMS.course')),
+            ],
+            options={
+                'unique_together': {('term', 'course')},
+            },
+        ),
+        migrations.RunPython(build_search_index, migrations.RunPython.noop),
+    ]
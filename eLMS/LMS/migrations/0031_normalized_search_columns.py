@@ -0,0 +1,113 @@
+# Generated by Django 5.0.7 on 2026-10-18 02:12
+
+import re
+import unicodedata
+from collections import Counter
+
+from django.db import migrations, models
+from django.utils.html import strip_tags
+
+# Bản sao của LMS.text và LMS.search lúc tạo migration này, để migration không đổi khi code tìm kiếm đổi
+FIELD_WEIGHTS = {
+    'title': 8,
+    'categories': 4,
+    'author': 4,
+    'description': 1,
+}
+MAX_TERM_LENGTH = 64
+TOKEN_RE = re.compile(r'\w+')
+WHITESPACE_RE = re.compile(r'\s+')
+SPECIAL_LETTERS = str.maketrans({'đ': 'd', 'Đ': 'd'})
+
+
+def normalize_text(text):
+    if not text:
+        return ''
+    text = unicodedata.normalize('NFD', text.translate(SPECIAL_LETTERS))
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return WHITESPACE_RE.sub(' ', text).strip().lower()
+
+
+def tokenize(text):
+    if not text:
+        return []
+    return [token[:MAX_TERM_LENGTH] for token in TOKEN_RE.findall(normalize_text(text))]
+
+
+def document_terms(title, description, category_names, author_names):
+    terms = Counter()
+    fields = (
+        ('title', [title]),
+        ('description', [strip_tags(description or '')]),
+        ('categories', category_names),
+        ('author', author_names),
+    )
+    for field, texts in fields:
+        for text in texts:
+            for token in tokenize(text):
+                terms[token] += FIELD_WEIGHTS[field]
+    return terms
+
+
+def fill_normalized_columns(apps, schema_editor):
+    Category = apps.get_model('LMS', 'Category')
+    Course = apps.get_model('LMS', 'Course')
+    CourseSearchTerm = apps.get_model('LMS', 'CourseSearchTerm')
+
+    categories = list(Category.objects.only('id', 'name'))
+    for category in categories:
+        category.name_normalized = normalize_text(category.name)
+    Category.objects.bulk_update(categories, ['name_normalized'], batch_size=1000)
+
+    updated = []
+    for course in Course.objects.only('id', 'title', 'description').iterator(chunk_size=1000):
+        course.title_normalized = normalize_text(course.title)
+        course.description_normalized = normalize_text(course.description)
+        updated.append(course)
+        if len(updated) >= 1000:
+            Course.objects.bulk_update(updated, ['title_normalized', 'description_normalized'])
+            updated = []
+    Course.objects.bulk_update(updated, ['title_normalized', 'description_normalized'])
+
+    # Các từ trong chỉ mục tìm kiếm giờ là từ không dấu
+    CourseSearchTerm.objects.all().delete()
+    rows = []
+    courses = Course.objects.select_related('author').prefetch_related('categories').order_by('id')
+    for course in courses.iterator(chunk_size=500):
+        author_names = [course.author.first_name, course.author.last_name] if course.author else []
+        terms = document_terms(course.title_normalized, course.description_normalized,
+                               [category.name_normalized for category in course.categories.all()], author_names)
+        rows.extend(CourseSearchTerm(course_id=course.id, term=term, weight=weight) for term, weight in terms.items())
+        if len(rows) >= 5000:
+            CourseSearchTerm.objects.bulk_create(rows, batch_size=1000)
+            rows = []
+    CourseSearchTerm.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('LMS', '0030_coursesearchterm'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='name_normalized',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=255),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='title_normalized',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=100),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='description_normalized',
+            field=models.TextField(default='', editable=False),
+            preserve_default=False,
+        ),
+        migrations.RunPython(fill_normalized_columns, migrations.RunPython.noop),
+    ]
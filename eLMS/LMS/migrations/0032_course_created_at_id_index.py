@@ -0,0 +1,17 @@
+# Generated by Django 5.0.7 on 2026-10-18 02:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('LMS', '0031_normalized_search_columns'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(fields=['created_at', 'id'], name='LMS_course_created_eaeee1_idx'),
+        ),
+    ]
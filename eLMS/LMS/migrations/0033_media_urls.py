@@ -0,0 +1,84 @@
+# Generated by Django 5.0.7 on 2026-10-18 02:14
+
+from cloudinary import CloudinaryResource
+from cloudinary.utils import cloudinary_url
+from django.db import migrations, models
+
+# Bản sao của LMS.media lúc tạo migration này, để migration không đổi khi các kích thước ảnh đổi
+AVATAR_VARIANTS = {
+    'thumbnail': {'width': 150, 'height': 150, 'crop': 'fill', 'gravity': 'face'},
+}
+COVER_IMAGE_VARIANTS = {
+    'card': {'width': 480, 'height': 270, 'crop': 'fill'},
+    'thumbnail': {'width': 160, 'height': 90, 'crop': 'fill'},
+}
+DEGREE_IMAGE_VARIANTS = {
+    'thumbnail': {'width': 100, 'height': 100, 'crop': 'fill'},
+}
+
+
+def build_media_urls(resource, variants, versioned=False):
+    if not resource:
+        return {}
+    public_id = resource.public_id if isinstance(resource, CloudinaryResource) else str(resource)
+    if versioned and isinstance(resource, CloudinaryResource):
+        original = resource.url
+    else:
+        original = cloudinary_url(public_id)[0]
+
+    urls = {'original': original}
+    for name, options in variants.items():
+        urls[name] = cloudinary_url(public_id, **options)[0]
+    return urls
+
+
+def fill_media_urls(apps, schema_editor):
+    sources = [
+        ('User', [('avatar', 'avatar_urls', AVATAR_VARIANTS, False)]),
+        ('Course', [('cover_image', 'cover_image_urls', COVER_IMAGE_VARIANTS, True)]),
+        ('TeacherRegister', [('front_degree_image', 'front_degree_image_urls', DEGREE_IMAGE_VARIANTS, False),
+                             ('back_degree_image', 'back_degree_image_urls', DEGREE_IMAGE_VARIANTS, False)]),
+    ]
+    for model_name, fields in sources:
+        model = apps.get_model('LMS', model_name)
+        urls_fields = [urls_field for _, urls_field, _, _ in fields]
+        updated = []
+        for instance in model.objects.only('id', *[field for field, _, _, _ in fields]).iterator(chunk_size=1000):
+            for field, urls_field, variants, versioned in fields:
+                setattr(instance, urls_field, build_media_urls(getattr(instance, field), variants, versioned))
+            updated.append(instance)
+            if len(updated) >= 1000:
+                model.objects.bulk_update(updated, urls_fields)
+                updated = []
+        model.objects.bulk_update(updated, urls_fields)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('LMS', '0032_course_created_at_id_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='cover_image_urls',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name='teacherregister',
+            name='back_degree_image_urls',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name='teacherregister',
+            name='front_degree_image_urls',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='avatar_urls',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.RunPython(fill_media_urls, migrations.RunPython.noop),
+    ]
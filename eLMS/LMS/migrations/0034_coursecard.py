@@ -0,0 +1,76 @@
+# Generated by Django 5.0.7 on 2026-10-18 02:16
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def build_course_cards(apps, schema_editor):
+    Course = apps.get_model('LMS', 'Course')
+    CourseCard = apps.get_model('LMS', 'CourseCard')
+
+    cards = []
+    courses = Course.objects.select_related('author').prefetch_related('categories').annotate(
+        active_members=Count('course_memberships', filter=Q(course_memberships__is_active=True))
+    ).order_by('id')
+    for course in courses.iterator(chunk_size=500):
+        author = course.author
+        categories = sorted(course.categories.all(), key=lambda category: category.id)
+        cards.append(CourseCard(
+            course_id=course.id,
+            title=course.title,
+            description=course.description,
+            cover_image_url=course.cover_image_urls.get('original', ''),
+            created_at=course.created_at,
+            is_active=course.is_active,
+            author=author,
+            author_email=author.email if author else '',
+            author_first_name=author.first_name if author else '',
+            author_last_name=author.last_name if author else '',
+            author_gender=author.gender if author else None,
+            author_date_of_birth=author.date_of_birth if author else None,
+            author_avatar_url=author.avatar_urls.get('original', '') if author else '',
+            category_ids=[category.id for category in categories],
+            category_names=[category.name for category in categories],
+            enrollment_count=course.active_members,
+        ))
+        if len(cards) >= 500:
+            CourseCard.objects.bulk_create(cards)
+            cards = []
+    CourseCard.objects.bulk_create(cards)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('LMS', '0033_media_urls'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CourseCard',
+            fields=[
+                ('course', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='card', serialize=False, to='LMS.course')),
+                ('title', models.CharField(max_length=100)),
+                ('description', models.TextField()),
+                ('cover_image_url', models.URLField(blank=True, max_length=500)),
+                ('created_at', models.DateTimeField()),
+                ('is_active', models.BooleanField(default=False)),
+                ('author_email', models.EmailField(blank=True, max_length=254)),
+                ('author_first_name', models.CharField(blank=True, max_length=150)),
+                ('author_last_name', models.CharField(blank=True, max_length=150)),
+                ('author_gender', models.IntegerField(null=True)),
+                ('author_date_of_birth', models.DateField(null=True)),
+                ('author_avatar_url', models.URLField(blank=True, max_length=500)),
+                ('category_ids', models.JSONField(default=list)),
+                ('category_names', models.JSONField(default=list)),
+                ('enrollment_count', models.PositiveIntegerField(default=0)),
+                ('author', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='course_cards', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['created_at', 'course'], name='LMS_coursec_created_ed52dd_idx'), models.Index(fields=['author', 'created_at', 'course'], name='LMS_coursec_author__43664e_idx')],
+            },
+        ),
+        migrations.RunPython(build_course_cards, migrations.RunPython.noop),
+    ]
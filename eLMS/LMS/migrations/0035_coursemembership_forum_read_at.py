@@ -0,0 +1,19 @@
+# Generated by Django 5.0.7 on 2026-10-18 02:21
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('LMS', '0034_coursecard'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='coursemembership',
+            name='forum_read_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.0.7 on 2026-10-18 02:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('LMS', '0035_coursemembership_forum_read_at'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['forum', 'created_at', 'id'], name='LMS_post_forum_i_0e5834_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reply',
+            index=models.Index(fields=['question', 'created_at', 'id'], name='LMS_reply_questio_7e77f3_idx'),
+        ),
+    ]
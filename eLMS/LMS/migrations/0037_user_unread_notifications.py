@@ -0,0 +1,30 @@
+# Generated by Django 5.0.7 on 2026-10-18 02:40
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_unread_notifications(apps, schema_editor):
+    Notification = apps.get_model('LMS', 'Notification')
+    User = apps.get_model('LMS', 'User')
+
+    unread = Notification.objects.filter(user=OuterRef('pk'), is_read=False).values('user') \
+        .annotate(total=Count('id')).values('total')
+    User.objects.update(unread_notifications=Coalesce(Subquery(unread), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('LMS', '0036_forum_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='unread_notifications',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_unread_notifications, migrations.RunPython.noop),
+    ]
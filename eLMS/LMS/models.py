@@ -10,11 +10,14 @@ from cloudinary.models import CloudinaryField
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import AbstractUser
 from django.core.exceptions import ValidationError
-from django.db import models
+from django.db import IntegrityError, models, transaction
 from django.utils import timezone
 from datetime import timedelta
 import random
 
+from .media import AVATAR_VARIANTS, COVER_IMAGE_VARIANTS, DEGREE_IMAGE_VARIANTS, build_media_urls, refresh_media_urls
+from .text import normalize_text
+
 
 # Model lưu User lấy từ mẫu có sẵn từ Django
 class User(AbstractUser):
@@ -24,6 +27,9 @@ class User(AbstractUser):
     role = models.IntegerField(choices=[(0, 'Student'), (1, 'Teacher')],
                                default=0)  # Vai trò (Student = người học, Teacher = giáo viên)
     date_of_birth = models.DateField(null=True, blank=True)
+    avatar_urls = models.JSONField(default=dict, blank=True, editable=False)  # Link avatar tính sẵn khi upload
+    # Số thông báo chưa đọc, cập nhật khi tạo/đọc/xóa thông báo
+    unread_notifications = models.PositiveIntegerField(default=0, editable=False)
 
     USERNAME_FIELD = 'email'  # lấy email để đăng nhập
     REQUIRED_FIELDS = ['username']
@@ -31,10 +37,17 @@ class User(AbstractUser):
     def __str__(self):
         return self.email
 
-    # Lấy link ảnh avatar
-    def get_avatar_url(self):
+    def save(self, *args, **kwargs):
+        kwargs['update_fields'] = refresh_media_urls(self, 'avatar', 'avatar_urls', AVATAR_VARIANTS,
+                                                     update_fields=kwargs.get('update_fields'))
+        super().save(*args, **kwargs)
+
+    # Lấy link ảnh avatar (variant: 'original' hoặc 1 kích thước trong AVATAR_VARIANTS)
+    def get_avatar_url(self, variant='original'):
+        if self.avatar_urls:
+            return self.avatar_urls.get(variant)
         if self.avatar:
-            return cloudinary.utils.cloudinary_url(str(self.avatar))[0]
+            return build_media_urls(self.avatar, AVATAR_VARIANTS).get(variant)
         return None
 
     # Hàm quét thông tin bắt buộc phải có
@@ -63,6 +76,11 @@ class Category(models.Model):
     description = models.TextField(blank=True, null=True)  # Mô tả để đây để mai mốt ghi vô chứ không biết
     created_at = models.DateTimeField(auto_now_add=True)  # Ngày tạo
     updated_at = models.DateTimeField(auto_now=True)  # Ngày cập nhật
+    name_normalized = models.CharField(max_length=255, editable=False, db_index=True)  # Tên không dấu, chữ thường
+
+    def save(self, *args, **kwargs):
+        self.name_normalized = normalize_text(self.name)
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return self.name
@@ -78,9 +96,23 @@ class Course(models.Model):
     updated_at = models.DateTimeField(auto_now=True)  # Ngày cập nhật
     is_active = models.BooleanField(default=False)  # Trạng thái của khóa học
     author = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='courses')  # Tác giả khóa học
+    total_tests = models.PositiveIntegerField(default=0, editable=False)  # Số bài Test, cập nhật khi thêm/xóa Test
+    # Bản không dấu, chữ thường của title/description dùng cho tìm kiếm
+    title_normalized = models.CharField(max_length=100, editable=False, db_index=True)
+    description_normalized = models.TextField(editable=False)
+    cover_image_urls = models.JSONField(default=dict, blank=True, editable=False)  # Link ảnh bìa tính sẵn khi upload
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id']),  # Phân trang theo con trỏ (created_at, id)
+        ]
 
     # Hàm tự động tạo Forum cho khóa học
     def save(self, *args, **kwargs):
+        self.title_normalized = normalize_text(self.title)
+        self.description_normalized = normalize_text(self.description)
+        kwargs['update_fields'] = refresh_media_urls(self, 'cover_image', 'cover_image_urls', COVER_IMAGE_VARIANTS,
+                                                     versioned=True, update_fields=kwargs.get('update_fields'))
         super().save(*args, **kwargs)
         # Tạo Forum cho khóa học nếu chưa tồn tại
         if not hasattr(self, 'forum'):
@@ -89,6 +121,58 @@ class Course(models.Model):
     def __str__(self):
         return self.title
 
+    # Lấy link ảnh bìa (variant: 'original' hoặc 1 kích thước trong COVER_IMAGE_VARIANTS)
+    def get_cover_image_url(self, variant='original'):
+        if self.cover_image_urls:
+            return self.cover_image_urls.get(variant)
+        if self.cover_image:
+            return build_media_urls(self.cover_image, COVER_IMAGE_VARIANTS, versioned=True).get(variant)
+        return None
+
+
+# Chỉ mục đảo cho tìm kiếm khóa học: mỗi từ trong tài liệu của khóa học là 1 dòng (xem LMS/search.py)
+class CourseSearchTerm(models.Model):
+    MAX_TERM_LENGTH = 64
+
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='search_terms')
+    term = models.CharField(max_length=MAX_TERM_LENGTH)  # Từ đã chuẩn hóa
+    weight = models.PositiveIntegerField(default=0)  # Độ liên quan: số lần xuất hiện x trọng số của trường
+
+    class Meta:
+        unique_together = ('term', 'course')  # Index (term, course) dùng để tra cứu theo từ
+
+    def __str__(self):
+        return f"{self.term} -> course {self.course_id} ({self.weight})"
+
+
+# Bảng đọc (read model) chứa sẵn mọi thứ để hiển thị thẻ khóa học, cập nhật bằng signal (xem LMS/cards.py)
+class CourseCard(models.Model):
+    course = models.OneToOneField(Course, on_delete=models.CASCADE, primary_key=True, related_name='card')
+    title = models.CharField(max_length=100)
+    description = models.TextField()
+    cover_image_url = models.URLField(max_length=500, blank=True)
+    created_at = models.DateTimeField()
+    is_active = models.BooleanField(default=False)
+    author = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='course_cards')
+    author_email = models.EmailField(blank=True)
+    author_first_name = models.CharField(max_length=150, blank=True)
+    author_last_name = models.CharField(max_length=150, blank=True)
+    author_gender = models.IntegerField(null=True)
+    author_date_of_birth = models.DateField(null=True)
+    author_avatar_url = models.URLField(max_length=500, blank=True)
+    category_ids = models.JSONField(default=list)
+    category_names = models.JSONField(default=list)
+    enrollment_count = models.PositiveIntegerField(default=0)  # Số thành viên đang hoạt động
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'course']),  # Danh sách khóa học, phân trang (created_at, id)
+            models.Index(fields=['author', 'created_at', 'course']),  # Danh sách khóa học của giáo viên
+        ]
+
+    def __str__(self):
+        return f"Card of {self.title}"
+
 
 # Model quản lý Module của từng khóa học
 class Module(models.Model):
@@ -122,6 +206,11 @@ class Post(models.Model):
     body = models.TextField()  # Nội dung câu hỏi
     created_at = models.DateTimeField(auto_now_add=True)  # Ngày tạo
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['forum', 'created_at', 'id']),  # Phân trang theo con trỏ trong từng forum
+        ]
+
     def __str__(self):
         return self.title
 
@@ -135,18 +224,15 @@ class Reply(models.Model):
     body = models.TextField()  # Nội dung câu trả lời
     created_at = models.DateTimeField(auto_now_add=True)  # Ngày tạo
 
+    class Meta:
+        indexes = [
+            # Phân trang câu trả lời, đếm số câu trả lời và lấy câu trả lời mới nhất của từng bài viết
+            models.Index(fields=['question', 'created_at', 'id']),
+        ]
+
     def __str__(self):
         return f"Reply to {self.question.title} by {self.user.username}"
 
-    # Hàm tự động tạo 1 Thông báo khi một người trả lời câu hỏi
-    def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)
-        Notification.objects.create(
-            user=self.question.user,
-            message=f"{self.user.first_name} {self.user.last_name} đã trả lời câu hỏi '{self.question.title}'",
-            created_at=timezone.now()
-        )
-
 
 # Model lưu thông báo
 class Notification(models.Model):
@@ -238,6 +324,7 @@ class Question(models.Model):
     test = models.ForeignKey(Test, related_name='questions', on_delete=models.CASCADE)
     content = RichTextField()
     type = models.IntegerField(choices=QUESTION_TYPES)
+    updated_at = models.DateTimeField(auto_now=True)  # Ngày cập nhật, dùng để tạo ETag cho bài Test
 
     def save(self, *args, **kwargs):
         # Debugging output
@@ -265,14 +352,29 @@ class Question(models.Model):
 
 # Model quản lý câu trả lời cho câu hỏi trắc nghiệm
 class Answer(models.Model):
+    MAX_CHOICES = 63  # Giới hạn bởi số bit của StudentSelection.selected_mask
+
     question = models.ForeignKey(Question, related_name='answers', on_delete=models.CASCADE)
     choice = models.TextField()  # Content of the answer choice
     is_correct = models.BooleanField()  # True if this is a correct answer
+    updated_at = models.DateTimeField(auto_now=True)  # Ngày cập nhật, dùng để tạo ETag cho bài Test
+    position = models.PositiveSmallIntegerField(editable=False)  # Vị trí bit của lựa chọn trong StudentSelection
+
+    class Meta:
+        unique_together = ('question', 'position')
 
     def save(self, *args, **kwargs):
         if self.question.type != 0:
             raise ValidationError("Câu hỏi tự luận không có đáp án!")
 
+        # Lấy vị trí trống nhỏ nhất của câu hỏi, vị trí không đổi khi xóa lựa chọn khác
+        if self.position is None:
+            used = set(Answer.objects.filter(question_id=self.question_id).values_list('position', flat=True))
+            free = [position for position in range(self.MAX_CHOICES) if position not in used]
+            if not free:
+                raise ValidationError(f"Một câu hỏi có tối đa {self.MAX_CHOICES} lựa chọn!")
+            self.position = free[0]
+
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -310,6 +412,8 @@ class CourseMembership(models.Model):
     finish_date = models.DateField(blank=True, null=True)  # Ngày hoàn thành khóa học (có thể để trống)
     progress = models.DecimalField(max_digits=5, decimal_places=2, default=0.00)  # Tiến độ học tập, mặc định là 0%
     is_active = models.BooleanField(default=True)  # Trạng thái hoạt động của thành viên trong khóa học
+    completed_tests = models.PositiveIntegerField(default=0, editable=False)  # Số bài Test đã có điểm
+    forum_read_at = models.DateTimeField(default=timezone.now)  # Lần cuối xem forum, bài viết sau mốc này là chưa đọc
 
     class Meta:
         unique_together = ('user', 'course')  # Đảm bảo mỗi user chỉ có một membership cho mỗi course
@@ -318,13 +422,13 @@ class CourseMembership(models.Model):
         return f"{self.user.username} in {self.course.title}"
 
     def calculate_total_tests(self):
-        """Calculate total number of tests in the course."""
-        return Test.objects.filter(module__course=self.course).count()
+        """Return the maintained number of tests in the course."""
+        return Course.objects.filter(id=self.course_id).values_list('total_tests', flat=True).first() or 0
 
     def update_progress(self):
         """Update progress based on completed tests."""
         total_tests = self.calculate_total_tests()
-        completed_tests = StudentScore.objects.filter(user=self.user, test__module__course=self.course).count()
+        completed_tests = self.completed_tests
 
         if total_tests > 0:
             # Each test contributes equally to progress
@@ -338,7 +442,7 @@ class CourseMembership(models.Model):
         else:
             self.finish_date = None  # Optionally reset finish_date if not complete
 
-        self.save()
+        self.save(update_fields=['progress', 'finish_date'])
 
 
 class StudentScore(models.Model):
@@ -348,14 +452,101 @@ class StudentScore(models.Model):
     last_modified = models.DateTimeField(default=timezone.now)
 
     def save(self, *args, **kwargs):
+        created = self._state.adding
         self.last_modified = timezone.now()
         super(StudentScore, self).save(*args, **kwargs)
 
-        # Update progress in CourseMembership after saving a score
-        course_membership = CourseMembership.objects.get(user=self.user, course=self.test.module.course)
-        course_membership.update_progress()
+        course_id = Test.objects.filter(id=self.test_id).values_list('module__course_id', flat=True).first()
+
+        # Lần đầu có điểm bài Test này thì tăng số bài đã hoàn thành
+        if created:
+            CourseMembership.objects.filter(user_id=self.user_id, course_id=course_id).update(
+                completed_tests=models.F('completed_tests') + 1
+            )
+
+        # Đưa việc cập nhật tiến độ vào hàng đợi, worker sẽ gộp và xử lý sau
+        ProgressJob.enqueue(self.user_id, course_id)
+
+
+# Model lưu các lần cập nhật tiến độ đang chờ worker xử lý (manage.py process_progress_jobs)
+class ProgressJob(models.Model):
+    # Các thay đổi điểm trong khoảng thời gian này được gộp thành 1 lần cập nhật tiến độ
+    COALESCE_WINDOW = timedelta(seconds=5)
 
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    course = models.ForeignKey(Course, on_delete=models.CASCADE)
+    created_at = models.DateTimeField(auto_now_add=True)
+    run_after = models.DateTimeField(db_index=True)  # Thời điểm worker được phép xử lý
+
+    class Meta:
+        unique_together = ('user', 'course')  # Mỗi (user, course) chỉ có 1 công việc đang chờ
 
+    def __str__(self):
+        return f"Progress job for user {self.user_id} in course {self.course_id}"
+
+    @classmethod
+    def enqueue(cls, user_id, course_id):
+        """Schedule a progress recompute, coalescing with any job already pending."""
+        if course_id is None:
+            return
+        try:
+            with transaction.atomic():
+                cls.objects.get_or_create(
+                    user_id=user_id,
+                    course_id=course_id,
+                    defaults={'run_after': timezone.now() + cls.COALESCE_WINDOW}
+                )
+        except IntegrityError:
+            # Một request khác vừa tạo công việc này
+            pass
+
+    @classmethod
+    def enqueue_course(cls, course_id):
+        """Schedule a progress recompute for every member of a course, e.g. after its number of tests changed."""
+        if course_id is None:
+            return
+        run_after = timezone.now() + cls.COALESCE_WINDOW
+        user_ids = CourseMembership.objects.filter(course_id=course_id).values_list('user_id', flat=True)
+        # ignore_conflicts: thành viên đã có công việc đang chờ thì giữ công việc đó
+        cls.objects.bulk_create([cls(user_id=user_id, course_id=course_id, run_after=run_after)
+                                 for user_id in user_ids], ignore_conflicts=True)
+
+
+class ReplyNotificationJob(models.Model):
+    # Các câu trả lời cho cùng 1 bài viết trong khoảng này được gộp thành 1 thông báo
+    COALESCE_WINDOW = timedelta(seconds=10)
+
+    recipient = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='+')
+    reply_count = models.PositiveIntegerField(default=1)
+    replier_name = models.CharField(max_length=255)  # Người trả lời mới nhất
+    created_at = models.DateTimeField(auto_now_add=True)
+    run_after = models.DateTimeField(db_index=True)  # Thời điểm worker được phép gửi thông báo
+
+    class Meta:
+        unique_together = ('recipient', 'post')  # Mỗi (người nhận, bài viết) chỉ có 1 thông báo đang chờ
+
+    def __str__(self):
+        return f"Reply notification for user {self.recipient_id} about post {self.post_id}"
+
+    @classmethod
+    def enqueue(cls, recipient_id, post_id, replier_name):
+        """Count a reply into the pending notification of (recipient, post), creating it if none is pending."""
+        replier_name = replier_name[:255]
+        pending = cls.objects.filter(recipient_id=recipient_id, post_id=post_id)
+        if pending.update(reply_count=models.F('reply_count') + 1, replier_name=replier_name):
+            return
+        try:
+            with transaction.atomic():
+                cls.objects.create(recipient_id=recipient_id, post_id=post_id, replier_name=replier_name,
+                                   run_after=timezone.now() + cls.COALESCE_WINDOW)
+        except IntegrityError:
+            # Một request khác vừa tạo thông báo đang chờ này
+            pending.update(reply_count=models.F('reply_count') + 1, replier_name=replier_name)
+
+
+# Bảng cũ, chỉ còn dùng trên adminsite: API lưu lựa chọn vào StudentSelection và chấm điểm từ đó,
+# nên bài làm qua API không có dòng ở đây (is_correct chỉ đúng với các dòng tạo trên adminsite)
 class StudentAnswer(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     question = models.ForeignKey(Question, related_name='student_answers', on_delete=models.CASCADE)
@@ -365,45 +556,52 @@ class StudentAnswer(models.Model):
     def save(self, *args, **kwargs):
         # Xác định đáp án đúng hay sai
         self.is_correct = self.selected_answer.is_correct
+        previous_answer_id = None
+        if self.pk is not None:
+            previous_answer_id = StudentAnswer.objects.filter(pk=self.pk) \
+                .values_list('selected_answer_id', flat=True).first()
         super().save(*args, **kwargs)
+        # Bảng này chỉ còn dùng cho admin, điểm được chấm từ StudentSelection
+        if previous_answer_id is not None and previous_answer_id != self.selected_answer_id:
+            self.clear_selection_bit(previous_answer_id)
+        StudentSelection.objects.get_or_create(user_id=self.user_id, question_id=self.question_id)
+        StudentSelection.objects.filter(user_id=self.user_id, question_id=self.question_id).update(
+            selected_mask=models.F('selected_mask').bitor(1 << self.selected_answer.position)
+        )
         # Cập nhật điểm số của học sinh cho bài kiểm tra
         self.update_student_score()
 
+    def clear_selection_bit(self, answer_id):
+        """Unselect an answer in StudentSelection unless another row of this student still selects it."""
+        if StudentAnswer.objects.filter(user_id=self.user_id, question_id=self.question_id,
+                                        selected_answer_id=answer_id).exclude(pk=self.pk).exists():
+            return
+        position = Answer.objects.filter(id=answer_id).values_list('position', flat=True).first()
+        if position is None:
+            # Lựa chọn đã bị xóa: clear_deleted_answer_selections đã xóa bit
+            return
+        StudentSelection.objects.filter(user_id=self.user_id, question_id=self.question_id).update(
+            selected_mask=models.F('selected_mask').bitand(((1 << Answer.MAX_CHOICES) - 1) ^ (1 << position))
+        )
+
     def update_student_score(self):
-        # Get all answers by the student for the test
-        student_answers = StudentAnswer.objects.filter(user=self.user, question__test=self.question.test)
-
-        # Total score across all questions in the test
-        total_score = 0
-        total_questions = self.question.test.questions.count()
-
-        # Iterate through all questions to calculate the score
-        for question in self.question.test.questions.all():
-            correct_answers = Answer.objects.filter(question=question, is_correct=True).count()
-            selected_answers = student_answers.filter(question=question).values_list('selected_answer', flat=True)
-
-            # New condition: If there are more than 1 correct answer and the user submits more answers than correct
-            if correct_answers > 1 and len(selected_answers) > correct_answers:
-                # Score for this question is 0%
-                question_score = 0
-            else:
-                # Count how many selected answers are correct
-                selected_correct_answers = student_answers.filter(question=question, is_correct=True).count()
-
-                # Calculate the score for the question
-                if correct_answers > 0:
-                    # Score based on the number of correct answers submitted
-                    question_score = (selected_correct_answers / correct_answers) * (100 / total_questions)
-                else:
-                    question_score = 0
-
-            # Accumulate total score
-            total_score += question_score
-
-        # Update the student's score record
-        score_record, created = StudentScore.objects.get_or_create(user=self.user, test=self.question.test)
-        score_record.score = total_score  # Updated total score calculation
-        score_record.save()
+        # Chấm lại toàn bộ bài Test bằng 2 truy vấn (đáp án + lựa chọn của học sinh)
+        from .grading import grade_student
+        grade_student(self.user, self.question.test)
+
+
+# Model lưu lựa chọn của học sinh cho 1 câu hỏi trắc nghiệm: 1 dòng / (user, câu hỏi), các lựa chọn nằm trong bitmask
+class StudentSelection(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='selections')
+    question = models.ForeignKey(Question, on_delete=models.CASCADE, related_name='selections')
+    selected_mask = models.PositiveBigIntegerField(default=0)  # Bit thứ i bật = đã chọn lựa chọn có position = i
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('user', 'question')
+
+    def __str__(self):
+        return f"Selection of {self.user_id} for question {self.question_id}: {self.selected_mask:b}"
 
 
 class TeacherRegister(models.Model):
@@ -411,6 +609,16 @@ class TeacherRegister(models.Model):
     front_degree_image = CloudinaryField('front_degree')  # Front image of the degree
     back_degree_image = CloudinaryField('back_degree')  # Back image of the degree
     submitted_at = models.DateTimeField(default=timezone.now)  # Submission timestamp
+    # Link ảnh bằng cấp tính sẵn khi upload
+    front_degree_image_urls = models.JSONField(default=dict, blank=True, editable=False)
+    back_degree_image_urls = models.JSONField(default=dict, blank=True, editable=False)
+
+    def save(self, *args, **kwargs):
+        update_fields = refresh_media_urls(self, 'front_degree_image', 'front_degree_image_urls',
+                                           DEGREE_IMAGE_VARIANTS, update_fields=kwargs.get('update_fields'))
+        kwargs['update_fields'] = refresh_media_urls(self, 'back_degree_image', 'back_degree_image_urls',
+                                                     DEGREE_IMAGE_VARIANTS, update_fields=update_fields)
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"Teacher Registration for {self.user.username}"
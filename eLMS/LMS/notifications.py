@@ -0,0 +1,132 @@
+# Gửi các thông báo "có câu trả lời mới" đã gộp trong ReplyNotificationJob bằng 1 lần ghi hàng loạt, ngoài request
+# tạo câu trả lời,
+# và bộ đếm số thông báo chưa đọc của mỗi người dùng
+# eLMS/LMS/notifications.py
+import logging
+import threading
+from collections import Counter
+
+from django.db import DatabaseError, connection, connections, transaction
+from django.db.models import F, Max, Q
+from django.utils import timezone
+
+from .models import Notification, Post, ReplyNotificationJob, User
+from .push import publish_to_user
+from .serializers import NotificationSerializer
+
+logger = logging.getLogger(__name__)
+
+# Thread của web process kiểm tra các thông báo đến hạn sau mỗi khoảng này
+FLUSH_INTERVAL = 1.0
+
+
+def change_unread_counts(deltas):
+    """Add each delta to the unread counter of its user ({user_id: delta})."""
+    for user_id, delta in deltas.items():
+        if delta > 0:
+            User.objects.filter(id=user_id).update(unread_notifications=F('unread_notifications') + delta)
+        elif delta < 0:
+            User.objects.filter(id=user_id, unread_notifications__gte=-delta) \
+                .update(unread_notifications=F('unread_notifications') + delta)
+
+
+def mark_read(user_id, notification_ids):
+    """Mark notifications of a user as read and return how many of them were still unread."""
+    with transaction.atomic():
+        # UPDATE có điều kiện is_read=False: 2 request đánh dấu cùng lúc không trừ bộ đếm 2 lần
+        count = Notification.objects.filter(user_id=user_id, id__in=notification_ids, is_read=False) \
+            .update(is_read=True)
+        change_unread_counts({user_id: -count})
+    return count
+
+
+def reply_message(count, replier_name, post_title):
+    if count == 1:
+        return f"{replier_name} đã trả lời câu hỏi '{post_title}'"
+    return f"Có {count} câu trả lời mới cho câu hỏi '{post_title}', mới nhất từ {replier_name}"
+
+
+def send_reply_notifications(batch_size=500, force=False):
+    """
+    Write one notification per pending ReplyNotificationJob whose window has passed (every job with force=True),
+    in a single bulk_create, and push them to connected clients after commit. Returns the notifications.
+    """
+    with transaction.atomic():
+        jobs = ReplyNotificationJob.objects.order_by('run_after')
+        if not force:
+            jobs = jobs.filter(run_after__lte=timezone.now())
+        # Khóa các dòng đang gửi: worker khác bỏ qua chúng, câu trả lời mới chờ tới khi commit rồi tạo dòng mới
+        jobs = list(jobs.select_for_update(skip_locked=True)[:batch_size])
+        if not jobs:
+            return []
+
+        titles = dict(Post.objects.filter(id__in={job.post_id for job in jobs}).values_list('id', 'title'))
+        last_id = None
+        if not connection.features.can_return_rows_from_bulk_insert:
+            last_id = Notification.objects.aggregate(last_id=Max('id'))['last_id'] or 0
+        notifications = Notification.objects.bulk_create([
+            Notification(user_id=job.recipient_id,
+                         message=reply_message(job.reply_count, job.replier_name, titles[job.post_id]))
+            for job in jobs
+        ])
+        ReplyNotificationJob.objects.filter(id__in=[job.id for job in jobs]).delete()
+        # bulk_create không gửi post_save nên tự cộng bộ đếm chưa đọc
+        change_unread_counts(Counter(notification.user_id for notification in notifications))
+
+        if last_id is not None:
+            # MySQL không trả về id sau bulk_create: đọc lại đúng các dòng của lô này (sau id lớn nhất trước khi ghi,
+            # cùng người nhận và nội dung) để gửi kèm id cho Last-Event-ID, không lấy thông báo của nơi khác
+            batch = Q()
+            for notification in notifications:
+                batch |= Q(user_id=notification.user_id, message=notification.message)
+            notifications = list(Notification.objects.filter(batch, id__gt=last_id).order_by('id'))
+
+        data = NotificationSerializer(notifications, many=True).data
+        transaction.on_commit(lambda: [publish_to_user(item['user'], item) for item in data])
+    return notifications
+
+
+class ReplyNotificationSender:
+    """
+    Thread of a web process that sends the due reply notifications every FLUSH_INTERVAL seconds.
+
+    The pending notifications live in ReplyNotificationJob, so every process (and the
+    send_reply_notifications command) drains the same queue and nothing is lost on a crash;
+    the thread only lets the process that holds the streams push them without a shared broker.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._worker = None
+        self._stopping = None
+
+    def wake(self):
+        """Start the thread if it is not running."""
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._stopping = threading.Event()
+                self._worker = threading.Thread(target=self._run, args=(self._stopping,), name='reply-notifications',
+                                                daemon=True)
+                self._worker.start()
+
+    def stop(self):
+        """Stop the thread; it is started again by the next wake()."""
+        with self._lock:
+            worker, stopping = self._worker, self._stopping
+            self._worker = self._stopping = None
+        if worker is not None:
+            stopping.set()
+            worker.join()
+
+    def _run(self, stopping):
+        while not stopping.wait(FLUSH_INTERVAL):
+            try:
+                send_reply_notifications()
+            except DatabaseError:
+                logger.exception("Could not send reply notifications, retrying on the next round.")
+            finally:
+                # Thread riêng có kết nối CSDL riêng, đóng lại để không giữ kết nối chết
+                connections.close_all()
+
+
+reply_notification_sender = ReplyNotificationSender()
@@ -0,0 +1,95 @@
+# Đẩy thông báo tới trình duyệt (Server-Sent Events) qua pub/sub thay vì để frontend gọi lại /notifications/
+# eLMS/LMS/push.py
+import asyncio
+import threading
+from collections import defaultdict
+from functools import lru_cache
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+DEFAULT_BROKER = 'LMS.push.LocalBroker'
+
+# Client đọc chậm thì bỏ bớt tin, client sẽ lấy lại từ CSDL khi kết nối lại (Last-Event-ID)
+SUBSCRIPTION_QUEUE_SIZE = 100
+
+
+def user_channel(user_id):
+    return f'user:{user_id}'
+
+
+class Subscription:
+    """Messages published to one channel, read from the event loop that subscribed."""
+
+    def __init__(self, broker, channel):
+        self.broker = broker
+        self.channel = channel
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=SUBSCRIPTION_QUEUE_SIZE)
+
+    def _offer(self, message):
+        if not self.queue.full():
+            self.queue.put_nowait(message)
+
+    def deliver(self, message):
+        # publish() có thể chạy ở thread khác (view đồng bộ), asyncio.Queue chỉ dùng được trong loop của nó
+        self.loop.call_soon_threadsafe(self._offer, message)
+
+    async def get(self, timeout=None):
+        """Return the next message, or None after timeout seconds without one."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class LocalBroker:
+    """
+    In-process pub/sub, the stand-in broker.
+
+    Only subscribers of the process that publishes receive the message, so with
+    it the app must run as a single ASGI process. A broker shared between
+    processes (e.g. Redis pub/sub) only needs the same subscribe()/publish().
+    """
+
+    def __init__(self):
+        self._subscriptions = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, channel):
+        """Must be called from the event loop that will read the subscription."""
+        subscription = Subscription(self, channel)
+        with self._lock:
+            self._subscriptions[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.channel)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.channel]
+
+    def publish(self, channel, message):
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(channel, ()))
+        for subscription in subscriptions:
+            try:
+                subscription.deliver(message)
+            except RuntimeError:
+                # Event loop của kết nối đã đóng
+                self.unsubscribe(subscription)
+
+
+@lru_cache(maxsize=None)
+def get_broker():
+    """Return the broker configured by settings.PUSH_BROKER (dotted path of a class)."""
+    return import_string(getattr(settings, 'PUSH_BROKER', DEFAULT_BROKER))()
+
+
+def publish_to_user(user_id, message):
+    get_broker().publish(user_channel(user_id), message)
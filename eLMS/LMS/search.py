@@ -0,0 +1,200 @@
+# Tìm kiếm khóa học bằng chỉ mục đảo (bảng CourseSearchTerm)
+# eLMS/LMS/search.py
+import re
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Count, F, Prefetch, Q, Sum, Value
+from django.utils.html import strip_tags
+
+from .models import Category, Course, CourseCard, CourseSearchTerm
+from .text import normalize_text
+
+# Trọng số của từng trường: từ khớp ở tên khóa học quan trọng hơn ở mô tả
+FIELD_WEIGHTS = {
+    'title': 8,
+    'categories': 4,
+    'author': 4,
+    'description': 1,
+}
+
+# Giới hạn số từ của 1 câu tìm kiếm để truy vấn không bị quá lớn
+MAX_QUERY_TERMS = 8
+
+# Số giá trị tối đa trả về cho mỗi facet (danh mục, tác giả)
+MAX_FACET_VALUES = 50
+
+TOKEN_RE = re.compile(r'\w+')
+
+
+def tokenize(text):
+    """Split a text into unaccented, lowercased word tokens ("Lập trình" -> ["lap", "trinh"])."""
+    if not text:
+        return []
+    return [token[:CourseSearchTerm.MAX_TERM_LENGTH] for token in TOKEN_RE.findall(normalize_text(text))]
+
+
+def document_terms(title, description, category_names, author_names):
+    """Return the weighted terms (term -> weight) of a course document."""
+    terms = Counter()
+    fields = (
+        ('title', [title]),
+        ('description', [strip_tags(description or '')]),
+        ('categories', category_names),
+        ('author', author_names),
+    )
+    for field, texts in fields:
+        for text in texts:
+            for token in tokenize(text):
+                terms[token] += FIELD_WEIGHTS[field]
+    return terms
+
+
+def course_terms(course):
+    """Return the weighted terms of a course; categories and author should be prefetched."""
+    author_names = [course.author.first_name, course.author.last_name] if course.author else []
+    # Dùng các cột đã chuẩn hóa sẵn khi lưu
+    return document_terms(
+        course.title_normalized,
+        course.description_normalized,
+        [category.name_normalized for category in course.categories.all()],
+        author_names,
+    )
+
+
+def _indexed_courses():
+    return Course.objects.select_related('author').only(
+        'id', 'title_normalized', 'description_normalized', 'author__first_name', 'author__last_name'
+    ).prefetch_related(Prefetch('categories', queryset=Category.objects.only('id', 'name_normalized')))
+
+
+def index_courses(course_ids):
+    """Rebuild the search terms of the given courses."""
+    course_ids = list(course_ids)
+    if not course_ids:
+        return
+
+    rows = [
+        CourseSearchTerm(course_id=course.id, term=term, weight=weight)
+        for course in _indexed_courses().filter(id__in=course_ids)
+        for term, weight in course_terms(course).items()
+    ]
+    with transaction.atomic():
+        CourseSearchTerm.objects.filter(course_id__in=course_ids).delete()
+        CourseSearchTerm.objects.bulk_create(rows, batch_size=1000)
+
+
+def index_course(course_id):
+    """Rebuild the search terms of a single course."""
+    index_courses([course_id])
+
+
+def rebuild_index(chunk_size=500):
+    """Rebuild the whole search index chunk by chunk; returns the number of indexed courses."""
+    count = 0
+    rows = []
+    with transaction.atomic():
+        CourseSearchTerm.objects.all().delete()
+        for course in _indexed_courses().order_by('id').iterator(chunk_size=chunk_size):
+            rows.extend(
+                CourseSearchTerm(course_id=course.id, term=term, weight=weight)
+                for term, weight in course_terms(course).items()
+            )
+            count += 1
+            if len(rows) >= 5000:
+                CourseSearchTerm.objects.bulk_create(rows, batch_size=1000)
+                rows = []
+        CourseSearchTerm.objects.bulk_create(rows, batch_size=1000)
+    return count
+
+
+def query_terms(keyword):
+    """
+    Split a keyword into (words, prefix).
+
+    Every word but the last must match a whole indexed term; the last one, which
+    may still be being typed, only has to start a term ("lap trinh pyt" finds
+    "Lập trình Python"). prefix is None when the keyword has no word.
+    """
+    terms = list(dict.fromkeys(tokenize(keyword)))[:MAX_QUERY_TERMS]
+    if not terms:
+        return [], None
+    return terms[:-1], terms[-1]
+
+
+def _term_conditions(words, prefix, lookup):
+    # term__startswith vẫn dùng được index (term, course) vì là LIKE 'prefix%'
+    prefix_match = Q(**{f'{lookup}__startswith': prefix})
+    if not words:
+        return prefix_match, None, prefix_match
+    word_match = Q(**{f'{lookup}__in': words})
+    return prefix_match | word_match, word_match, prefix_match
+
+
+def search_courses(queryset, keyword, relation='search_terms'):
+    """
+    Filter a queryset to the courses containing every word of the keyword, best matches first.
+
+    relation is the path from the queryset's model to CourseSearchTerm ('course__search_terms' for CourseCard).
+    """
+    words, prefix = query_terms(keyword)
+    if prefix is None:
+        return queryset.none()
+
+    # Tra cứu theo index (term, course) rồi chỉ giữ khóa học có đủ các từ và ít nhất 1 từ bắt đầu bằng prefix
+    any_match, word_match, prefix_match = _term_conditions(words, prefix, f'{relation}__term')
+    counts = {'search_prefixes': Count(relation, filter=prefix_match)}
+    having = {'search_prefixes__gt': 0}
+    if words:
+        counts['search_words'] = Count(relation, filter=word_match)
+        having['search_words'] = len(words)
+    return queryset.filter(any_match).annotate(**counts, search_rank=Sum(f'{relation}__weight')) \
+        .filter(**having).order_by('-search_rank', '-created_at', '-pk')
+
+
+def matching_course_ids(keyword):
+    """Return a subquery of the ids of the courses matching the keyword (see query_terms())."""
+    words, prefix = query_terms(keyword)
+    if prefix is None:
+        return CourseSearchTerm.objects.none().values('course')
+
+    any_match, word_match, prefix_match = _term_conditions(words, prefix, 'term')
+    counts = {'prefixes': Count('id', filter=prefix_match)}
+    having = {'prefixes__gt': 0}
+    if words:
+        counts['words'] = Count('id', filter=word_match)
+        having['words'] = len(words)
+    return CourseSearchTerm.objects.filter(any_match).values('course').annotate(**counts) \
+        .filter(**having).values('course')
+
+
+def facet_counts(cards, limit=MAX_FACET_VALUES):
+    """
+    Count the given course cards per category and per author.
+
+    Both facets come from a single UNION ALL of two GROUP BY queries. Each facet
+    keeps its limit most frequent values, or every value when limit is None.
+    """
+    course_ids = cards.values('pk')
+    # Hai nhánh UNION phải có cùng thứ tự cột nên mọi cột đều là annotation
+    columns = ['facet', 'value_id', 'first_name', 'last_name']
+    categories = Course.categories.through.objects.filter(course_id__in=course_ids).annotate(
+        facet=Value('category'), value_id=F('category_id'), first_name=F('category__name'), last_name=Value(''),
+    ).values(*columns).annotate(count=Count('course_id')).values_list(*columns, 'count')
+    authors = CourseCard.objects.filter(pk__in=course_ids, author__isnull=False).annotate(
+        facet=Value('author'), value_id=F('author_id'), first_name=F('author_first_name'),
+        last_name=F('author_last_name'),
+    ).values(*columns).annotate(count=Count('pk')).values_list(*columns, 'count')
+
+    facets = {'categories': [], 'authors': []}
+    for facet, value_id, first_name, last_name, count in categories.union(authors, all=True):
+        if facet == 'category':
+            facets['categories'].append({'id': value_id, 'name': first_name, 'count': count})
+        else:
+            facets['authors'].append({'id': value_id, 'name': f"{first_name} {last_name}".strip(), 'count': count})
+
+    for values in facets.values():
+        values.sort(key=lambda value: (-value['count'], value['name']))
+        if limit is not None:
+            del values[limit:]
+    return facets
@@ -3,12 +3,14 @@ import ast
 
 from rest_framework import serializers
 from .models import Category, Course, Module, CourseMembership, Test, Question, Answer, Notification, Forum, Post, \
-    Reply, File, EssayAnswer, StudentAnswer, StudentScore, TeacherRegister
+    Reply, File, EssayAnswer, StudentScore, TeacherRegister, CourseCard
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
 from django.utils.timesince import timesince
 from django.utils import timezone
 
+from .fieldsets import SparseFieldsetMixin
+
 User = get_user_model()
 
 
@@ -32,6 +34,12 @@ class UserSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("Avatar is required.")
         return value
 
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        # Dùng link avatar tính sẵn thay vì dựng link Cloudinary mỗi lần serialize
+        data['avatar'] = instance.get_avatar_url()
+        return data
+
     def create(self, validated_data):
         email = validated_data['email']
         password = validated_data['password']
@@ -97,13 +105,13 @@ class UserUpdateSerializer(serializers.ModelSerializer):
         return super().update(instance, validated_data)
 
 
-class CategorySerializer(serializers.ModelSerializer):
+class CategorySerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = Category
         fields = ['id', 'name', 'description', 'created_at', 'updated_at']
 
 
-class CourseSerializer(serializers.ModelSerializer):
+class CourseSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     cover_image_url = serializers.SerializerMethodField()
     created_at = serializers.SerializerMethodField()
     categories = serializers.SerializerMethodField()
@@ -112,17 +120,56 @@ class CourseSerializer(serializers.ModelSerializer):
     class Meta:
         model = Course
         fields = ['id', 'title', 'cover_image_url', 'description', 'created_at', 'is_active', 'categories', 'author']
+        field_sources = {'cover_image_url': ['cover_image', 'cover_image_urls'], 'created_at': ['created_at'],
+                         'categories': []}
 
     def get_cover_image_url(self, obj):
-        if obj.cover_image:
-            return obj.cover_image.url
-        return None
+        # Link đã tính sẵn khi upload
+        return obj.get_cover_image_url()
 
     def get_created_at(self, obj):
         return timesince(obj.created_at, timezone.now()) + " ago"
 
     def get_categories(self, obj):
-        return list(obj.categories.values_list('id', flat=True))
+        # Đọc từ categories đã prefetch, không truy vấn thêm cho từng khóa học
+        return [category.id for category in obj.categories.all()]
+
+
+# Đọc từ bảng CourseCard, trả về cùng dạng với CourseSerializer (thêm số thành viên và tên danh mục)
+class CourseCardSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    id = serializers.IntegerField(source='course_id')
+    created_at = serializers.SerializerMethodField()
+    categories = serializers.ListField(source='category_ids', child=serializers.IntegerField())
+    author = serializers.SerializerMethodField()
+
+    class Meta:
+        model = CourseCard
+        fields = ['id', 'title', 'cover_image_url', 'description', 'created_at', 'is_active', 'categories', 'author',
+                  'category_names', 'enrollment_count']
+        field_sources = {'created_at': ['created_at'],
+                         'author': ['author', 'author_email', 'author_gender', 'author_avatar_url', 'author_first_name',
+                                    'author_last_name', 'author_date_of_birth']}
+
+    def get_created_at(self, obj):
+        return timesince(obj.created_at, timezone.now()) + " ago"
+
+    def get_author(self, obj):
+        if obj.author_id is None:
+            return None
+        return {
+            'email': obj.author_email,
+            'gender': obj.author_gender,
+            'avatar': obj.author_avatar_url or None,
+            'first_name': obj.author_first_name,
+            'last_name': obj.author_last_name,
+            'date_of_birth': obj.author_date_of_birth.strftime('%d/%m/%Y') if obj.author_date_of_birth else None,
+        }
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        if 'cover_image_url' in data:
+            data['cover_image_url'] = data['cover_image_url'] or None
+        return data
 
 
 class CourseCreateSerializer(serializers.ModelSerializer):
@@ -149,7 +196,7 @@ class CourseCreateSerializer(serializers.ModelSerializer):
         return course
 
 
-class CourseDetailSerializer(serializers.ModelSerializer):
+class CourseDetailSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     cover_image_url = serializers.SerializerMethodField()
     created_at = serializers.SerializerMethodField()
     categories = serializers.SerializerMethodField()
@@ -158,17 +205,19 @@ class CourseDetailSerializer(serializers.ModelSerializer):
     class Meta:
         model = Course
         fields = ['id', 'title', 'cover_image_url', 'description', 'created_at', 'is_active', 'categories', 'author']
+        field_sources = {'cover_image_url': ['cover_image', 'cover_image_urls'], 'created_at': ['created_at'],
+                         'categories': [], 'author': ['author']}
 
     def get_cover_image_url(self, obj):
-        if obj.cover_image:
-            return obj.cover_image.url
-        return None
+        # Link đã tính sẵn khi upload
+        return obj.get_cover_image_url()
 
     def get_created_at(self, obj):
         return timesince(obj.created_at, timezone.now()) + " ago"
 
     def get_categories(self, obj):
-        return list(obj.categories.values_list('id', flat=True))
+        # Đọc từ categories đã prefetch, không truy vấn thêm cho từng khóa học
+        return [category.id for category in obj.categories.all()]
 
     def get_author(self, obj):
         if obj.author:
@@ -180,14 +229,14 @@ class CourseDetailSerializer(serializers.ModelSerializer):
         return "Admin"
 
 
-class ModuleTitleSerializer(serializers.ModelSerializer):
+class ModuleTitleSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = Module
         fields = ['id', 'title']
 
 
 # Serializer for creating, updating, and deleting modules (all attributes)
-class ModuleSerializer(serializers.ModelSerializer):
+class ModuleSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = Module
         fields = ['id', 'title', 'youtube_url', 'description', 'created_at']
@@ -214,13 +263,13 @@ class CourseMembershipSerializer(serializers.ModelSerializer):
         fields = ['user', 'course', 'attend_date', 'finish_date', 'progress', 'is_active']
 
 
-class TestSerializer(serializers.ModelSerializer):
+class TestSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = Test
-        fields = '__all__'
+        fields = ['id', 'module', 'name', 'created_at', 'num_questions', 'test_type']
 
 
-class QuestionSerializer(serializers.ModelSerializer):
+class QuestionSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = Question
         fields = ['id', 'test', 'content', 'type']
@@ -239,6 +288,42 @@ class AnswerSerializer(serializers.ModelSerializer):
         return value
 
 
+# Serializer trả về toàn bộ bài Test (câu hỏi + lựa chọn) trong 1 response
+class TestChoiceSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Answer
+        fields = ['id', 'choice', 'is_correct']
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        # Học sinh không được thấy đáp án đúng
+        if not self.context.get('show_correct'):
+            data.pop('is_correct')
+        return data
+
+
+class TestQuestionSerializer(serializers.ModelSerializer):
+    answers = TestChoiceSerializer(many=True, read_only=True)
+    result = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Question
+        fields = ['id', 'content', 'type', 'answers', 'result']
+
+    def get_result(self, obj):
+        # Giống AnswerViewSet: 0 = chưa có đáp án đúng, 1 = một đáp án đúng, 2 = nhiều đáp án đúng
+        correct_count = sum(1 for answer in obj.answers.all() if answer.is_correct)
+        return min(correct_count, 2)
+
+
+class TestFullSerializer(serializers.ModelSerializer):
+    questions = TestQuestionSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = Test
+        fields = ['id', 'module', 'name', 'created_at', 'num_questions', 'test_type', 'questions']
+
+
 class NotificationSerializer(serializers.ModelSerializer):
     class Meta:
         model = Notification
@@ -252,11 +337,20 @@ class ForumSerializer(serializers.ModelSerializer):
         fields = ['id', 'course']
 
 
-class PostSerializer(serializers.ModelSerializer):
+class PostSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    user_full_name = serializers.SerializerMethodField()
+    # Được annotate trong PostViewSet, bài viết vừa tạo không có
+    reply_count = serializers.IntegerField(read_only=True)
+    last_reply_at = serializers.DateTimeField(read_only=True)
+
     class Meta:
         model = Post
-        fields = ['id', 'user', 'title', 'body', 'created_at']
+        fields = ['id', 'user', 'user_full_name', 'title', 'body', 'created_at', 'reply_count', 'last_reply_at']
         read_only_fields = ['user', 'created_at']
+        field_sources = {'user_full_name': ['user'], 'reply_count': [], 'last_reply_at': []}
+
+    def get_user_full_name(self, obj):
+        return f"{obj.user.first_name} {obj.user.last_name}"
 
 
 class ReplySerializer(serializers.ModelSerializer):
@@ -268,6 +362,7 @@ class ReplySerializer(serializers.ModelSerializer):
         read_only_fields = ['user', 'created_at']
 
     def get_user_full_name(self, obj):
+        # user đã được select_related trong ReplyViewSet
         return f"{obj.user.first_name} {obj.user.last_name}"
 
 
@@ -294,19 +389,6 @@ class EssayAnswerSerializer(serializers.ModelSerializer):
         return data
 
 
-class StudentAnswerSerializer(serializers.ModelSerializer):
-    class Meta:
-        model = StudentAnswer
-        fields = ['id', 'question', 'user', 'selected_answer', 'is_correct']
-        read_only_fields = ['is_correct']  # This field should be calculated automatically
-
-    def validate(self, data):
-        # Ensure the question is a multiple-choice question
-        if data['question'].type != 0:
-            raise serializers.ValidationError("Cannot add answers to an essay question.")
-        return data
-
-
 class StudentScoreSerializer(serializers.ModelSerializer):
     full_name = serializers.SerializerMethodField()
 
@@ -0,0 +1,353 @@
+# Các signal của app LMS
+# eLMS/LMS/signals.py
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .analysis import invalidate_item_analysis
+from .autocomplete import CATEGORY, COURSE, record_change
+from .caching import CATALOG_CATEGORIES, CATALOG_LIST, invalidate_catalog, invalidate_courses
+from .cards import refresh_course_card, refresh_course_cards, refresh_enrollment_count
+from .dashboard import invalidate_course_dashboards, invalidate_dashboards
+from .grading import invalidate_answer_key
+from .models import Answer, Category, Course, CourseMembership, Forum, Module, Notification, Post, ProgressJob, \
+    Question, Reply, ReplyNotificationJob, StudentAnswer, StudentScore, StudentSelection, Test, User
+from .notifications import change_unread_counts, reply_notification_sender
+from .push import publish_to_user
+from .search import index_course, index_courses
+from .serializers import NotificationSerializer
+
+
+# Đáp án thay đổi thì xóa cache đáp án của bài Test
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+def invalidate_question_answer_key(sender, instance, **kwargs):
+    invalidate_answer_key(instance.test_id)
+
+
+@receiver(post_save, sender=Answer)
+@receiver(post_delete, sender=Answer)
+def invalidate_answer_answer_key(sender, instance, **kwargs):
+    if Answer.question.is_cached(instance):
+        test_id = instance.question.test_id
+    else:
+        test_id = Question.objects.filter(id=instance.question_id).values_list('test_id', flat=True).first()
+    if test_id is not None:
+        invalidate_answer_key(test_id)
+
+
+# Xóa bit của lựa chọn bị xóa để vị trí đó có thể dùng lại cho lựa chọn mới
+@receiver(post_delete, sender=Answer)
+def clear_deleted_answer_selections(sender, instance, **kwargs):
+    StudentSelection.objects.filter(question_id=instance.question_id).update(
+        selected_mask=F('selected_mask').bitand(((1 << Answer.MAX_CHOICES) - 1) ^ (1 << instance.position))
+    )
+
+
+def _deleted_from(origin, *models):
+    """Whether a delete() (of an instance or a queryset) started from one of the given models."""
+    return isinstance(origin, models) or getattr(origin, 'model', None) in models
+
+
+# Dòng StudentAnswer (adminsite) bị xóa thì bỏ chọn lựa chọn đó trong StudentSelection và chấm lại
+@receiver(post_delete, sender=StudentAnswer)
+def clear_deleted_student_answer_selection(sender, instance, origin=None, **kwargs):
+    # Bị xóa theo câu hỏi / bài Test / người dùng thì StudentSelection và điểm cũng bị xóa theo, không chấm lại
+    if _deleted_from(origin, StudentAnswer):
+        instance.clear_selection_bit(instance.selected_answer_id)
+        instance.update_student_score()
+
+
+# Cập nhật bộ đếm số bài Test của khóa học
+@receiver(post_save, sender=Test)
+def increment_course_total_tests(sender, instance, created, **kwargs):
+    if created:
+        course_id = Module.objects.filter(id=instance.module_id).values_list('course_id', flat=True).first()
+        Course.objects.filter(id=course_id).update(total_tests=F('total_tests') + 1)
+        ProgressJob.enqueue_course(course_id)
+
+
+# Dùng pre_delete vì lúc này StudentScore của bài Test vẫn còn
+@receiver(pre_delete, sender=Test)
+def decrement_course_total_tests(sender, instance, origin=None, **kwargs):
+    course_id = Module.objects.filter(id=instance.module_id).values_list('course_id', flat=True).first()
+    Course.objects.filter(id=course_id, total_tests__gt=0).update(total_tests=F('total_tests') - 1)
+    CourseMembership.objects.filter(
+        course_id=course_id,
+        completed_tests__gt=0,
+        user__in=StudentScore.objects.filter(test=instance).values('user'),
+    ).update(completed_tests=F('completed_tests') - 1)
+    # Khóa học cũng đang bị xóa (theo khóa học/tác giả) thì không tạo công việc trỏ tới nó
+    if _deleted_from(origin, Test, Module):
+        ProgressJob.enqueue_course(course_id)
+
+
+# Xóa điểm của 1 học viên thì bài Test đó không còn tính là đã hoàn thành
+@receiver(post_delete, sender=StudentScore)
+def decrement_completed_tests(sender, instance, origin=None, **kwargs):
+    # Điểm bị xóa theo bài Test/khóa học/người dùng thì các receiver của chúng đã cập nhật bộ đếm
+    if not _deleted_from(origin, StudentScore):
+        return
+    course_id = Test.objects.filter(id=instance.test_id).values_list('module__course_id', flat=True).first()
+    CourseMembership.objects.filter(user_id=instance.user_id, course_id=course_id, completed_tests__gt=0) \
+        .update(completed_tests=F('completed_tests') - 1)
+    ProgressJob.enqueue(instance.user_id, course_id)
+
+
+# Có bài nộp mới thì phân tích câu hỏi của bài Test phải tính lại
+@receiver(post_save, sender=StudentScore)
+def invalidate_test_item_analysis(sender, instance, **kwargs):
+    invalidate_item_analysis(instance.test_id)
+
+
+# Cập nhật chỉ mục tìm kiếm khi khóa học, danh mục hoặc tên tác giả thay đổi
+@receiver(post_save, sender=Course)
+def index_saved_course(sender, instance, **kwargs):
+    index_course(instance.id)
+
+
+@receiver(m2m_changed, sender=Course.categories.through)
+def index_course_categories(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse:
+        # instance là Category, pk_set là id các khóa học
+        if action == 'pre_clear':
+            instance._course_ids = list(instance.courses.values_list('id', flat=True))
+        elif action == 'post_clear':
+            index_courses(getattr(instance, '_course_ids', []))
+        elif action in ('post_add', 'post_remove'):
+            index_courses(pk_set)
+    elif action in ('post_add', 'post_remove', 'post_clear'):
+        index_course(instance.id)
+
+
+@receiver(post_save, sender=Category)
+def index_category_courses(sender, instance, created, **kwargs):
+    if not created:
+        index_courses(instance.courses.values_list('id', flat=True))
+
+
+# Xóa danh mục/người dùng không gửi m2m_changed hay post_save cho khóa học nên phải lấy id trước khi xóa
+@receiver(pre_delete, sender=Category)
+def collect_category_courses(sender, instance, **kwargs):
+    instance._course_ids = list(instance.courses.values_list('id', flat=True))
+
+
+@receiver(pre_delete, sender=User)
+def collect_author_courses(sender, instance, **kwargs):
+    instance._course_ids = list(instance.courses.values_list('id', flat=True))
+
+
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=User)
+def index_orphaned_courses(sender, instance, **kwargs):
+    index_courses(getattr(instance, '_course_ids', []))
+
+
+@receiver(post_save, sender=User)
+def index_author_courses(sender, instance, created, update_fields, **kwargs):
+    # Đăng nhập chỉ cập nhật last_login, không cần đánh lại chỉ mục
+    if created or (update_fields is not None and not {'first_name', 'last_name'} & set(update_fields)):
+        return
+    index_courses(instance.courses.values_list('id', flat=True))
+
+
+# Xóa cache response của danh sách/chi tiết khóa học và danh mục khi dữ liệu hiển thị thay đổi
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+def invalidate_course_catalog(sender, instance, **kwargs):
+    invalidate_courses([instance.id])
+
+
+@receiver(m2m_changed, sender=Course.categories.through)
+def invalidate_course_categories_catalog(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        invalidate_courses([instance.id])
+    elif action == 'post_clear':
+        invalidate_courses(getattr(instance, '_course_ids', []))
+    else:
+        invalidate_courses(pk_set)
+
+
+@receiver(post_save, sender=Category)
+def invalidate_category_catalog(sender, instance, **kwargs):
+    # Chi tiết khóa học chỉ chứa id danh mục nên đổi tên danh mục không ảnh hưởng
+    invalidate_catalog(CATALOG_CATEGORIES, CATALOG_LIST)
+
+
+@receiver(post_delete, sender=Category)
+def invalidate_deleted_category_catalog(sender, instance, **kwargs):
+    invalidate_catalog(CATALOG_CATEGORIES)
+    invalidate_courses(getattr(instance, '_course_ids', []))
+
+
+# Các trường của tác giả có trong response khóa học (UserSerializer / CourseDetailSerializer)
+AUTHOR_CATALOG_FIELDS = {'email', 'gender', 'avatar', 'first_name', 'last_name', 'date_of_birth'}
+
+
+@receiver(post_save, sender=User)
+def invalidate_author_catalog(sender, instance, created, update_fields, **kwargs):
+    if created or (update_fields is not None and not AUTHOR_CATALOG_FIELDS & set(update_fields)):
+        return
+    course_ids = list(instance.courses.values_list('id', flat=True))
+    if course_ids:
+        invalidate_courses(course_ids)
+
+
+@receiver(post_delete, sender=User)
+def invalidate_deleted_author_catalog(sender, instance, **kwargs):
+    course_ids = getattr(instance, '_course_ids', [])
+    if course_ids:
+        invalidate_courses(course_ids)
+
+
+# Cập nhật CourseCard khi khóa học, danh mục, tác giả hoặc số thành viên thay đổi
+@receiver(post_save, sender=Course)
+def refresh_saved_course_card(sender, instance, **kwargs):
+    refresh_course_card(instance.id)
+
+
+@receiver(m2m_changed, sender=Course.categories.through)
+def refresh_course_categories_card(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        refresh_course_card(instance.id)
+    elif action == 'post_clear':
+        refresh_course_cards(getattr(instance, '_course_ids', []))
+    else:
+        refresh_course_cards(pk_set)
+
+
+@receiver(post_save, sender=Category)
+def refresh_category_cards(sender, instance, created, **kwargs):
+    if not created:
+        refresh_course_cards(instance.courses.values_list('id', flat=True))
+
+
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=User)
+def refresh_orphaned_cards(sender, instance, **kwargs):
+    refresh_course_cards(getattr(instance, '_course_ids', []))
+
+
+@receiver(post_save, sender=User)
+def refresh_author_cards(sender, instance, created, update_fields, **kwargs):
+    if created or (update_fields is not None and not AUTHOR_CATALOG_FIELDS & set(update_fields)):
+        return
+    refresh_course_cards(instance.courses.values_list('id', flat=True))
+
+
+@receiver(post_save, sender=CourseMembership)
+@receiver(post_delete, sender=CourseMembership)
+def refresh_card_enrollment_count(sender, instance, update_fields=None, **kwargs):
+    # Cập nhật tiến độ (update_fields không có is_active) không đổi số thành viên
+    if update_fields is not None and 'is_active' not in update_fields:
+        return
+    refresh_enrollment_count(instance.course_id)
+    invalidate_catalog(CATALOG_LIST)
+
+
+# Cập nhật chỉ mục gợi ý (autocomplete) khi tên khóa học/danh mục thay đổi
+@receiver(post_save, sender=Course)
+def autocomplete_saved_course(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or 'title' in update_fields:
+        record_change(COURSE, instance.id, instance.title)
+
+
+@receiver(post_delete, sender=Course)
+def autocomplete_deleted_course(sender, instance, **kwargs):
+    record_change(COURSE, instance.id)
+
+
+@receiver(post_save, sender=Category)
+def autocomplete_saved_category(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or 'name' in update_fields:
+        record_change(CATEGORY, instance.id, instance.name)
+
+
+@receiver(post_delete, sender=Category)
+def autocomplete_deleted_category(sender, instance, **kwargs):
+    record_change(CATEGORY, instance.id)
+
+
+# Trang tổng quan (dashboard) của học viên được cache theo từng người
+@receiver(post_save, sender=CourseMembership)
+@receiver(post_delete, sender=CourseMembership)
+@receiver(post_save, sender=StudentScore)
+@receiver(post_delete, sender=StudentScore)
+def invalidate_member_dashboard(sender, instance, **kwargs):
+    invalidate_dashboards([instance.user_id])
+
+
+@receiver(post_save, sender=Course)
+def invalidate_course_member_dashboards(sender, instance, created, **kwargs):
+    if not created:
+        invalidate_course_dashboards(instance.id)
+
+
+# Bài Test mới/bị xóa đổi "bài Test tiếp theo", bài viết/câu trả lời mới hoặc bị xóa đổi số hoạt động forum chưa đọc
+@receiver(post_save, sender=Test)
+@receiver(post_delete, sender=Test)
+def invalidate_test_dashboards(sender, instance, **kwargs):
+    invalidate_course_dashboards(Module.objects.filter(id=instance.module_id).values('course_id')[:1])
+
+
+@receiver(post_save, sender=Post)
+def invalidate_post_dashboards(sender, instance, created, **kwargs):
+    if created:
+        invalidate_course_dashboards(Forum.objects.filter(id=instance.forum_id).values('course_id')[:1])
+
+
+@receiver(post_delete, sender=Post)
+def invalidate_deleted_post_dashboards(sender, instance, origin=None, **kwargs):
+    # Xóa cả khóa học/forum thì membership cũng bị xóa và dashboard đã được làm mới
+    if _deleted_from(origin, Post):
+        invalidate_course_dashboards(Forum.objects.filter(id=instance.forum_id).values('course_id')[:1])
+
+
+@receiver(post_save, sender=Reply)
+def invalidate_reply_dashboards(sender, instance, created, **kwargs):
+    if created:
+        invalidate_course_dashboards(Post.objects.filter(id=instance.question_id).values('forum__course_id')[:1])
+
+
+@receiver(post_delete, sender=Reply)
+def invalidate_deleted_reply_dashboards(sender, instance, origin=None, **kwargs):
+    # Câu trả lời bị xóa theo bài viết thì invalidate_deleted_post_dashboards đã làm mới
+    if _deleted_from(origin, Reply):
+        invalidate_course_dashboards(Post.objects.filter(id=instance.question_id).values('forum__course_id')[:1])
+
+
+# Cập nhật bộ đếm thông báo chưa đọc (đánh dấu đã đọc qua API dùng notifications.mark_read)
+@receiver(post_save, sender=Notification)
+def increment_unread_notifications(sender, instance, created, **kwargs):
+    if created and not instance.is_read:
+        change_unread_counts({instance.user_id: 1})
+
+
+@receiver(post_delete, sender=Notification)
+def decrement_unread_notifications(sender, instance, **kwargs):
+    if not instance.is_read:
+        change_unread_counts({instance.user_id: -1})
+
+
+# Đẩy thông báo mới tới các kết nối /notifications/stream/ của người nhận sau khi transaction commit
+@receiver(post_save, sender=Notification)
+def push_new_notification(sender, instance, created, **kwargs):
+    if created:
+        data = NotificationSerializer(instance).data
+        transaction.on_commit(lambda: publish_to_user(instance.user_id, data))
+
+
+# Thông báo có câu trả lời mới được gộp trong ReplyNotificationJob (cùng transaction với câu trả lời)
+# và ghi hàng loạt ngoài request (xem notifications.py)
+@receiver(post_save, sender=Reply)
+def notify_post_author(sender, instance, created, **kwargs):
+    if created:
+        question = instance.question
+        replier_name = f"{instance.user.first_name} {instance.user.last_name}"
+        ReplyNotificationJob.enqueue(question.user_id, question.id, replier_name)
+        transaction.on_commit(reply_notification_sender.wake)
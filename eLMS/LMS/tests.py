@@ -1 +1,1086 @@
 # Create your tests here.
+import asyncio
+import io
+import json
+from datetime import timedelta
+from unittest.mock import patch
+
+import cloudinary
+from cloudinary import CloudinaryResource
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import AsyncClient, SimpleTestCase, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from oauth2_provider.models import AccessToken, Application
+from rest_framework.test import APIClient
+
+from .autocomplete import autocomplete_index
+from .grading import decode_selection, encode_selection, grade_student, load_answer_key, record_attempt, \
+    score_question
+from .media import AVATAR_VARIANTS, COVER_IMAGE_VARIANTS, build_media_urls, refresh_media_urls
+from .models import Answer, Category, Course, CourseCard, CourseMembership, Forum, Module, Notification, Post, \
+    ProgressJob, Question, Reply, ReplyNotificationJob, StudentAnswer, StudentScore, StudentSelection, Test, User
+from .notifications import send_reply_notifications
+from .search import search_courses
+
+
+class GradingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        author = User.objects.create_user(username='author@example.com', email='author@example.com',
+                                          password='password', role=1)
+        self.student = User.objects.create_user(username='student@example.com', email='student@example.com',
+                                                password='password')
+        course = Course.objects.create(title='Python', cover_image='cover', description='Mô tả', author=author)
+        module = Module.objects.create(course=course, title='Module 1', youtube_url='https://youtu.be/x',
+                                       description='Mô tả')
+        self.test = Test.objects.create(module=module, name='Bài 1', test_type=0)
+        # Câu 1: 1 đáp án đúng / 3, câu 2: 2 đáp án đúng / 4, câu 3: không có đáp án đúng
+        self.answers = []
+        for correct in ([True, False, False], [True, True, False, False], [False, False]):
+            question = Question.objects.create(test=self.test, content='Câu hỏi', type=0)
+            self.answers.append([Answer.objects.create(question=question, choice=f'Lựa chọn {i}', is_correct=is_correct)
+                                 for i, is_correct in enumerate(correct)])
+
+    def select(self, question_index, *answer_indexes):
+        answers = self.answers[question_index]
+        mask = 0
+        for i in answer_indexes:
+            mask |= 1 << answers[i].position
+        StudentSelection.objects.update_or_create(user=self.student, question_id=answers[0].question_id,
+                                                  defaults={'selected_mask': mask})
+
+    def test_score_question(self):
+        # Cùng quy tắc với cách chấm cũ: chọn thừa được 0, còn lại tính theo tỉ lệ đáp án đúng đã chọn
+        self.assertEqual(score_question({1, 2}, [1, 2], 4), 25)
+        self.assertEqual(score_question({1, 2}, [1], 4), 12.5)
+        self.assertEqual(score_question({1, 2}, [1, 3], 4), 12.5)
+        self.assertEqual(score_question({1, 2}, [1, 2, 3], 4), 0)
+        self.assertEqual(score_question(frozenset(), [], 4), 0)
+        self.assertEqual(score_question({1}, [], 1), 0)
+
+    def test_grade_student(self):
+        self.select(0, 0)
+        self.select(1, 0, 2)
+        self.select(2, 0)
+        self.assertAlmostEqual(grade_student(self.student, self.test).score, 100 / 3 + 100 / 3 / 2)
+
+        # Đổi đáp án đúng thì lần chấm sau dùng đáp án mới
+        answer = self.answers[1][2]
+        answer.is_correct = True
+        answer.save()
+        self.assertEqual(load_answer_key(self.test.id).correct[answer.question_id],
+                         {self.answers[1][0].id, self.answers[1][1].id, answer.id})
+        self.assertAlmostEqual(grade_student(self.student, self.test).score, 100 / 3 + 100 / 3 * 2 / 3)
+        self.assertAlmostEqual(float(StudentScore.objects.get(user=self.student, test=self.test).score),
+                               100 / 3 + 100 / 3 * 2 / 3, places=2)
+
+    def test_selection_bitmask(self):
+        answers = self.answers[1]
+        client = APIClient()
+        client.force_authenticate(self.student)
+        response = client.post('/student_answers/', {
+            'question': answers[0].question_id, 'selected_answer': json.dumps([answers[1].id, answers[3].id]),
+        })
+        self.assertEqual(response.status_code, 201)
+
+        selection = StudentSelection.objects.get(user=self.student, question_id=answers[0].question_id)
+        self.assertEqual(selection.selected_mask, 1 << answers[1].position | 1 << answers[3].position)
+        answer_key = load_answer_key(self.test.id)
+        self.assertEqual(decode_selection(answer_key, answers[0].question_id, selection.selected_mask),
+                         [answers[1].id, answers[3].id])
+        self.assertEqual(encode_selection(answer_key, answers[0].question_id, [answers[1].id, answers[3].id]),
+                         selection.selected_mask)
+
+    def test_admin_student_answer_rows(self):
+        answers = self.answers[0]
+        question_id = answers[0].question_id
+        row = StudentAnswer.objects.create(user=self.student, question_id=question_id, selected_answer=answers[1])
+        self.assertEqual(StudentSelection.objects.get(user=self.student, question_id=question_id).selected_mask,
+                         1 << answers[1].position)
+        self.assertEqual(StudentScore.objects.get(user=self.student, test=self.test).score, 0)
+
+        # Đổi lựa chọn: bit cũ được xóa, điểm chấm theo lựa chọn mới
+        row.selected_answer = answers[0]
+        row.save()
+        self.assertEqual(StudentSelection.objects.get(user=self.student, question_id=question_id).selected_mask,
+                         1 << answers[0].position)
+        self.assertAlmostEqual(float(StudentScore.objects.get(user=self.student, test=self.test).score), 100 / 3,
+                               places=2)
+
+        row.delete()
+        self.assertEqual(StudentSelection.objects.get(user=self.student, question_id=question_id).selected_mask, 0)
+        self.assertEqual(StudentScore.objects.get(user=self.student, test=self.test).score, 0)
+
+    def test_deleted_answer_bit_is_cleared(self):
+        answers = self.answers[1]
+        self.select(1, 1, 3)
+        position = answers[1].position
+        answers[1].delete()
+        selection = StudentSelection.objects.get(user=self.student, question_id=answers[0].question_id)
+        self.assertEqual(selection.selected_mask, 1 << answers[3].position)
+
+        # Lựa chọn mới dùng lại vị trí trống nhưng không bị coi là đã chọn
+        answer = Answer.objects.create(question_id=answers[0].question_id, choice='Lựa chọn mới', is_correct=False)
+        self.assertEqual(answer.position, position)
+        self.assertEqual(decode_selection(load_answer_key(self.test.id), answers[0].question_id,
+                                          selection.selected_mask), [answers[3].id])
+
+
+class TestSubmitTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        author = User.objects.create_user(username='author@example.com', email='author@example.com',
+                                          password='password', role=1)
+        self.student = User.objects.create_user(username='student@example.com', email='student@example.com',
+                                                password='password')
+        course = Course.objects.create(title='Python', cover_image='cover', description='Mô tả', author=author)
+        CourseMembership.objects.create(user=self.student, course=course, attend_date=timezone.now().date())
+        module = Module.objects.create(course=course, title='Module 1', youtube_url='https://youtu.be/x',
+                                       description='Mô tả')
+        self.test = Test.objects.create(module=module, name='Bài 1', test_type=0)
+        # Câu 1: 1 đáp án đúng / 2, câu 2: 2 đáp án đúng / 3
+        self.answers = []
+        for correct in ([True, False], [True, True, False]):
+            question = Question.objects.create(test=self.test, content='Câu hỏi', type=0)
+            self.answers.append([Answer.objects.create(question=question, choice=f'Lựa chọn {i}', is_correct=is_correct)
+                                 for i, is_correct in enumerate(correct)])
+        self.client = APIClient()
+        self.client.force_authenticate(self.student)
+
+    def submit(self, *selections):
+        return self.client.post(f'/tests/{self.test.id}/submit/', {'answers': [
+            {'question': answers[0].question_id, 'selected_answer': [answer.id for answer in answers]}
+            for answers in selections
+        ]}, format='json')
+
+    def test_score_and_resubmission(self):
+        response = self.submit(self.answers[0][:1], self.answers[1][:1])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual(response.data['score'], 75)
+        self.assertNotIn('over_selected', response.data)
+
+        # Nộp lại thay toàn bộ lần trước: câu 1 bỏ trống, câu 2 đúng hết
+        response = self.submit(self.answers[1][:2])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['score'], 50)
+        self.assertEqual(StudentScore.objects.get(user=self.student, test=self.test).score, 50)
+        self.assertFalse(StudentSelection.objects.filter(user=self.student,
+                                                         question_id=self.answers[0][0].question_id).exists())
+
+    def test_over_selected(self):
+        response = self.submit(self.answers[0], self.answers[1][:2])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['over_selected'], [self.answers[0][0].question_id])
+        self.assertIn('warning', response.data)
+        self.assertEqual(response.data['score'], 50)
+
+    def test_invalid_submissions(self):
+        other_test = Test.objects.create(module=self.test.module, name='Bài 2', test_type=0)
+        other_question = Question.objects.create(test=other_test, content='Câu hỏi', type=0)
+        other_answer = Answer.objects.create(question=other_question, choice='Lựa chọn', is_correct=True)
+        self.assertEqual(self.submit([other_answer]).status_code, 400)
+        self.assertEqual(self.submit(self.answers[0][:1], self.answers[0][1:]).status_code, 400)
+        # Lựa chọn của câu hỏi khác
+        response = self.client.post(f'/tests/{self.test.id}/submit/', {'answers': [
+            {'question': self.answers[0][0].question_id, 'selected_answer': [self.answers[1][0].id]},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(StudentScore.objects.filter(user=self.student).exists())
+
+        outsider = User.objects.create_user(username='outsider@example.com', email='outsider@example.com',
+                                            password='password')
+        self.client.force_authenticate(outsider)
+        self.assertEqual(self.submit(self.answers[0][:1]).status_code, 403)
+
+
+class RegradeCommandTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        author = User.objects.create_user(username='author@example.com', email='author@example.com',
+                                          password='password', role=1)
+        course = Course.objects.create(title='Python', cover_image='cover', description='Mô tả', author=author)
+        module = Module.objects.create(course=course, title='Module 1', youtube_url='https://youtu.be/x',
+                                       description='Mô tả')
+        self.test = Test.objects.create(module=module, name='Bài 1', test_type=0)
+        # Câu 1: 1 đáp án đúng / 3, câu 2: 2 đáp án đúng / 3
+        self.answers = []
+        for correct in ([True, False, False], [True, True, False]):
+            question = Question.objects.create(test=self.test, content='Câu hỏi', type=0)
+            self.answers.append([Answer.objects.create(question=question, choice=f'Lựa chọn {i}', is_correct=is_correct)
+                                 for i, is_correct in enumerate(correct)])
+
+        self.students = []
+        answer_key = load_answer_key(self.test.id)
+        for i, (first, second) in enumerate([([0], [0, 1]), ([1], [0]), ([], [0, 1])]):
+            student = User.objects.create_user(username=f'student{i}@example.com', email=f'student{i}@example.com',
+                                               password='password')
+            CourseMembership.objects.create(user=student, course=course, attend_date=timezone.now().date())
+            selections = {answers[0].question_id: [answers[index].id for index in indexes]
+                          for answers, indexes in zip(self.answers, (first, second)) if indexes}
+            record_attempt(student, self.test, answer_key, selections)
+            self.students.append(student)
+
+    def scores(self):
+        return [float(StudentScore.objects.get(user=student, test=self.test).score) for student in self.students]
+
+    def regrade(self, **options):
+        # Câu 1 có thêm 1 đáp án đúng, điểm đã lưu chưa đổi cho tới khi chấm lại
+        answer = self.answers[0][1]
+        answer.is_correct = True
+        answer.save()
+        self.assertEqual(self.scores(), [100, 25, 50])
+
+        jobs = ProgressJob.objects.count()
+        stdout = io.StringIO()
+        call_command('regrade', test=self.test.id, stdout=stdout, **options)
+        self.assertEqual(self.scores(), [75, 50, 50])
+        self.assertIn(f'Test {self.test.id}: 3 student(s), 2 changed', stdout.getvalue())
+        # Chấm lại không thêm bài đã hoàn thành và không tạo công việc tiến độ mới
+        self.assertEqual(list(CourseMembership.objects.values_list('completed_tests', flat=True)), [1, 1, 1])
+        self.assertEqual(ProgressJob.objects.count(), jobs)
+
+    def test_regrade(self):
+        self.regrade(workers=1)
+
+    def test_regrade_with_workers(self):
+        self.regrade(workers=2, chunk_size=1)
+
+    def test_unknown_test(self):
+        with self.assertRaises(CommandError):
+            call_command('regrade', test=0, stdout=io.StringIO())
+
+
+class ItemAnalysisTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author@example.com', email='author@example.com',
+                                               password='password', role=1)
+        course = Course.objects.create(title='Python', cover_image='cover', description='Mô tả', author=self.author)
+        module = Module.objects.create(course=course, title='Module 1', youtube_url='https://youtu.be/x',
+                                       description='Mô tả')
+        self.test = Test.objects.create(module=module, name='Bài 1', test_type=0)
+        # Câu 1: a0 đúng, a1 sai; câu 2: b0, b1 đúng, b2 sai
+        self.answers = []
+        for correct in ([True, False], [True, True, False]):
+            question = Question.objects.create(test=self.test, content='Câu hỏi', type=0)
+            self.answers.append([Answer.objects.create(question=question, choice=f'Lựa chọn {i}', is_correct=is_correct)
+                                 for i, is_correct in enumerate(correct)])
+        # Điểm: 100 (đúng cả 2), 75 (đúng câu 1, nửa câu 2), 50 (đúng câu 2), 0 (sai cả 2)
+        for first, second in [([0], [0, 1]), ([0], [0]), ([1], [0, 1]), ([1], [2])]:
+            self.submit(first, second)
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+
+    def submit(self, first, second):
+        index = User.objects.count()
+        student = User.objects.create_user(username=f'student{index}@example.com', email=f'student{index}@example.com',
+                                           password='password')
+        record_attempt(student, self.test, load_answer_key(self.test.id), {
+            answers[0].question_id: [answers[i].id for i in indexes]
+            for answers, indexes in zip(self.answers, (first, second))
+        })
+
+    def analysis(self):
+        response = self.client.get(f'/tests/{self.test.id}/item-analysis/')
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_statistics(self):
+        data = self.analysis()
+        self.assertEqual(data['attempts'], 4)
+        self.assertEqual(data['mean_score'], 56.25)
+        first, second = data['questions']
+
+        # Câu 1: học sinh 1, 2 làm đúng. Độ lệch chuẩn tổng điểm = sqrt(1367.1875) ≈ 36.9755
+        # point-biserial = (87.5 - 25) / 36.9755 * sqrt(0.5 * 0.5) ≈ 0.8452
+        self.assertEqual(first['difficulty'], 0.5)
+        self.assertEqual(first['mean_credit'], 0.5)
+        self.assertEqual(first['discrimination'], 0.8452)
+        self.assertEqual([(choice['is_correct'], choice['selection_rate']) for choice in first['choices']],
+                         [(True, 0.5), (False, 0.5)])
+
+        # Câu 2: học sinh 1, 3 làm đúng, học sinh 2 được nửa điểm câu này
+        # point-biserial = (75 - 37.5) / 36.9755 * sqrt(0.5 * 0.5) ≈ 0.5071
+        self.assertEqual(second['difficulty'], 0.5)
+        self.assertEqual(second['mean_credit'], 0.625)
+        self.assertEqual(second['discrimination'], 0.5071)
+        self.assertEqual([(choice['is_correct'], choice['selection_rate']) for choice in second['choices']],
+                         [(True, 0.75), (True, 0.5), (False, 0.25)])
+
+    def test_new_submission_invalidates_cache(self):
+        self.assertEqual(self.analysis()['attempts'], 4)
+        self.submit([0], [0, 1])
+        data = self.analysis()
+        self.assertEqual(data['attempts'], 5)
+        self.assertEqual(data['questions'][0]['difficulty'], 0.6)
+
+    def test_only_author(self):
+        student = User.objects.get(username='student1@example.com')
+        self.client.force_authenticate(student)
+        self.assertEqual(self.client.get(f'/tests/{self.test.id}/item-analysis/').status_code, 403)
+
+
+class QuestionImportTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author@example.com', email='author@example.com',
+                                               password='password', role=1)
+        self.student = User.objects.create_user(username='student@example.com', email='student@example.com',
+                                                password='password')
+        course = Course.objects.create(title='Python', cover_image='cover', description='Mô tả', author=self.author)
+        CourseMembership.objects.create(user=self.student, course=course, attend_date=timezone.now().date())
+        module = Module.objects.create(course=course, title='Module 1', youtube_url='https://youtu.be/x',
+                                       description='Mô tả')
+        self.test = Test.objects.create(module=module, name='Bài 1', test_type=0)
+        question = Question.objects.create(test=self.test, content='Câu hỏi có sẵn', type=0)
+        Answer.objects.create(question=question, choice='Lựa chọn', is_correct=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+
+    def imported(self):
+        questions = list(self.test.questions.filter(content__startswith='Câu mới').order_by('id'))
+        return [(question.content, [(answer.choice, answer.is_correct, answer.position)
+                                    for answer in question.answers.order_by('position')])
+                for question in questions]
+
+    def test_json_import(self):
+        # Đáp án đã được cache trước khi import
+        load_answer_key(self.test.id)
+        response = self.client.post(f'/tests/{self.test.id}/import/', {'questions': [
+            {'content': 'Câu mới 1', 'answers': [{'choice': 'A', 'is_correct': True}, {'choice': 'B'}]},
+            {'content': 'Câu mới 2', 'answers': [{'choice': 'C', 'is_correct': 'false'},
+                                                 {'choice': 'D', 'is_correct': 'đúng'}]},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data, {'test': self.test.id, 'num_questions': 3, 'questions_created': 2,
+                                         'answers_created': 4})
+        self.test.refresh_from_db()
+        self.assertEqual(self.test.num_questions, 3)
+        self.assertEqual(self.imported(), [
+            ('Câu mới 1', [('A', True, 0), ('B', False, 1)]),
+            ('Câu mới 2', [('C', False, 0), ('D', True, 1)]),
+        ])
+
+        # Nộp bài ngay sau khi import được chấm theo câu hỏi mới
+        question = self.test.questions.get(content='Câu mới 2')
+        client = APIClient()
+        client.force_authenticate(self.student)
+        response = client.post(f'/tests/{self.test.id}/submit/', {'answers': [
+            {'question': question.id, 'selected_answer': [question.answers.get(choice='D').id]},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertAlmostEqual(float(response.data['score']), 100 / 3, places=2)
+
+    def test_csv_import(self):
+        upload = SimpleUploadedFile('questions.csv', 'question,choice,is_correct\n'
+                                                     'Câu mới 1,A,1\n'
+                                                     ',B,0\n'
+                                                     'Câu mới 2,C,yes\n'
+                                                     'Câu mới 2,D,\n'.encode('utf-8-sig'), content_type='text/csv')
+        response = self.client.post(f'/tests/{self.test.id}/import/', {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['answers_created'], 4)
+        self.assertEqual(self.imported(), [
+            ('Câu mới 1', [('A', True, 0), ('B', False, 1)]),
+            ('Câu mới 2', [('C', True, 0), ('D', False, 1)]),
+        ])
+        self.test.refresh_from_db()
+        self.assertEqual(self.test.num_questions, 3)
+
+    def test_validation_errors(self):
+        response = self.client.post(f'/tests/{self.test.id}/import/', {'questions': [
+            {'content': '', 'answers': [{'choice': 'A', 'is_correct': True}]},
+            {'content': 'Câu mới 2', 'answers': []},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(len(response.data['errors']), 2)
+        self.assertTrue(response.data['errors'][0].startswith('Question 1:'))
+        self.assertTrue(response.data['errors'][1].startswith('Question 2:'))
+        self.assertEqual(self.test.questions.count(), 1)
+
+        response = self.client.post(f'/tests/{self.test.id}/import/', {'questions': [
+            {'content': 'Câu mới 1', 'answers': [{'choice': 'A', 'is_correct': 'có lẽ'}]},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+        self.client.force_authenticate(self.student)
+        response = self.client.post(f'/tests/{self.test.id}/import/', {'questions': []}, format='json')
+        self.assertEqual(response.status_code, 403)
+
+
+class TestFullTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author@example.com', email='author@example.com',
+                                               password='password', role=1)
+        self.student = User.objects.create_user(username='student@example.com', email='student@example.com',
+                                                password='password')
+        course = Course.objects.create(title='Python', cover_image='cover', description='Mô tả', author=self.author)
+        CourseMembership.objects.create(user=self.student, course=course, attend_date=timezone.now().date())
+        module = Module.objects.create(course=course, title='Module 1', youtube_url='https://youtu.be/x',
+                                       description='Mô tả')
+        self.test = Test.objects.create(module=module, name='Bài 1', test_type=0)
+        self.question = Question.objects.create(test=self.test, content='Câu hỏi', type=0)
+        self.answers = [Answer.objects.create(question=self.question, choice=f'Lựa chọn {i}', is_correct=i == 0)
+                        for i in range(2)]
+
+    def get(self, user, **headers):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client.get(f'/tests/{self.test.id}/full/', headers=headers)
+
+    def test_correct_answers_only_for_author(self):
+        question = self.get(self.student).data['questions'][0]
+        self.assertEqual(question['result'], 1)
+        self.assertEqual(question['answers'], [{'id': answer.id, 'choice': answer.choice} for answer in self.answers])
+
+        question = self.get(self.author).data['questions'][0]
+        self.assertEqual([answer['is_correct'] for answer in question['answers']], [True, False])
+
+        outsider = User.objects.create_user(username='outsider@example.com', email='outsider@example.com',
+                                            password='password')
+        self.assertEqual(self.get(outsider).status_code, 403)
+
+    def test_etag(self):
+        etag = self.get(self.student)['ETag']
+        self.assertEqual(self.get(self.student, **{'If-None-Match': etag}).status_code, 304)
+        # Giáo viên và học sinh thấy nội dung khác nhau nên ETag khác nhau
+        self.assertEqual(self.get(self.author, **{'If-None-Match': etag}).status_code, 200)
+
+        answer = Answer.objects.create(question=self.question, choice='Lựa chọn mới', is_correct=False)
+        response = self.get(self.student, **{'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['questions'][0]['answers']), 3)
+
+        etag = response['ETag']
+        self.answers[0].delete()
+        response = self.get(self.student, **{'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([choice['id'] for choice in response.data['questions'][0]['answers']],
+                         [self.answers[1].id, answer.id])
+
+
+class ProgressCounterTests(TestCase):
+    def setUp(self):
+        author = User.objects.create_user(username='author@example.com', email='author@example.com',
+                                          password='password', role=1)
+        self.student = User.objects.create_user(username='student@example.com', email='student@example.com',
+                                                password='password')
+        self.course = Course.objects.create(title='Python', cover_image='cover', description='Mô tả', author=author)
+        self.module = Module.objects.create(course=self.course, title='Module 1', youtube_url='https://youtu.be/x',
+                                            description='Mô tả')
+        self.membership = CourseMembership.objects.create(user=self.student, course=self.course,
+                                                          attend_date=timezone.now().date())
+        self.tests = [Test.objects.create(module=self.module, name=f'Bài {i}', test_type=0) for i in range(2)]
+        self.scores = [StudentScore.objects.create(user=self.student, test=test, score=100) for test in self.tests]
+
+    def progress(self):
+        ProgressJob.objects.update(run_after=timezone.now())
+        call_command('process_progress_jobs', '--once', stdout=io.StringIO())
+        self.membership.refresh_from_db()
+        return self.membership.completed_tests, self.membership.progress
+
+    def test_deleting_a_score(self):
+        self.assertEqual(self.progress(), (2, 100))
+        self.scores[0].delete()
+        self.assertEqual(self.progress(), (1, 50))
+
+    def test_adding_and_deleting_tests(self):
+        self.assertEqual(self.progress(), (2, 100))
+        Test.objects.create(module=self.module, name='Bài 2', test_type=0)
+        self.assertAlmostEqual(float(self.progress()[1]), 66.67, places=2)
+        self.tests[0].delete()
+        self.assertEqual(self.progress(), (1, 50))
+
+    def test_deleting_the_course(self):
+        self.course.delete()
+        self.assertFalse(ProgressJob.objects.exists())
+
+
+class CourseSearchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        author = User.objects.create_user(username='author@example.com', email='author@example.com',
+                                          password='password', role=1)
+        for title in ('Programming basics', 'Lập trình Python', 'Lập trình Java'):
+            Course.objects.create(title=title, cover_image='cover', description='Mô tả', author=author,
+                                  is_active=True)
+
+    def search(self, q):
+        return sorted(course['title'] for course in APIClient().get('/courses/', {'q': q}).data['courses'])
+
+    def test_last_word_matches_as_prefix(self):
+        self.assertEqual(self.search('prog'), ['Programming basics'])
+        self.assertEqual(self.search('programming'), ['Programming basics'])
+        self.assertEqual(self.search('lap trinh py'), ['Lập trình Python'])
+        self.assertEqual(self.search('Lập trình'), ['Lập trình Java', 'Lập trình Python'])
+        # Các từ trước từ cuối vẫn phải khớp nguyên từ
+        self.assertEqual(self.search('la trinh'), [])
+
+
+class CoursePaginationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        author = User.objects.create_user(username='author@example.com', email='author@example.com',
+                                          password='password', role=1)
+        for i in range(7):
+            # Mô tả lặp "python" i lần để các khóa học có độ liên quan khác nhau
+            Course.objects.create(title=f'Khóa học {i}', cover_image='cover', description='python ' * (i % 3),
+                                  author=author, is_active=True)
+        # Nhiều khóa học cùng created_at: thứ tự phải được phân định bằng id
+        created_at = timezone.now()
+        CourseCard.objects.filter(course__title__in=['Khóa học 1', 'Khóa học 2', 'Khóa học 3']) \
+            .update(created_at=created_at)
+
+    def walk(self, **params):
+        titles = []
+        response = APIClient().get('/courses/', {**params, 'page_size': 2})
+        while True:
+            self.assertEqual(response.status_code, 200)
+            self.assertLessEqual(len(response.data['courses']), 2)
+            titles.extend(course['title'] for course in response.data['courses'])
+            if response.data['next'] is None:
+                return titles
+            response = APIClient().get(response.data['next'])
+
+    def expected(self, queryset):
+        return list(queryset.values_list('title', flat=True))
+
+    def test_sort_orders(self):
+        self.assertEqual(self.walk(), self.expected(CourseCard.objects.order_by('created_at', 'pk')))
+        self.assertEqual(self.walk(sort='latest'), self.expected(CourseCard.objects.order_by('-created_at', '-pk')))
+        by_rank = search_courses(CourseCard.objects.all(), 'python', relation='course__search_terms')
+        self.assertEqual(self.walk(q='python'), self.expected(by_rank))
+        self.assertEqual(len(self.walk(q='python')), 4)
+
+    def test_invalid_cursor(self):
+        self.assertEqual(APIClient().get('/courses/', {'cursor': 'không hợp lệ'}).status_code, 404)
+
+
+class QueryBudgetTestCase(TestCase):
+    """Check that an endpoint runs the same number of queries whatever the size of its result."""
+
+    def setUp(self):
+        # Response được cache thì không chạy truy vấn nào
+        cache.clear()
+
+    def assertQueryBudget(self, budget, url, client=None, data=None):
+        client = client or APIClient()
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(url, data)
+        self.assertEqual(response.status_code, 200)
+        queries = '\n'.join(query['sql'] for query in context.captured_queries)
+        self.assertEqual(len(context), budget, f"{url} ran {len(context)} queries, budget is {budget}:\n{queries}")
+        return response
+
+
+class CourseQueryBudgetTests(QueryBudgetTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.student = User.objects.create_user(username='student@example.com', email='student@example.com',
+                                               password='password', first_name='Học', last_name='Sinh')
+        cls.categories = [Category.objects.create(name=f'Danh mục {i}') for i in range(3)]
+
+    def create_courses(self, count):
+        start = Course.objects.count()
+        for i in range(start, start + count):
+            author = User.objects.create_user(username=f'author{i}@example.com', email=f'author{i}@example.com',
+                                              password='password', role=1, avatar='avatar')
+            course = Course.objects.create(title=f'Lập trình {i}', cover_image='cover', description='Mô tả',
+                                           author=author, is_active=True)
+            course.categories.set(self.categories)
+            CourseMembership.objects.create(user=self.student, course=course, attend_date=timezone.now().date())
+
+    def student_client(self):
+        client = APIClient()
+        client.force_authenticate(self.student)
+        return client
+
+    def test_course_list(self):
+        # Chỉ đọc bảng CourseCard
+        self.create_courses(1)
+        self.assertQueryBudget(1, '/courses/')
+        self.create_courses(19)
+        response = self.assertQueryBudget(1, '/courses/')
+        self.assertEqual(len(response.data['courses']), 20)
+
+    def test_course_search(self):
+        self.create_courses(1)
+        self.assertQueryBudget(1, '/courses/', data={'q': 'lap trinh'})
+        self.create_courses(19)
+        response = self.assertQueryBudget(1, '/courses/', data={'q': 'lap trinh'})
+        self.assertEqual(len(response.data['courses']), 20)
+
+    def test_course_detail(self):
+        self.create_courses(1)
+        course = Course.objects.get()
+        response = self.assertQueryBudget(2, f'/courses/{course.id}/')
+        self.assertEqual(response.data['categories'], [category.id for category in self.categories])
+
+    def test_user_membership_courses(self):
+        self.create_courses(1)
+        self.assertQueryBudget(1, '/user-membership-courses/', client=self.student_client())
+        self.create_courses(19)
+        response = self.assertQueryBudget(1, '/user-membership-courses/', client=self.student_client())
+        self.assertEqual(len(response.data), 20)
+
+
+class CatalogCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author@example.com', email='author@example.com',
+                                               password='password', role=1, first_name='Thầy', avatar='avatar')
+        self.category = Category.objects.create(name='Lập trình')
+        self.course = Course.objects.create(title='Python', cover_image='cover', description='Mô tả',
+                                            author=self.author, is_active=True)
+        self.client = APIClient()
+
+    def assertCached(self, url, data=None):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, data)
+        self.assertEqual(len(context), 0, f"{url} was not served from cache")
+        return response
+
+    def test_course_list_invalidated_by_course_save(self):
+        self.client.get('/courses/')
+        self.assertCached('/courses/')
+        self.course.title = 'Django'
+        self.course.save()
+        response = self.client.get('/courses/')
+        self.assertEqual(response.data['courses'][0]['title'], 'Django')
+
+    def test_query_params_are_normalized(self):
+        self.client.get('/courses/', {'q': 'Python'})
+        self.assertCached('/courses/', {'q': ' python '})
+
+    def test_course_detail_invalidated_by_categories_and_author(self):
+        url = f'/courses/{self.course.id}/'
+        self.client.get(url)
+        self.assertCached(url)
+        self.course.categories.add(self.category)
+        self.assertEqual(self.client.get(url).data['categories'], [self.category.id])
+
+        self.author.email = 'new@example.com'
+        self.author.save()
+        self.assertEqual(self.client.get(url).data['author']['email'], 'new@example.com')
+
+        # Đăng nhập chỉ cập nhật last_login, không làm mất cache
+        self.author.last_login = timezone.now()
+        self.author.save(update_fields=['last_login'])
+        self.assertCached(url)
+
+    def test_categories_invalidated_by_category_save(self):
+        self.client.get('/categories/')
+        self.assertCached('/categories/')
+        Category.objects.create(name='Đồ họa')
+        self.assertEqual(len(self.client.get('/categories/').data), 2)
+
+    def test_stats(self):
+        admin = User.objects.create_superuser(username='admin@example.com', email='admin@example.com',
+                                              password='password')
+        self.client.get('/categories/')
+        self.client.get('/categories/')
+        self.client.force_authenticate(admin)
+        stats = self.client.get('/catalog-cache-stats/').data
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+
+
+class CourseFacetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.web = Category.objects.create(name='Web')
+        self.data = Category.objects.create(name='Data')
+        self.authors = [
+            User.objects.create_user(username=f'author{i}@example.com', email=f'author{i}@example.com',
+                                     password='password', role=1, first_name='Tác', last_name=f'Giả {i}')
+            for i in range(2)
+        ]
+        for i in range(4):
+            course = Course.objects.create(title=f'Python {i}', cover_image='cover', description='Mô tả',
+                                           author=self.authors[i % 2], is_active=True)
+            course.categories.set([self.web] if i < 3 else [self.web, self.data])
+        Course.objects.create(title='Java', cover_image='cover', description='Mô tả', author=self.authors[0])
+
+    def test_facets_follow_query(self):
+        with CaptureQueriesContext(connection) as context:
+            response = APIClient().get('/courses/', {'q': 'python', 'facets': '1', 'page_size': 1})
+        # 1 truy vấn trang khóa học + 1 truy vấn UNION cho cả hai facet
+        self.assertEqual(len(context), 2)
+        facets = response.data['facets']
+        self.assertEqual(facets['categories'], [
+            {'id': self.web.id, 'name': 'Web', 'count': 4},
+            {'id': self.data.id, 'name': 'Data', 'count': 1},
+        ])
+        self.assertEqual(facets['authors'], [
+            {'id': self.authors[0].id, 'name': 'Tác Giả 0', 'count': 2},
+            {'id': self.authors[1].id, 'name': 'Tác Giả 1', 'count': 2},
+        ])
+
+    def test_facets_are_optional(self):
+        self.assertNotIn('facets', APIClient().get('/courses/').data)
+
+    def test_all_facet_values(self):
+        with patch('LMS.views.MAX_FACET_VALUES', 1):
+            top = APIClient().get('/courses/', {'facets': '1', 'page_size': 1}).data['facets']
+            every = APIClient().get('/courses/', {'facets': 'all', 'page_size': 1}).data['facets']
+        self.assertEqual([facet['name'] for facet in top['categories']], ['Web'])
+        self.assertEqual([facet['name'] for facet in every['categories']], ['Web', 'Data'])
+
+
+class AutocompleteTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name='Lập trình web')
+        self.course = Course.objects.create(title='Python cơ bản', cover_image='cover', description='Mô tả')
+        autocomplete_index.build()
+
+    def suggest(self, q):
+        with CaptureQueriesContext(connection) as context:
+            response = APIClient().get('/autocomplete/', {'q': q})
+        # Trả lời từ chỉ mục trong bộ nhớ, không chạm CSDL
+        self.assertEqual(len(context), 0)
+        return [(item['type'], item['label']) for item in response.data['results']]
+
+    def test_prefix_of_any_word(self):
+        self.assertEqual(self.suggest('lap'), [('category', 'Lập trình web')])
+        self.assertEqual(self.suggest('Web'), [('category', 'Lập trình web')])
+        self.assertEqual(self.suggest('co b'), [('course', 'Python cơ bản')])
+        self.assertEqual(self.suggest('java'), [])
+
+    def test_updated_by_signals(self):
+        self.course.title = 'Java nâng cao'
+        self.course.save()
+        self.assertEqual(self.suggest('python'), [])
+        self.assertEqual(self.suggest('jav'), [('course', 'Java nâng cao')])
+        self.category.delete()
+        self.assertEqual(self.suggest('lap'), [])
+
+
+class DashboardTests(QueryBudgetTestCase):
+    def setUp(self):
+        super().setUp()
+        self.teacher = User.objects.create_user(username='teacher@example.com', email='teacher@example.com',
+                                                password='password', role=1)
+        self.student = User.objects.create_user(username='student@example.com', email='student@example.com',
+                                                password='password')
+        self.client = APIClient()
+        self.client.force_authenticate(self.student)
+
+    def create_course(self, title, tests=2):
+        course = Course.objects.create(title=title, cover_image='cover', description='Mô tả', author=self.teacher,
+                                       is_active=True)
+        module = Module.objects.create(course=course, title='Module', youtube_url='https://youtu.be/x', description='')
+        for i in range(tests):
+            Test.objects.create(module=module, name=f'{title} - Test {i}')
+        CourseMembership.objects.create(user=self.student, course=course, attend_date=timezone.now().date())
+        return course
+
+    def test_query_budget(self):
+        self.create_course('Python')
+        self.assertQueryBudget(1, '/me/dashboard/', client=self.client)
+        cache.clear()
+        for i in range(5):
+            self.create_course(f'Java {i}')
+        response = self.assertQueryBudget(1, '/me/dashboard/', client=self.client)
+        self.assertEqual(len(response.data['courses']), 6)
+
+    def test_next_test_and_unread_forum_activity(self):
+        course = self.create_course('Python')
+        first, second = Test.objects.filter(module__course=course).order_by('id')
+        forum = Forum.objects.get(course=course)
+        post = Post.objects.create(forum=forum, user=self.teacher, title='Câu hỏi', body='Nội dung')
+        Reply.objects.create(question=post, user=self.teacher, body='Trả lời')
+        Reply.objects.create(question=post, user=self.student, body='Cảm ơn')
+
+        data = self.client.get('/me/dashboard/').data['courses'][0]
+        self.assertEqual(data['next_test']['id'], first.id)
+        self.assertEqual(data['unread_forum_activity'], 2)
+
+        # Xóa câu trả lời cũng làm mới số hoạt động chưa đọc
+        Reply.objects.filter(user=self.teacher).first().delete()
+        self.assertEqual(self.client.get('/me/dashboard/').data['courses'][0]['unread_forum_activity'], 1)
+
+        # Có điểm bài Test và đã xem forum thì cache dashboard phải được làm mới
+        StudentScore.objects.create(user=self.student, test=first, score=10)
+        self.client.get(f'/forums/{forum.id}/posts/')
+        self.assertEqual(self.client.get('/me/dashboard/').data['courses'][0]['unread_forum_activity'], 1)
+        self.assertEqual(self.client.post(f'/forums/{forum.id}/posts/mark-read/').status_code, 204)
+        data = self.client.get('/me/dashboard/').data['courses'][0]
+        self.assertEqual(data['next_test']['id'], second.id)
+        self.assertEqual(data['unread_forum_activity'], 0)
+
+        with CaptureQueriesContext(connection) as context:
+            self.client.get('/me/dashboard/')
+        self.assertEqual(len(context), 0)
+
+
+class MediaUrlTests(SimpleTestCase):
+    def setUp(self):
+        self.base = f'https://res.cloudinary.com/{cloudinary.config().cloud_name}/image/upload/'
+
+    def test_build_media_urls(self):
+        self.assertEqual(build_media_urls('lms/cover', COVER_IMAGE_VARIANTS), {
+            'original': f'{self.base}v1/lms/cover',
+            'card': f'{self.base}c_fill,h_270,w_480/v1/lms/cover',
+            'thumbnail': f'{self.base}c_fill,h_90,w_160/v1/lms/cover',
+        })
+        # versioned=True giữ version và định dạng của ảnh gốc
+        urls = build_media_urls(CloudinaryResource('lms/cover', version=123, format='png'), COVER_IMAGE_VARIANTS,
+                                versioned=True)
+        self.assertEqual(urls['original'], f'{self.base}v123/lms/cover.png')
+        self.assertEqual(urls['card'], f'{self.base}c_fill,h_270,w_480/v1/lms/cover')
+
+        self.assertEqual(build_media_urls(None, AVATAR_VARIANTS), {})
+        self.assertEqual(build_media_urls('', AVATAR_VARIANTS), {})
+
+    def test_refresh_media_urls(self):
+        course = Course(title='Python', cover_image='lms/cover')
+        # Không lưu ảnh thì không đổi link
+        self.assertEqual(refresh_media_urls(course, 'cover_image', 'cover_image_urls', COVER_IMAGE_VARIANTS,
+                                            versioned=True, update_fields=['title']), ['title'])
+        self.assertEqual(course.cover_image_urls, {})
+
+        update_fields = refresh_media_urls(course, 'cover_image', 'cover_image_urls', COVER_IMAGE_VARIANTS,
+                                           versioned=True, update_fields=['cover_image'])
+        self.assertEqual(update_fields, ['cover_image', 'cover_image_urls'])
+        self.assertEqual(course.cover_image_urls['thumbnail'], f'{self.base}c_fill,h_90,w_160/v1/lms/cover')
+
+    def test_fallback_without_stored_urls(self):
+        # Dòng cũ chưa có link tính sẵn: dựng link từ ảnh, không có ảnh thì trả về None
+        user = User(username='student@example.com', avatar='lms/avatar')
+        self.assertEqual(user.avatar_urls, {})
+        self.assertEqual(user.get_avatar_url('thumbnail'), f'{self.base}c_fill,g_face,h_150,w_150/v1/lms/avatar')
+        self.assertIsNone(User(username='other@example.com').get_avatar_url())
+
+        course = Course(title='Python', cover_image='lms/cover', cover_image_urls={'original': 'stored'})
+        self.assertEqual(course.get_cover_image_url(), 'stored')
+        self.assertIsNone(Course(title='Python').get_cover_image_url('card'))
+
+
+class SparseFieldsetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author@example.com', email='author@example.com',
+                                               password='password', role=1)
+        self.course = Course.objects.create(title='Python', cover_image='cover', description='Mô tả',
+                                            author=self.author, is_active=True)
+        self.module = Module.objects.create(course=self.course, title='Module 1', youtube_url='https://youtu.be/x',
+                                            description='<p>Bài giảng rất dài</p>')
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+
+    def get(self, url, data):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, data)
+        self.assertEqual(response.status_code, 200)
+        return response.data, ' '.join(query['sql'] for query in context.captured_queries)
+
+    def test_fields_trim_response_and_columns(self):
+        url = f'/courses/{self.course.id}/module/{self.module.id}/'
+        data, sql = self.get(url, {'fields': 'id,title'})
+        self.assertEqual(data, {'id': self.module.id, 'title': 'Module 1'})
+        self.assertNotIn('"description"', sql)
+
+        data, sql = self.get(url, {})
+        self.assertEqual(data['description'], '<p>Bài giảng rất dài</p>')
+
+    def test_method_fields_and_ordering_columns(self):
+        data, sql = self.get('/courses/', {'fields': 'id,title', 'sort': 'latest'})
+        self.assertEqual(data['courses'], [{'id': self.course.id, 'title': 'Python'}])
+        self.assertNotIn('"description"', sql)
+
+        data, sql = self.get(f'/courses/{self.course.id}/', {'fields': 'id,author'})
+        self.assertEqual(data['author']['id'], self.author.id)
+        self.assertNotIn('"description"', sql)
+
+
+class ForumPaginationTests(QueryBudgetTestCase):
+    def setUp(self):
+        super().setUp()
+        self.teacher = User.objects.create_user(username='teacher@example.com', email='teacher@example.com',
+                                                password='password', role=1, first_name='Thầy', last_name='Giáo')
+        course = Course.objects.create(title='Python', cover_image='cover', description='Mô tả', author=self.teacher)
+        self.forum = Forum.objects.get(course=course)
+        self.client = APIClient()
+        self.client.force_authenticate(self.teacher)
+
+    def create_posts(self, count, replies=2):
+        for i in range(count):
+            post = Post.objects.create(forum=self.forum, user=self.teacher, title=f'Câu hỏi {i}', body='Nội dung')
+            for j in range(replies):
+                Reply.objects.create(question=post, user=self.teacher, body=f'Trả lời {j}')
+
+    def test_posts_query_budget(self):
+        # Kiểm tra quyền + 1 truy vấn trang bài viết (kèm số câu trả lời)
+        self.create_posts(1)
+        self.assertQueryBudget(2, f'/forums/{self.forum.id}/posts/', client=self.client)
+        self.create_posts(24)
+        response = self.assertQueryBudget(2, f'/forums/{self.forum.id}/posts/', client=self.client)
+        page = response.data['results']
+        self.assertEqual(len(page), 20)
+        self.assertEqual(page[0]['title'], 'Câu hỏi 23')
+        self.assertEqual((page[0]['reply_count'], page[0]['user_full_name']), (2, 'Thầy Giáo'))
+        self.assertIsNotNone(page[0]['last_reply_at'])
+
+        response = self.client.get(response.data['next'])
+        self.assertEqual(len(response.data['results']), 5)
+        self.assertIsNone(response.data['next'])
+
+    def test_replies_query_budget(self):
+        self.create_posts(1, replies=30)
+        post = Post.objects.get()
+        response = self.assertQueryBudget(2, f'/posts/{post.id}/replies/', client=self.client)
+        self.assertEqual([reply['body'] for reply in response.data['results'][:2]], ['Trả lời 0', 'Trả lời 1'])
+        self.assertEqual(len(self.client.get(response.data['next']).data['results']), 10)
+
+
+class NotificationStreamTests(TransactionTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='student@example.com', email='student@example.com',
+                                             password='password')
+        application = Application.objects.create(client_type=Application.CLIENT_CONFIDENTIAL,
+                                                  authorization_grant_type=Application.GRANT_PASSWORD)
+        self.token = AccessToken.objects.create(user=self.user, application=application, token='token',
+                                                expires=timezone.now() + timedelta(hours=1)).token
+
+    async def read_event(self, stream):
+        while True:
+            chunk = (await anext(stream)).decode()
+            if chunk.startswith('id:'):
+                return json.loads(chunk.split('data: ', 1)[1])
+
+    async def test_new_notifications_are_pushed(self):
+        old = await Notification.objects.acreate(user=self.user, message='Cũ')
+        response = await AsyncClient().get('/notifications/stream/', {'access_token': self.token},
+                                           headers={'Last-Event-ID': str(old.id - 1)})
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = aiter(response.streaming_content)
+        # Thông báo tạo trong lúc mất kết nối được gửi lại, sau đó là thông báo mới
+        self.assertEqual((await asyncio.wait_for(self.read_event(stream), 5))['message'], 'Cũ')
+        await Notification.objects.acreate(user=self.user, message='Mới')
+        self.assertEqual((await asyncio.wait_for(self.read_event(stream), 5))['message'], 'Mới')
+        await stream.aclose()
+
+    async def test_requires_token(self):
+        response = await AsyncClient().get('/notifications/stream/', {'access_token': 'wrong'})
+        self.assertEqual(response.status_code, 401)
+
+    def test_wsgi_falls_back_to_polling(self):
+        self.assertEqual(APIClient().get('/notifications/stream/').status_code, 501)
+
+
+class ReplyNotificationTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author@example.com', email='author@example.com',
+                                               password='password', role=1)
+        self.students = [
+            User.objects.create_user(username=f'student{i}@example.com', email=f'student{i}@example.com',
+                                     password='password', first_name='Học', last_name=f'Sinh {i}')
+            for i in range(2)
+        ]
+        course = Course.objects.create(title='Python', cover_image='cover', description='Mô tả', author=self.author)
+        forum = Forum.objects.get(course=course)
+        self.posts = [Post.objects.create(forum=forum, user=self.author, title=f'Câu hỏi {i}', body='Nội dung')
+                      for i in range(2)]
+
+    def reply(self, post, student):
+        # Không chạy on_commit nên thread gửi thông báo không được bật
+        Reply.objects.create(question=post, user=student, body='Trả lời')
+
+    def test_replies_are_coalesced_per_post(self):
+        for student in self.students + self.students[:1]:
+            self.reply(self.posts[0], student)
+        self.reply(self.posts[1], self.students[1])
+        # Tạo câu trả lời không ghi thông báo nào, chỉ 1 công việc chờ cho mỗi bài viết
+        self.assertFalse(Notification.objects.exists())
+        self.assertEqual(dict(ReplyNotificationJob.objects.values_list('post_id', 'reply_count')),
+                         {self.posts[0].id: 3, self.posts[1].id: 1})
+
+        with CaptureQueriesContext(connection) as context:
+            send_reply_notifications(force=True)
+        # 1 INSERT cho cả lô
+        self.assertEqual(len([query for query in context.captured_queries if query['sql'].startswith('INSERT')]), 1)
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.unread_notifications, 2)
+        self.assertEqual(sorted(Notification.objects.filter(user=self.author).values_list('message', flat=True)), [
+            "Có 3 câu trả lời mới cho câu hỏi 'Câu hỏi 0', mới nhất từ Học Sinh 0",
+            "Học Sinh 1 đã trả lời câu hỏi 'Câu hỏi 1'",
+        ])
+        self.assertFalse(ReplyNotificationJob.objects.exists())
+        self.assertEqual(send_reply_notifications(force=True), [])
+
+        # Câu trả lời sau khi đã gửi bắt đầu 1 thông báo mới
+        self.reply(self.posts[0], self.students[1])
+        self.assertEqual(ReplyNotificationJob.objects.get().reply_count, 1)
+
+    def test_readback_without_returning_ids(self):
+        # Giả lập MySQL: bulk_create không trả về id, chỉ đọc lại đúng các thông báo của lô
+        other = Notification.objects.create(user=self.author, message='Thông báo khác')
+        self.reply(self.posts[0], self.students[0])
+        with patch.object(type(connection.features), 'can_return_rows_from_bulk_insert', False):
+            notifications = send_reply_notifications(force=True)
+        self.assertEqual(len(notifications), 1)
+        self.assertNotEqual(notifications[0].id, other.id)
+        self.assertEqual(notifications[0].message, "Học Sinh 0 đã trả lời câu hỏi 'Câu hỏi 0'")
+
+    def test_command_waits_for_window(self):
+        self.reply(self.posts[0], self.students[0])
+        out = io.StringIO()
+        call_command('send_reply_notifications', '--once', stdout=out)
+        self.assertFalse(Notification.objects.exists())
+
+        ReplyNotificationJob.objects.update(run_after=timezone.now())
+        call_command('send_reply_notifications', '--once', stdout=out)
+        self.assertEqual(Notification.objects.get().user, self.author)
+        self.assertIn("Sent 1 reply notification(s).", out.getvalue())
+
+
+class UnreadNotificationCountTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='student@example.com', email='student@example.com',
+                                             password='password')
+        application = Application.objects.create(client_type=Application.CLIENT_CONFIDENTIAL,
+                                                 authorization_grant_type=Application.GRANT_PASSWORD)
+        AccessToken.objects.create(user=self.user, application=application, token='token',
+                                   expires=timezone.now() + timedelta(hours=1))
+        # Đăng nhập bằng token thật: mỗi request đọc lại user (và bộ đếm) từ database
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer token')
+
+    def get_count(self, **headers):
+        return self.client.get('/notifications/unread-count/', headers=headers)
+
+    def test_counter_follows_created_read_and_deleted_notifications(self):
+        notifications = [Notification.objects.create(user=self.user, message=f'Thông báo {i}') for i in range(4)]
+        self.assertEqual(self.get_count().data, {'unread_count': 4})
+
+        response = self.client.patch(f'/notifications/{notifications[0].id}/', {'is_read': True}, format='json')
+        self.assertEqual(response.status_code, 200)
+        # PUT cũng đi qua mark_read
+        response = self.client.put(f'/notifications/{notifications[1].id}/', {'is_read': True}, format='json')
+        self.assertEqual(response.status_code, 200)
+        notifications[2].delete()
+        self.assertEqual(self.get_count().data, {'unread_count': 1})
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.unread_notifications, 1)
+
+    def test_etag(self):
+        response = self.get_count()
+        self.assertEqual(response.data, {'unread_count': 0})
+        self.assertEqual(self.get_count(**{'If-None-Match': response['ETag']}).status_code, 304)
+
+        Notification.objects.create(user=self.user, message='Thông báo mới')
+        response = self.get_count(**{'If-None-Match': response['ETag']})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {'unread_count': 1})
+
+    def test_no_query_besides_authentication(self):
+        # Bộ đếm nằm trên dòng user mà bước xác thực token đã đọc, không cần cache riêng
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(self.get_count().status_code, 200)
+        self.assertEqual(len(context.captured_queries), 1)
+        self.assertIn('oauth2_provider_accesstoken', context.captured_queries[0]['sql'])
@@ -0,0 +1,18 @@
+# Chuẩn hóa chuỗi tiếng Việt để tìm kiếm không phân biệt dấu
+# eLMS/LMS/text.py
+import re
+import unicodedata
+
+WHITESPACE_RE = re.compile(r'\s+')
+
+# Các chữ không tách được dấu bằng NFD
+SPECIAL_LETTERS = str.maketrans({'đ': 'd', 'Đ': 'd'})
+
+
+def normalize_text(text):
+    """Return the text lowercased, without diacritics and with whitespace collapsed ("Lập Trình" -> "lap trinh")."""
+    if not text:
+        return ''
+    text = unicodedata.normalize('NFD', text.translate(SPECIAL_LETTERS))
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return WHITESPACE_RE.sub(' ', text).strip().lower()
@@ -4,7 +4,8 @@ from django.urls import path, include
 from .views import CategoryListView, CourseListView, UserViewSet, CurrentUserViewSet, CourseCreateView, ModuleViewSet, \
     CourseMembershipViewSet, TestViewSet, QuestionViewSet, AnswerViewSet, NotificationViewSet, ForumViewSet, \
     PostViewSet, ReplyViewSet, FileViewSet, EssayAnswerViewSet, StudentAnswerViewSet, StudentScoreViewSet, \
-    PasswordResetViewSet, CourseDetailView, UserCourseMembershipView, TeacherRegisterViewSet
+    PasswordResetViewSet, CourseDetailView, UserCourseMembershipView, TeacherRegisterViewSet, TestDetailViewSet, \
+    CatalogCacheStatsView, AutocompleteView, DashboardView, notification_stream
 from rest_framework.routers import DefaultRouter
 
 router = DefaultRouter()
@@ -28,11 +29,17 @@ router.register(r'modules/(?P<module_id>\d+)/files', FileViewSet, basename='modu
 router.register(r'essay_answers', EssayAnswerViewSet, basename='essayanswer')
 router.register(r'student_answers', StudentAnswerViewSet, basename='studentanswer')
 router.register(r'tests/(?P<test_id>\d+)/scores', StudentScoreViewSet, basename='student-score')
+router.register(r'tests', TestDetailViewSet, basename='test-detail')
 router.register(r'password-reset', PasswordResetViewSet, basename='password-reset')
 router.register(r'user-membership-courses', UserCourseMembershipView, basename='user-membership-courses')
+router.register('me', DashboardView, basename='me')
 router.register('teacher-register', TeacherRegisterViewSet, basename='teacher-register')
+router.register('autocomplete', AutocompleteView, basename='autocomplete')
+router.register('catalog-cache-stats', CatalogCacheStatsView, basename='catalog-cache-stats')
 
 urlpatterns = [
+    # Phải đứng trước router, nếu không "stream" bị hiểu là id của NotificationViewSet
+    path('notifications/stream/', notification_stream, name='notification-stream'),
     path('', include(router.urls)),
     path('admin/', admin.site.urls),
     ]
\ No newline at end of file
@@ -1,15 +1,24 @@
 # eLMS/LMS/views.py
+import csv
+import hashlib
+import io
 import random
 import json
 import logging
 
 logger = logging.getLogger(__name__)
 
+from asgiref.sync import sync_to_async
 from django.contrib.auth import get_user_model
+from django.core.handlers.asgi import ASGIRequest
 from django.core.exceptions import PermissionDenied, ValidationError
 from django.core.mail import send_mail
+from django.http import JsonResponse, StreamingHttpResponse
 from django.shortcuts import render, get_object_or_404
 from django.utils import timezone
+from django.utils.cache import quote_etag
+from django.utils.http import parse_etags
+from oauth2_provider.models import get_access_token_model
 from rest_framework import generics, permissions, viewsets
 from rest_framework import status
 from rest_framework.decorators import action
@@ -18,13 +27,27 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.mixins import CreateModelMixin, RetrieveModelMixin, ListModelMixin
 from .models import Category, Course, User, Module, CourseMembership, Test, Question, Answer, Notification, Forum, Post, \
-    Reply, File, EssayAnswer, StudentAnswer, StudentScore, Passcode, TeacherRegister
-from .serializers import CategorySerializer, CourseSerializer, UserSerializer, UserUpdateSerializer, \
+    Reply, File, EssayAnswer, StudentScore, Passcode, TeacherRegister, CourseCard
+from .serializers import CategorySerializer, CourseCardSerializer, UserSerializer, UserUpdateSerializer, \
     CourseCreateSerializer, CourseDetailSerializer, ModuleSerializer, ModuleTitleSerializer, TestSerializer, \
     AnswerSerializer, QuestionSerializer, NotificationSerializer, ForumSerializer, PostSerializer, ReplySerializer, \
-    FileSerializer, EssayAnswerSerializer, StudentAnswerSerializer, StudentScoreSerializer, CourseMembershipSerializer, \
-    TeacherRegisterSerializer
-from django.db.models import Q
+    FileSerializer, EssayAnswerSerializer, StudentScoreSerializer, CourseMembershipSerializer, \
+    TeacherRegisterSerializer, TestFullSerializer
+from .analysis import get_item_analysis
+from .autocomplete import suggest
+from .caching import CATALOG_CATEGORIES, CATALOG_LIST, cached_dashboard, cached_facets, cached_response, \
+    catalog_cache_stats, course_scope, reset_catalog_cache_stats
+from .dashboard import build_dashboard, invalidate_dashboards
+from .fieldsets import SparseQuerysetMixin, sparse_queryset
+from .grading import grade_student, invalidate_answer_key, load_answer_key, record_attempt, save_selections
+from .notifications import mark_read
+from .pagination import KeysetPagination
+from .push import get_broker, user_channel
+from .search import MAX_FACET_VALUES, facet_counts, matching_course_ids, search_courses
+from .text import normalize_text
+from django.db import transaction
+from django.db.models import Count, IntegerField, Max, OuterRef, Prefetch, Subquery
+from django.db.models.functions import Coalesce
 
 
 def home(request):
@@ -171,47 +194,78 @@ class PasswordResetViewSet(viewsets.ViewSet):
             return Response({'error': 'Invalid passcode.'}, status=status.HTTP_400_BAD_REQUEST)
 
 
-class CourseListView(viewsets.GenericViewSet, ListModelMixin):
-    serializer_class = CourseSerializer
+def with_course_relations(queryset):
+    """Load the author and category ids that the course serializers read, in a fixed number of queries."""
+    return queryset.select_related('author').prefetch_related(
+        Prefetch('categories', queryset=Category.objects.only('id'))
+    )
+
+
+class CourseListView(SparseQuerysetMixin, viewsets.GenericViewSet, ListModelMixin):
+    serializer_class = CourseCardSerializer
     permission_classes = [permissions.AllowAny]
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
-        queryset = Course.objects.all()
+        # Đọc từ bảng CourseCard, không cần join tác giả/danh mục
+        queryset = CourseCard.objects.all()
         user = self.request.user
 
         # Filter by authenticated teacher
         if user.is_authenticated and user.role == 1:  # Teacher
             queryset = queryset.filter(author=user)
 
-        # Filtering by a single keyword across title, description, category, and author name
+        # Tìm theo từ khóa trên chỉ mục của title, description, category và tên tác giả, xếp theo độ liên quan
         keyword = self.request.query_params.get('q', None)
         if keyword:
-            queryset = queryset.filter(
-                Q(title__icontains=keyword) |
-                Q(description__icontains=keyword) |
-                Q(categories__name__icontains=keyword) |
-                Q(author__first_name__icontains=keyword) |
-                Q(author__last_name__icontains=keyword)
-            ).distinct()
+            queryset = search_courses(queryset, keyword, relation='course__search_terms')
+        else:
+            queryset = queryset.order_by('created_at', 'pk')
 
         # Sort by created_at descending to get the latest courses
         sort_by = self.request.query_params.get('sort', None)
         if sort_by == 'latest':
-            queryset = queryset.order_by('-created_at')  # Sort by latest created
+            queryset = queryset.order_by('-created_at', '-pk')  # Sort by latest created
 
         return queryset
 
     def list(self, request, *args, **kwargs):
-        queryset = self.get_queryset()
-        serializer = self.get_serializer(queryset, many=True)
+        return cached_response(CATALOG_LIST, request, lambda: self.build_list(request))
+
+    def build_list(self, request):
+        # Phân trang theo con trỏ trên thứ tự sắp xếp (luôn kết thúc bằng id), dùng ?cursor= lấy từ 'next'
+        page = self.paginate_queryset(self.filter_queryset(self.get_queryset()))
+        serializer = self.get_serializer(page, many=True)
 
         response_data = {
             'q': request.query_params.get('q', None),
             'courses': serializer.data,
+            'next': self.paginator.get_next_link(),
         }
 
+        # ?facets=1: số khóa học theo từng danh mục và tác giả cho từ khóa hiện tại (các giá trị nhiều nhất),
+        # ?facets=all: đủ mọi danh mục/tác giả, dùng cho trang danh mục
+        facets = request.query_params.get('facets')
+        if facets in ('1', 'true', 'all'):
+            limit = None if facets == 'all' else MAX_FACET_VALUES
+            response_data['facets'] = cached_facets(
+                request, lambda: facet_counts(self.get_facet_queryset(), limit=limit)
+            )
+
         return Response(response_data)
 
+    def get_facet_queryset(self):
+        # Cùng bộ lọc với get_queryset nhưng không xếp hạng/sắp xếp, chỉ dùng làm subquery
+        queryset = CourseCard.objects.all()
+        user = self.request.user
+        if user.is_authenticated and user.role == 1:  # Teacher
+            queryset = queryset.filter(author=user)
+
+        keyword = self.request.query_params.get('q', None)
+        if keyword:
+            queryset = queryset.filter(course_id__in=matching_course_ids(keyword))
+        return queryset
+
 
 class CourseCreateView(viewsets.ModelViewSet):
     queryset = Course.objects.all()
@@ -245,12 +299,18 @@ class CourseDetailView(viewsets.ViewSet):
 
     def retrieve(self, request, pk=None):
         """Handle GET request to retrieve course details by ID."""
+        return cached_response(course_scope(pk), request, lambda: self.build_detail(request, pk))
+
+    def build_detail(self, request, pk):
+        # ?fields= chỉ đọc các cột cần cho những trường được yêu cầu
+        context = {'request': request}
+        queryset = sparse_queryset(with_course_relations(Course.objects.all()), CourseDetailSerializer(context=context))
         try:
-            course = Course.objects.get(id=pk)
+            course = queryset.get(id=pk)
         except Course.DoesNotExist:
             return Response({"error": "Course not found."}, status=status.HTTP_404_NOT_FOUND)
 
-        serializer = CourseDetailSerializer(course)
+        serializer = CourseDetailSerializer(course, context=context)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
     def partial_update(self, request, pk=None):
@@ -288,22 +348,53 @@ class CourseDetailView(viewsets.ViewSet):
         return Response({"message": "Course has been deactivated."}, status=status.HTTP_204_NO_CONTENT)
 
 
-class CategoryListView(viewsets.ReadOnlyModelViewSet):
+class CategoryListView(SparseQuerysetMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     permission_classes = [permissions.AllowAny]
 
     def get_queryset(self):
         queryset = Category.objects.all()
-        letter = self.request.query_params.get('letter', '').upper()
+        letter = normalize_text(self.request.query_params.get('letter', ''))
 
         if letter:
-            queryset = queryset.filter(name__istartswith=letter)
+            # So khớp trên cột không dấu có index, "d" khớp cả "Đ"
+            queryset = queryset.filter(name_normalized__startswith=letter)
 
         return queryset
 
+    def list(self, request, *args, **kwargs):
+        return cached_response(CATALOG_CATEGORIES, request, lambda: super(CategoryListView, self).list(request))
+
+
+class AutocompleteView(viewsets.ViewSet):
+    """Typeahead over course titles and category names, served from the in-process prefix index."""
+    permission_classes = [permissions.AllowAny]
+    max_limit = 20
+
+    def list(self, request):
+        query = request.query_params.get('q', '')
+        try:
+            limit = max(1, min(int(request.query_params.get('limit', 10)), self.max_limit))
+        except ValueError:
+            return Response({"error": "limit must be an integer."}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'q': query, 'results': suggest(query, limit)})
+
+
+class CatalogCacheStatsView(viewsets.ViewSet):
+    """Hit/miss counters of the catalog response cache, for sizing it."""
+    permission_classes = [permissions.IsAdminUser]
+
+    def list(self, request):
+        return Response(catalog_cache_stats())
+
+    @action(detail=False, methods=['post'])
+    def reset(self, request):
+        reset_catalog_cache_stats()
+        return Response(catalog_cache_stats())
 
-class ModuleViewSet(viewsets.ModelViewSet):
+
+class ModuleViewSet(SparseQuerysetMixin, viewsets.ModelViewSet):
     def get_permissions(self):
         if self.action == 'list':
             permission_classes = [permissions.AllowAny]
@@ -341,14 +432,23 @@ class UserCourseMembershipView(viewsets.ViewSet):
 
     def list(self, request):
         # Fetch courses where the current user is a member
-        memberships = CourseMembership.objects.filter(user=request.user, is_active=True)
-        courses = [membership.course for membership in memberships]
+        course_ids = CourseMembership.objects.filter(user=request.user, is_active=True).values('course_id')
+        courses = CourseCard.objects.filter(course_id__in=course_ids).order_by('pk')
 
-        # Use CourseSerializer to return course details
-        serializer = CourseSerializer(courses, many=True)
+        # Use CourseCardSerializer to return course details
+        serializer = CourseCardSerializer(courses, many=True)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
+class DashboardView(viewsets.ViewSet):
+    permission_classes = [IsAuthenticated]
+
+    @action(detail=False, methods=['get'])
+    def dashboard(self, request):
+        # Toàn bộ khóa học đang học kèm tiến độ chỉ trong 1 truy vấn, cache theo từng user
+        return cached_dashboard(request, lambda: build_dashboard(request.user))
+
+
 class CourseMembershipViewSet(viewsets.ViewSet):
     permission_classes = [IsAuthenticated]
 
@@ -427,7 +527,7 @@ class IsCourseAuthor(permissions.BasePermission):
         return obj.module.course.author == request.user
 
 
-class TestViewSet(viewsets.ModelViewSet):
+class TestViewSet(SparseQuerysetMixin, viewsets.ModelViewSet):
     serializer_class = TestSerializer
     permission_classes = [permissions.IsAuthenticated]
 
@@ -438,11 +538,13 @@ class TestViewSet(viewsets.ModelViewSet):
         """
         user = self.request.user
         module_id = self.kwargs.get('module_id')
-        module = get_object_or_404(Module, id=module_id)
+        # Chỉ cần tác giả khóa học để kiểm tra quyền, không đọc mô tả module/khóa học
+        module = get_object_or_404(Module.objects.select_related('course').only('id', 'course__author'), id=module_id)
         course = module.course
 
         # Check if the user is the author or a member of the course
-        if course.author == user or CourseMembership.objects.filter(user=user, course=course, is_active=True).exists():
+        if course.author_id == user.id or CourseMembership.objects.filter(user=user, course=course,
+                                                                          is_active=True).exists():
             return Test.objects.filter(module=module)
         else:
             return Test.objects.none()
@@ -493,7 +595,7 @@ class TestViewSet(viewsets.ModelViewSet):
         instance.delete()
 
 
-class QuestionViewSet(viewsets.ModelViewSet):
+class QuestionViewSet(SparseQuerysetMixin, viewsets.ModelViewSet):
     serializer_class = QuestionSerializer
 
     def get_queryset(self):
@@ -643,10 +745,16 @@ class NotificationViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
+        return Notification.objects.filter(user=self.request.user).order_by('-id')
+
+    def list(self, request, *args, **kwargs):
         # Get the last 10 notifications for the logged-in user, ordered by descending ID
-        return Notification.objects.filter(user=self.request.user).order_by('-id')[:10]
+        # (cắt ở đây chứ không phải get_queryset, queryset đã cắt thì get_object() không lọc được)
+        serializer = self.get_serializer(self.get_queryset()[:10], many=True)
+        return Response(serializer.data)
 
-    def partial_update(self, request, *args, **kwargs):
+    # PUT và PATCH đều đi qua đây (partial_update gọi update) để bộ đếm chưa đọc luôn được trừ qua mark_read
+    def update(self, request, *args, **kwargs):
         notification = self.get_object()
 
         # Ensure only the owner can update their notification
@@ -659,12 +767,103 @@ class NotificationViewSet(viewsets.ModelViewSet):
 
         # Only allow marking the notification as read
         if 'is_read' in request.data and request.data['is_read'] is True:
-            notification.is_read = True
-            notification.save()
+            mark_read(request.user.id, [notification.id])
             return Response({"message": "Notification marked as read."}, status=status.HTTP_200_OK)
 
         return Response({"error": "Invalid update request."}, status=status.HTTP_400_BAD_REQUEST)
 
+    @action(detail=False, methods=['get'], url_path='unread-count')
+    def unread_count(self, request):
+        """
+        Number of unread notifications for the bell badge, read from the maintained counter.
+
+        The counter is a column of the user loaded by authentication, so the count needs
+        no query of its own; the ETag is the count itself, so a refresh with If-None-Match
+        gets a 304 with no body.
+        """
+        count = request.user.unread_notifications
+        # no-cache: trình duyệt giữ response nhưng luôn hỏi lại server kèm If-None-Match
+        headers = {'ETag': quote_etag(str(count)), 'Cache-Control': 'private, no-cache'}
+        if headers['ETag'] in parse_etags(request.headers.get('If-None-Match', '')):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        return Response({'unread_count': count}, headers=headers)
+
+
+NOTIFICATION_HEARTBEAT_SECONDS = 15  # Gửi comment giữ kết nối qua proxy khi không có thông báo
+NOTIFICATION_RETRY_MS = 5000  # Trình duyệt tự kết nối lại sau khoảng này
+MAX_MISSED_NOTIFICATIONS = 50
+
+
+def _stream_user(request):
+    # EventSource không gửi được header Authorization nên nhận access token qua ?access_token=
+    authorization = request.headers.get('Authorization', '')
+    token = authorization[7:] if authorization.startswith('Bearer ') else request.GET.get('access_token', '')
+    if not token:
+        return None
+    access_token = get_access_token_model().objects.select_related('user').filter(token=token).first()
+    if access_token is None or access_token.is_expired() or not access_token.user.is_active:
+        return None
+    return access_token.user
+
+
+def _missed_notifications(user, last_event_id):
+    notifications = Notification.objects.filter(user=user, id__gt=last_event_id).order_by('id')
+    return NotificationSerializer(notifications[:MAX_MISSED_NOTIFICATIONS], many=True).data
+
+
+def _sse_event(notification):
+    return f"id: {notification['id']}\ndata: {json.dumps(notification, ensure_ascii=False)}\n\n"
+
+
+async def notification_stream(request):
+    """
+    GET /notifications/stream/: push the user's new notifications as Server-Sent Events.
+
+    Notifications published while the client was disconnected are replayed from
+    the database using the Last-Event-ID header the browser sends on reconnect.
+    """
+    if not isinstance(request, ASGIRequest):
+        # Dưới WSGI không giữ được kết nối, frontend quay về gọi /notifications/ định kỳ
+        return JsonResponse({"error": "The notification stream requires the ASGI server."}, status=501)
+
+    user = await sync_to_async(_stream_user)(request)
+    if user is None:
+        return JsonResponse({"error": "Authentication credentials were not provided or are invalid."}, status=401)
+
+    # Kết nối lại thì trình duyệt gửi id của thông báo cuối cùng đã nhận
+    try:
+        last_event_id = int(request.headers.get('Last-Event-ID') or request.GET.get('last_event_id') or '')
+    except ValueError:
+        last_event_id = None
+
+    # Đăng ký trước khi đọc CSDL để không lỡ thông báo tạo ra ở giữa hai bước
+    subscription = get_broker().subscribe(user_channel(user.id))
+    missed = []
+    if last_event_id is not None:
+        missed = await sync_to_async(_missed_notifications)(user, last_event_id)
+
+    async def events():
+        sent_id = last_event_id or 0
+        try:
+            yield f'retry: {NOTIFICATION_RETRY_MS}\n\n'
+            for notification in missed:
+                sent_id = notification['id']
+                yield _sse_event(notification)
+            while True:
+                notification = await subscription.get(timeout=NOTIFICATION_HEARTBEAT_SECONDS)
+                if notification is None:
+                    yield ': keepalive\n\n'
+                elif notification['id'] > sent_id:
+                    sent_id = notification['id']
+                    yield _sse_event(notification)
+        finally:
+            subscription.close()
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Không để nginx gom response lại
+    return response
+
 
 class ForumViewSet(viewsets.ViewSet):
     permission_classes = [permissions.IsAuthenticated]
@@ -693,21 +892,44 @@ class ForumViewSet(viewsets.ViewSet):
             return Response({"error": "Forum not found for the course."}, status=404)
 
 
-class PostViewSet(viewsets.ModelViewSet):
+def forum_threads(queryset):
+    """Annotate each post with its number of replies and the time of its latest reply."""
+    replies = Reply.objects.filter(question=OuterRef('pk')).order_by()
+    return queryset.select_related('user').annotate(
+        # Subquery chỉ chạy cho các bài viết của trang hiện tại, dùng index (question, created_at)
+        reply_count=Coalesce(Subquery(
+            replies.values('question').annotate(count=Count('*')).values('count'), output_field=IntegerField()
+        ), 0),
+        last_reply_at=Subquery(replies.order_by('-created_at').values('created_at')[:1]),
+    )
+
+
+class PostViewSet(SparseQuerysetMixin, viewsets.ModelViewSet):
     serializer_class = PostSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
         forum_id = self.kwargs.get('forum_id')
-        forum = Forum.objects.get(id=forum_id)
+        forum = Forum.objects.select_related('course').only('id', 'course__author').get(id=forum_id)
 
         # Ensure the user is a course member or the course author
-        if forum.course.author == self.request.user or CourseMembership.objects.filter(
+        if forum.course.author_id == self.request.user.id or CourseMembership.objects.filter(
                 user=self.request.user, course=forum.course, is_active=True
         ).exists():
-            return Post.objects.filter(forum=forum)
+            # Bài viết mới nhất lên đầu, phân trang bằng ?cursor=
+            return forum_threads(Post.objects.filter(forum=forum)).order_by('-created_at', '-id')
         raise PermissionDenied("You do not have permission to access these posts.")
 
+    @action(detail=False, methods=['post'], url_path='mark-read')
+    def mark_read(self, request, forum_id=None):
+        """Mark the forum as read: posts and replies before now are no longer unread on the dashboard."""
+        self.get_queryset()  # Kiểm tra quyền xem forum
+        if CourseMembership.objects.filter(user=request.user, course__forum=forum_id).update(
+                forum_read_at=timezone.now()):
+            invalidate_dashboards([request.user.id])
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
     def perform_create(self, serializer):
         forum_id = self.kwargs.get('forum_id')
         forum = Forum.objects.get(id=forum_id)
@@ -728,16 +950,18 @@ class PostViewSet(viewsets.ModelViewSet):
 class ReplyViewSet(viewsets.ModelViewSet):
     serializer_class = ReplySerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
         post_id = self.kwargs.get('post_id')
-        post = Post.objects.get(id=post_id)
+        post = Post.objects.select_related('forum__course').only('id', 'forum__course__author').get(id=post_id)
 
         # Ensure the user is a course member or the course author
-        if post.forum.course.author == self.request.user or CourseMembership.objects.filter(
+        if post.forum.course.author_id == self.request.user.id or CourseMembership.objects.filter(
                 user=self.request.user, course=post.forum.course, is_active=True
         ).exists():
-            return Reply.objects.filter(question=post)
+            # Câu trả lời cũ nhất trước, phân trang bằng ?cursor=
+            return Reply.objects.filter(question=post).select_related('user').order_by('created_at', 'id')
         raise PermissionDenied("You do not have permission to access these replies.")
 
     def perform_create(self, serializer):
@@ -896,8 +1120,8 @@ class EssayAnswerViewSet(viewsets.ModelViewSet):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class StudentAnswerViewSet(viewsets.ModelViewSet):
-    serializer_class = StudentAnswerSerializer
+class StudentAnswerViewSet(viewsets.ViewSet):
+    # Chỉ còn tạo: lựa chọn được lưu vào StudentSelection, bảng StudentAnswer không còn được ghi qua API
     permission_classes = [IsAuthenticated]
 
     def create(self, request, *args, **kwargs):
@@ -916,66 +1140,311 @@ class StudentAnswerViewSet(viewsets.ModelViewSet):
         except (ValueError, json.JSONDecodeError):
             return Response({"error": "Invalid format for selected_answer."}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Clear old answers for this question
-        StudentAnswer.objects.filter(user=request.user, question=question).delete()
+        if question.type != 0:
+            return Response({"error": "Cannot add answers to an essay question."}, status=status.HTTP_400_BAD_REQUEST)
 
-        created_answers = []
-        for answer_id in selected_answers:
-            data = {
-                'user': request.user.id,
-                'question': question.id,
-                'selected_answer': answer_id,
-            }
-            serializer = self.get_serializer(data=data)
-            serializer.is_valid(raise_exception=True)
-            created_answer = serializer.save(question=question)
-            created_answers.append(created_answer)
+        answer_key = load_answer_key(question.test_id)
+        try:
+            selected_answers = list(dict.fromkeys(int(answer_id) for answer_id in selected_answers))
+        except (TypeError, ValueError):
+            return Response({"error": "Invalid format for selected_answer."}, status=status.HTTP_400_BAD_REQUEST)
+        if not set(selected_answers).issubset(answer_key.choices.get(question.id, {})):
+            return Response({"error": "Invalid answer for this question."}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Ghi đè lựa chọn cũ của câu hỏi bằng 1 lệnh upsert
+        save_selections(request.user, answer_key, {question.id: selected_answers})
 
         # Update the overall score
         self.update_student_score(question.test)
 
+        correct_answers = answer_key.correct.get(question.id, frozenset())
         response_data = {
-            'count': len(created_answers),
-            'answers': [StudentAnswerSerializer(answer).data for answer in created_answers],
+            'count': len(selected_answers),
+            'answers': [{
+                'question': question.id,
+                'user': request.user.id,
+                'selected_answer': answer_id,
+                'is_correct': answer_id in correct_answers,
+            } for answer_id in selected_answers],
         }
 
-        correct_answers_count = Answer.objects.filter(question=question, is_correct=True).count()
-        if len(selected_answers) > correct_answers_count:
+        if len(selected_answers) > len(correct_answers):
             response_data['warning'] = 'You submitted too many answers, score for this question is 0%.'
 
         return Response(response_data, status=status.HTTP_201_CREATED)
 
-    def calculate_question_score(self, question, selected_answers, total_questions):
-        correct_answers = Answer.objects.filter(question=question, is_correct=True)
-        correct_answers_count = correct_answers.count()
-        selected_correct_answers_count = correct_answers.filter(id__in=selected_answers).count()
+    def update_student_score(self, test):
+        # Chấm toàn bộ bài Test trong bộ nhớ thay vì truy vấn theo từng câu hỏi
+        grade_student(self.request.user, test)
 
-        # If more answers are submitted than there are correct answers, score is 0
-        if len(selected_answers) > correct_answers_count:
-            return 0
 
-        # Calculate the score based on the proportion of correct answers selected
-        if correct_answers_count > 0:
-            score = (selected_correct_answers_count / correct_answers_count) * (100 / total_questions)
-        else:
-            score = 0
+class TestDetailViewSet(viewsets.ViewSet):
+    """Actions on a single test: submit an attempt, read it in full, item analysis and question import."""
+    permission_classes = [IsAuthenticated]
 
-        return score
+    TRUE_VALUES = {'1', 'true', 'yes', 'x', 'đúng'}
+    FALSE_VALUES = {'', '0', 'false', 'no', 'sai'}
 
-    def update_student_score(self, test):
-        student_answers = StudentAnswer.objects.filter(user=self.request.user, question__test=test)
-        total_questions = test.questions.count()
-        total_score = 0
-
-        for question in test.questions.all():
-            selected_answers = student_answers.filter(question=question).values_list('selected_answer', flat=True)
-            question_score = self.calculate_question_score(question, selected_answers, total_questions)
-            total_score += question_score
-
-        # Update or create the score record
-        score_record, _ = StudentScore.objects.get_or_create(user=self.request.user, test=test)
-        score_record.score = total_score
-        score_record.save()
+    def get_test(self, pk):
+        return get_object_or_404(Test.objects.select_related('module__course'), id=pk)
+
+    @action(detail=True, methods=['post'], url_path='submit')
+    def submit(self, request, pk=None):
+        """
+        Submit every selection of a multiple-choice test in one request.
+        Payload: {"answers": [{"question": <id>, "selected_answer": [<answer id>, ...]}, ...]}
+        """
+        test = self.get_test(pk)
+
+        if not CourseMembership.objects.filter(user=request.user, course=test.module.course,
+                                               is_active=True).exists():
+            raise PermissionDenied("You do not have permission to submit this test.")
+
+        if test.test_type != 0:
+            return Response({"error": "Only multiple-choice tests can be submitted."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        answers = request.data.get('answers')
+        try:
+            if isinstance(answers, str):
+                answers = json.loads(answers)
+            if not isinstance(answers, list):
+                raise ValueError("answers must be a list.")
+        except (ValueError, json.JSONDecodeError):
+            return Response({"error": "Invalid format for answers."}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Kiểm tra toàn bộ lựa chọn với đáp án của bài Test bằng 1 truy vấn
+        answer_key = load_answer_key(test.id)
+        selections = {}
+        try:
+            for item in answers:
+                question_id = int(item['question'])
+                selected_answers = item.get('selected_answer', [])
+                if isinstance(selected_answers, str):
+                    selected_answers = json.loads(selected_answers)
+                if not isinstance(selected_answers, list):
+                    raise ValueError("selected_answer must be a list.")
+                selected_answers = list(dict.fromkeys(int(answer_id) for answer_id in selected_answers))
+
+                if question_id not in answer_key.choices:
+                    return Response({"error": f"Question {question_id} does not belong to this test."},
+                                    status=status.HTTP_400_BAD_REQUEST)
+                if question_id in selections:
+                    return Response({"error": f"Question {question_id} is submitted more than once."},
+                                    status=status.HTTP_400_BAD_REQUEST)
+                if not set(selected_answers).issubset(answer_key.choices[question_id]):
+                    return Response({"error": f"Invalid answer for question {question_id}."},
+                                    status=status.HTTP_400_BAD_REQUEST)
+
+                selections[question_id] = selected_answers
+        except (KeyError, TypeError, ValueError, json.JSONDecodeError):
+            return Response({"error": "Invalid format for answers."}, status=status.HTTP_400_BAD_REQUEST)
+
+        score_record = record_attempt(request.user, test, answer_key, selections)
+
+        response_data = {
+            'count': sum(len(answer_ids) for answer_ids in selections.values()),
+            'score': score_record.score,
+        }
+
+        over_selected = [question_id for question_id, answer_ids in selections.items()
+                         if len(answer_ids) > len(answer_key.correct[question_id])]
+        if over_selected:
+            response_data['over_selected'] = over_selected
+            response_data['warning'] = 'You submitted too many answers, score for these questions is 0%.'
+
+        return Response(response_data, status=status.HTTP_201_CREATED)
+
+    @action(detail=True, methods=['get'], url_path='full')
+    def full(self, request, pk=None):
+        """
+        Return the test with all its questions and answer choices in one response.
+        Correct answers are only included for the course author.
+        """
+        test = self.get_test(pk)
+        course = test.module.course
+
+        is_author = course.author_id == request.user.id
+        if not is_author and not CourseMembership.objects.filter(user=request.user, course=course,
+                                                                 is_active=True).exists():
+            raise PermissionDenied("You do not have permission to view this test.")
+
+        # Kiểm tra ETag trước khi tải câu hỏi để client revalidate với 1 truy vấn tổng hợp
+        etag = self.get_etag(test, is_author)
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+
+        test = Test.objects.prefetch_related(Prefetch(
+            'questions',
+            queryset=Question.objects.order_by('id').prefetch_related(
+                Prefetch('answers', queryset=Answer.objects.order_by('id'))
+            )
+        )).get(id=test.id)
+
+        serializer = TestFullSerializer(test, context={'request': request, 'show_correct': is_author})
+        return Response(serializer.data, headers={'ETag': etag})
+
+    def get_etag(self, test, is_author):
+        changes = Question.objects.filter(test=test).aggregate(
+            question_count=Count('id', distinct=True),
+            answer_count=Count('answers'),
+            question_updated_at=Max('updated_at'),
+            answer_updated_at=Max('answers__updated_at'),
+        )
+        version = (f"{test.id}:{test.name}:{test.test_type}:{is_author}:"
+                   f"{changes['question_count']}:{changes['answer_count']}:"
+                   f"{changes['question_updated_at']}:{changes['answer_updated_at']}")
+        return quote_etag(hashlib.md5(version.encode()).hexdigest())
+
+    @action(detail=True, methods=['get'], url_path='item-analysis')
+    def item_analysis(self, request, pk=None):
+        """
+        Per-question difficulty (p-value), point-biserial discrimination and choice selection rates.
+        Only the course author can view it.
+        """
+        test = self.get_test(pk)
+
+        if request.user != test.module.course.author:
+            raise PermissionDenied("Only the course author can view the item analysis.")
+
+        if test.test_type != 0:
+            return Response({"error": "Item analysis is only available for multiple-choice tests."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(get_item_analysis(test))
+
+    @action(detail=True, methods=['post'], url_path='import')
+    def import_questions(self, request, pk=None):
+        """
+        Import many questions (and their answer choices) into a test at once.
+        JSON: {"questions": [{"content": "...", "answers": [{"choice": "...", "is_correct": true}, ...]}, ...]}
+        CSV (multipart field "file"): columns question, choice, is_correct; rows of the same question follow each other.
+        """
+        test = self.get_test(pk)
+
+        if request.user != test.module.course.author:
+            raise PermissionDenied("Only the course author can import questions.")
+
+        upload = request.FILES.get('file')
+        try:
+            questions = self.parse_csv(upload) if upload else self.parse_json(request.data.get('questions'))
+        except (ValueError, UnicodeDecodeError, csv.Error, json.JSONDecodeError) as e:
+            return Response({"error": f"Invalid import data: {e}"}, status=status.HTTP_400_BAD_REQUEST)
+
+        errors = self.validate_questions(test, questions)
+        if errors:
+            return Response({"errors": errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            # Khóa bài Test để các lần import song song không chen id câu hỏi vào nhau
+            test = Test.objects.select_for_update().get(id=test.id)
+            last_id = test.questions.aggregate(last_id=Max('id'))['last_id'] or 0
+
+            created_questions = Question.objects.bulk_create([
+                Question(test=test, content=question['content'], type=test.test_type) for question in questions
+            ])
+            # MySQL không trả về id khi bulk_create nên đọc lại theo thứ tự chèn
+            if any(question.pk is None for question in created_questions):
+                created_questions = list(test.questions.filter(id__gt=last_id).order_by('id'))
+                if len(created_questions) != len(questions):
+                    transaction.set_rollback(True)
+                    return Response({"error": "The test was modified during the import, please try again."},
+                                    status=status.HTTP_409_CONFLICT)
+
+            created_answers = Answer.objects.bulk_create([
+                Answer(question=created_question, choice=answer['choice'], is_correct=answer['is_correct'],
+                       position=position)
+                for created_question, question in zip(created_questions, questions)
+                for position, answer in enumerate(question['answers'])
+            ])
+
+            test.num_questions = test.questions.count()
+            test.save(update_fields=['num_questions'])
+
+        # bulk_create không gửi signal nên phải tự xóa cache đáp án
+        invalidate_answer_key(test.id)
+
+        return Response({
+            'test': test.id,
+            'num_questions': test.num_questions,
+            'questions_created': len(created_questions),
+            'answers_created': len(created_answers),
+        }, status=status.HTTP_201_CREATED)
+
+    def parse_json(self, questions):
+        if isinstance(questions, str):
+            questions = json.loads(questions)
+        if not isinstance(questions, list):
+            raise ValueError("questions must be a list.")
+
+        parsed = []
+        for question in questions:
+            if not isinstance(question, dict):
+                raise ValueError("each question must be an object.")
+            answers = question.get('answers') or []
+            if not isinstance(answers, list) or not all(isinstance(answer, dict) for answer in answers):
+                raise ValueError("answers must be a list of objects.")
+            parsed.append({
+                'content': str(question.get('content') or '').strip(),
+                'type': question.get('type'),
+                'answers': [{
+                    'choice': str(answer.get('choice') or '').strip(),
+                    'is_correct': self.parse_bool(answer.get('is_correct', False)),
+                } for answer in answers],
+            })
+        return parsed
+
+    def parse_csv(self, upload):
+        reader = csv.DictReader(io.TextIOWrapper(upload, encoding='utf-8-sig'))
+        if not reader.fieldnames or 'question' not in reader.fieldnames:
+            raise ValueError("CSV must have a 'question' column.")
+
+        parsed = []
+        for row in reader:
+            content = (row.get('question') or '').strip()
+            # Dòng có cùng nội dung câu hỏi (hoặc để trống) là thêm lựa chọn cho câu hỏi phía trên
+            if content and (not parsed or parsed[-1]['content'] != content):
+                parsed.append({'content': content, 'type': None, 'answers': []})
+            elif not parsed:
+                raise ValueError("the first row must contain a question.")
+
+            choice = (row.get('choice') or '').strip()
+            if choice:
+                parsed[-1]['answers'].append({
+                    'choice': choice,
+                    'is_correct': self.parse_bool(row.get('is_correct')),
+                })
+        return parsed
+
+    def parse_bool(self, value):
+        if isinstance(value, bool):
+            return value
+        value = str(value if value is not None else '').strip().lower()
+        if value in self.TRUE_VALUES:
+            return True
+        if value in self.FALSE_VALUES:
+            return False
+        raise ValueError(f"'{value}' is not a valid is_correct value.")
+
+    def validate_questions(self, test, questions):
+        if not questions:
+            return ["No question to import."]
+
+        errors = []
+        for index, question in enumerate(questions, start=1):
+            if not question['content']:
+                errors.append(f"Question {index}: content is required.")
+            if question['type'] is not None and str(question['type']) != str(test.test_type):
+                errors.append(f"Question {index}: type does not match the test type.")
+            if test.test_type == 1 and question['answers']:
+                errors.append(f"Question {index}: essay questions cannot have answers.")
+            if test.test_type == 0 and not question['answers']:
+                errors.append(f"Question {index}: multiple-choice questions need at least one answer.")
+            if len(question['answers']) > Answer.MAX_CHOICES:
+                errors.append(f"Question {index}: at most {Answer.MAX_CHOICES} answers are allowed.")
+            if any(not answer['choice'] for answer in question['answers']):
+                errors.append(f"Question {index}: answer choices cannot be empty.")
+        return errors
 
 
 class StudentScoreViewSet(viewsets.ViewSet):
@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'eLMS.settings')
 
 application = get_asgi_application()
+
+# Dựng sẵn chỉ mục gợi ý của tiến trình này trước request đầu tiên
+from LMS.autocomplete import warm_up  # noqa: E402
+
+warm_up()
@@ -140,8 +140,12 @@ CORS_ALLOW_HEADERS = [
     'user-agent',
     'x-csrftoken',
     'x-requested-with',
+    'if-none-match',
 ]
 
+# Frontend chạy ở origin khác nên phải cho đọc ETag để gửi lại qua If-None-Match (vd. /tests/{id}/full/)
+CORS_EXPOSE_HEADERS = ['etag']
+
 WSGI_APPLICATION = 'eLMS.wsgi.application'
 
 # Database
@@ -159,6 +163,15 @@ DATABASES = {
     }
 }
 
+# Cache dùng chung giữa các worker: đáp án bài Test, chỉ mục gợi ý tìm kiếm, catalog... đều xóa/đổi version
+# trong cache này. Không dùng LocMemCache mặc định vì mỗi tiến trình có cache riêng, xóa ở 1 worker thì worker khác không biết
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': config('REDIS_URL', default='redis://127.0.0.1:6379/1'),
+    }
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 
@@ -209,3 +222,6 @@ REST_FRAMEWORK = {
         'oauth2_provider.contrib.rest_framework.OAuth2Authentication',
     ),
 }
+
+# Broker pub/sub đẩy thông báo qua /notifications/stream/ (LMS.push.LocalBroker chỉ dùng được với 1 tiến trình ASGI)
+PUSH_BROKER = 'LMS.push.LocalBroker'
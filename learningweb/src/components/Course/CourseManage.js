@@ -59,8 +59,15 @@ const CourseManage = () => {
   // Fetch courses from API
   const fetchCourses = async () => {
     try {
-      const response = await authAPIs().get(endpoints["list-course"]); // Assuming you have an endpoint for fetching courses
-      setCourses(response.data.courses); // Update to access 'courses' key
+      // The list is paginated: follow the 'next' cursor until all of the teacher's courses are loaded
+      let allCourses = [];
+      let url = endpoints["list-course"];
+      while (url) {
+        const response = await authAPIs().get(url);
+        allCourses = [...allCourses, ...response.data.courses];
+        url = response.data.next;
+      }
+      setCourses(allCourses); // Update to access 'courses' key
     } catch (err) {
       console.error("Error fetching courses:", err);
       setError("Failed to load courses.");
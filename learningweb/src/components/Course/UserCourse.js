@@ -1,5 +1,5 @@
 import React, { useEffect, useState } from "react";
-import { Spinner, Card, Row, Col, ProgressBar } from "react-bootstrap";
+import { Spinner, Card, Row, Col, ProgressBar, Badge } from "react-bootstrap";
 import { authAPIs, endpoints } from "../../configs/APIs";
 import { Link } from "react-router-dom";
 
@@ -7,14 +7,13 @@ const UserCourse = () => {
   const [courses, setCourses] = useState([]);
   const [loading, setLoading] = useState(true);
   const [selectedCourse, setSelectedCourse] = useState(null);
-  const [membershipDetails, setMembershipDetails] = useState(null); // State to store membership details
 
-  // Fetch the list of course memberships
+  // Dashboard trả về khóa học kèm tiến độ, bài Test tiếp theo và số hoạt động forum chưa đọc
   useEffect(() => {
     const fetchCourses = async () => {
       try {
-        const response = await authAPIs().get(endpoints["course-member"]);
-        setCourses(response.data);
+        const response = await authAPIs().get(endpoints["dashboard"]);
+        setCourses(response.data.courses);
       } catch (error) {
         console.error("Error fetching courses:", error);
       } finally {
@@ -25,17 +24,6 @@ const UserCourse = () => {
     fetchCourses();
   }, []);
 
-  // Fetch membership details when a course is selected
-  const fetchMembershipDetails = async (course) => {
-    try {
-      setSelectedCourse(course);
-      const response = await authAPIs().get(`${endpoints["course-membership"]}${course.id}/`);
-      setMembershipDetails(response.data); // Set membership details fetched for the selected course
-    } catch (error) {
-      console.error("Error fetching membership details:", error);
-    }
-  };
-
   if (loading) {
     return <Spinner animation="border" />;
   }
@@ -47,7 +35,7 @@ const UserCourse = () => {
         <Row xs={1} md={2} className="g-4">
           {courses.map((course) => (
             <Col key={course.id}>
-              <Card border="primary" onClick={() => fetchMembershipDetails(course)}>
+              <Card border="primary" onClick={() => setSelectedCourse(course)}>
                 <Card.Img variant="top" src={course.cover_image_url} />
                 <Card.Body>
                   <Card.Title>
@@ -58,6 +46,9 @@ const UserCourse = () => {
                     >
                       {course.title}
                     </Link>
+                    {course.unread_forum_activity > 0 && (
+                      <Badge bg="danger" className="ms-2">{course.unread_forum_activity}</Badge>
+                    )}
                   </Card.Title>
                   <Card.Text>{course.description}</Card.Text>
                 </Card.Body>
@@ -69,7 +60,7 @@ const UserCourse = () => {
 
       {/* Selected course details on the right */}
       <div style={{ flex: 1, padding: "1rem" }}>
-        {selectedCourse && membershipDetails ? (
+        {selectedCourse ? (
           <div>
             <h3>{selectedCourse.title}</h3>
             <img
@@ -88,14 +79,14 @@ const UserCourse = () => {
             {/* Display Attend Date */}
             <p>
               <strong>Ngày tham gia:</strong>{" "}
-              {new Date(membershipDetails.attend_date).toLocaleDateString()}
+              {new Date(selectedCourse.attend_date).toLocaleDateString()}
             </p>
 
             {/* Conditionally render Finish Date if available */}
-            {membershipDetails.finish_date ? (
+            {selectedCourse.finish_date ? (
               <p>
                 <strong>Ngày hoàn thành:</strong>{" "}
-                {new Date(membershipDetails.finish_date).toLocaleDateString()}
+                {new Date(selectedCourse.finish_date).toLocaleDateString()}
               </p>
             ) : (
               <p>
@@ -103,12 +94,17 @@ const UserCourse = () => {
               </p>
             )}
 
+            <p>
+              <strong>Bài kiểm tra tiếp theo:</strong>{" "}
+              {selectedCourse.next_test ? selectedCourse.next_test.name : "Đã làm hết"}
+            </p>
+
             {/* Display Progress with ProgressBar */}
             <p>
               <strong>Tiến độ học tập:</strong>
               <ProgressBar
-                now={membershipDetails.progress}
-                label={`${Math.round(membershipDetails.progress)}%`}
+                now={selectedCourse.progress}
+                label={`${Math.round(selectedCourse.progress)}%`}
                 variant="success"
                 style={{ height: "20px" }}
               />
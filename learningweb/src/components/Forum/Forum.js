@@ -6,9 +6,11 @@ import { MdSubdirectoryArrowRight } from "react-icons/md"; // Import right arrow
 const Forum = ({ course }) => {
   const [forumId, setForumId] = useState(null);
   const [posts, setPosts] = useState([]);
+  const [nextPosts, setNextPosts] = useState(null); // Link trang bài viết tiếp theo
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
   const [replies, setReplies] = useState({});
+  const [nextReplies, setNextReplies] = useState({}); // Link trang câu trả lời tiếp theo của từng bài viết
   const [replyInput, setReplyInput] = useState("");
   const [showModal, setShowModal] = useState(false); // Modal visibility state
   const [newPostTitle, setNewPostTitle] = useState(""); // New post title
@@ -39,7 +41,12 @@ const Forum = ({ course }) => {
 
       try {
         const response = await authAPIs().get(endpoints["forum-post"](forumId));
-        setPosts(response.data); // Assuming the response contains the posts
+        setPosts(response.data.results);
+        setNextPosts(response.data.next);
+        // Đã mở forum: các bài viết hiện có không còn tính là chưa đọc trên dashboard
+        authAPIs().post(endpoints["forum-mark-read"](forumId)).catch((err) => {
+          console.error("Error marking forum as read:", err);
+        });
       } catch (err) {
         console.error("Error fetching forum posts:", err);
         setError("Could not load forum posts.");
@@ -51,21 +58,34 @@ const Forum = ({ course }) => {
     fetchPosts();
   }, [forumId]);
 
-  useEffect(() => {
-    const fetchReplies = async (postId) => {
-      try {
-        const response = await authAPIs().get(endpoints["post-reply"](postId));
-        setReplies((prev) => ({ ...prev, [postId]: response.data })); // Store replies indexed by post ID
-      } catch (err) {
-        console.error(`Error fetching replies for post ${postId}:`, err);
-      }
-    };
+  const loadMorePosts = async () => {
+    try {
+      const response = await authAPIs().get(nextPosts);
+      setPosts((prev) => [...prev, ...response.data.results]);
+      setNextPosts(response.data.next);
+    } catch (err) {
+      console.error("Error fetching forum posts:", err);
+    }
+  };
 
-    // Fetch replies for each post
-    posts.forEach((post) => {
+  // Chỉ tải câu trả lời khi mở bài viết, thay vì gọi API cho từng bài viết
+  const fetchReplies = async (postId, url = endpoints["post-reply"](postId)) => {
+    try {
+      const response = await authAPIs().get(url);
+      setReplies((prev) => ({ ...prev, [postId]: [...(prev[postId] || []), ...response.data.results] }));
+      setNextReplies((prev) => ({ ...prev, [postId]: response.data.next }));
+    } catch (err) {
+      console.error(`Error fetching replies for post ${postId}:`, err);
+    }
+  };
+
+  const handleSelectPost = (eventKey) => {
+    if (eventKey === null) return;
+    const post = posts[Number(eventKey)];
+    if (post && post.id && !replies[post.id]) {
       fetchReplies(post.id);
-    });
-  }, [posts]);
+    }
+  };
 
   const handleReplyChange = (e) => {
     setReplyInput(e.target.value); // Update the reply input value
@@ -83,7 +103,7 @@ const Forum = ({ course }) => {
       setReplies((prev) => ({
         ...prev,
         [postId]: [
-          ...prev[postId],
+          ...(prev[postId] || []),
           { user_full_name: "Bạn", body: replyInput }, // Add the new reply locally
         ],
       }));
@@ -108,7 +128,7 @@ const Forum = ({ course }) => {
       setNewPostTitle(""); // Clear the inputs
       setNewPostBody("");
       // Optionally refetch posts or optimistically add the new post to the list
-      setPosts([...posts, { title: newPostTitle, body: newPostBody }]); // Add the new post locally
+      setPosts([{ title: newPostTitle, body: newPostBody }, ...posts]); // Bài viết mới nhất nằm đầu danh sách
     } catch (err) {
       console.error("Error submitting new post:", err);
       setError("Could not submit new post.");
@@ -131,11 +151,14 @@ const Forum = ({ course }) => {
           Thêm câu hỏi
         </Button>
       </div>
-      <Accordion className="m-3">
+      <Accordion className="m-3" onSelect={handleSelectPost}>
         {posts.length > 0 ? (
           posts.map((post, index) => (
             <Accordion.Item key={post.id} eventKey={index.toString()}>
-              <Accordion.Header>{post.title}</Accordion.Header>
+              <Accordion.Header>
+                {post.title}
+                {post.reply_count > 0 && <span className="ms-2 text-muted">({post.reply_count} trả lời)</span>}
+              </Accordion.Header>
               <Accordion.Body>
                 <p>
                   <strong>{post.body}</strong>
@@ -160,6 +183,11 @@ const Forum = ({ course }) => {
                 ) : (
                   <p>Chưa có phản hồi nào cho bài viết này.</p>
                 )}
+                {nextReplies[post.id] && (
+                  <Button variant="link" onClick={() => fetchReplies(post.id, nextReplies[post.id])}>
+                    Xem thêm câu trả lời
+                  </Button>
+                )}
                 <div className="d-flex">
                   <input
                     type="text"
@@ -182,6 +210,13 @@ const Forum = ({ course }) => {
           <p>Chưa có bài viết nào trong diễn đàn này.</p>
         )}
       </Accordion>
+      {nextPosts && (
+        <div className="text-center">
+          <Button variant="outline-primary" onClick={loadMorePosts}>
+            Xem thêm
+          </Button>
+        </div>
+      )}
 
       {/* Modal for adding a new post */}
       <Modal show={showModal} onHide={() => setShowModal(false)}>
@@ -5,6 +5,8 @@ import { endpoints, authAPIs } from "../../configs/APIs";
 const Home = () => {
     const [courses, setCourses] = useState([]);
     const [originalCourses, setOriginalCourses] = useState([]);
+    const [nextPage, setNextPage] = useState(null); // Cursor URL of the next page
+    const [originalNextPage, setOriginalNextPage] = useState(null);
     const [loading, setLoading] = useState(true);
     const [error, setError] = useState(null);
     const [searchQuery, setSearchQuery] = useState("");
@@ -20,8 +22,10 @@ const Home = () => {
             const url = query ? `${endpoints["list-course"]}?q=${query}` : endpoints["list-course"];
             const response = await api.get(url);
             setCourses(response.data.courses);
+            setNextPage(response.data.next);
             if (!query) {
                 setOriginalCourses(response.data.courses);
+                setOriginalNextPage(response.data.next);
             }
         } catch (error) {
             setError(error.message);
@@ -30,6 +34,18 @@ const Home = () => {
         }
     };
 
+    // Load the next page of courses and append it to the list
+    const loadMoreCourses = async () => {
+        try {
+            const api = authAPIs(false);
+            const response = await api.get(nextPage);
+            setCourses(prev => [...prev, ...response.data.courses]);
+            setNextPage(response.data.next);
+        } catch (error) {
+            setError(error.message);
+        }
+    };
+
     // Fetch courses when the search button is clicked
     useEffect(() => {
         setLoading(true);
@@ -51,6 +67,7 @@ const Home = () => {
         setSearchInput("");
         setSearchQuery("");
         setCourses(originalCourses);
+        setNextPage(originalNextPage);
     };
 
     // Handle selecting a course and show offcanvas
@@ -155,6 +172,13 @@ const Home = () => {
                         ))
                     )}
                 </Row>
+                {nextPage && (
+                    <div className="text-center">
+                        <Button variant="outline-primary" onClick={loadMoreCourses}>
+                            Xem thêm
+                        </Button>
+                    </div>
+                )}
             </Container>
 
             {/* Offcanvas for course details */}
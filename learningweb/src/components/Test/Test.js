@@ -3,7 +3,7 @@ import { useLocation, useParams } from "react-router-dom";
 import { Accordion, Button, Form, Spinner, Alert, Modal } from "react-bootstrap";
 import { CKEditor } from "@ckeditor/ckeditor5-react";
 import ClassicEditor from "@ckeditor/ckeditor5-build-classic";
-import { authAPIs, endpoints } from "../../configs/APIs";
+import { authAPIs, endpoints, fetchTestFull } from "../../configs/APIs";
 
 const Test = () => {
   const location = useLocation();
@@ -28,9 +28,10 @@ const Test = () => {
     setLoading(true);
     setError(null);
     try {
-      const response = await authAPIs().get(endpoints["test-question"](testId));
-      setQuestions(response.data);
-      response.data.forEach((question) => fetchAnswers(question.id));
+      // Câu hỏi và đáp án của cả bài Test trong 1 request (có ETag nên tải lại không đổi chỉ nhận 304)
+      const data = await fetchTestFull(testId);
+      setQuestions(data.questions);
+      setAnswers(Object.fromEntries(data.questions.map((question) => [question.id, question.answers])));
     } catch (err) {
       console.error("Error fetching questions:", err);
       setError("Unable to load questions.");
@@ -39,19 +40,6 @@ const Test = () => {
     }
   }, [testId]);
 
-  const fetchAnswers = async (questionId) => {
-    try {
-      const response = await authAPIs().get(
-        endpoints["question-answer"](questionId)
-      );
-      console.log(`Answers for question ${questionId}:`, response.data);
-      setAnswers((prev) => ({ ...prev, [questionId]: response.data.answers }));
-    } catch (err) {
-      console.error(`Error fetching answers for question ${questionId}:`, err);
-      setAnswers((prev) => ({ ...prev, [questionId]: [] }));
-    }
-  };
-
   useEffect(() => {
     if (testId) {
       fetchQuestions();
@@ -1,6 +1,6 @@
 import React, { useEffect, useState } from "react";
 import { Spinner, Alert, Button } from "react-bootstrap";
-import { authAPIs, endpoints } from "../../configs/APIs";
+import { authAPIs, endpoints, fetchTestFull } from "../../configs/APIs";
 import ClassicEditor from "@ckeditor/ckeditor5-build-classic";
 import { CKEditor } from "@ckeditor/ckeditor5-react";
 
@@ -21,10 +21,29 @@ const TestShow = ({ test }) => {
       setQuestionsError(null);
 
       try {
-        const response = await authAPIs().get(
-          endpoints["test-question"](test.id)
+        // Câu hỏi và lựa chọn của cả bài Test trong 1 request thay vì 1 request cho mỗi câu hỏi
+        const data = await fetchTestFull(test.id);
+        // Bài làm tự luận là của từng học sinh nên vẫn tải riêng cho câu tự luận
+        const loadedQuestions = await Promise.all(
+          data.questions.map(async (question) => {
+            if (question.type !== 1) return question;
+            try {
+              const response = await authAPIs().get(
+                endpoints["get-essay-answer"](question.id)
+              );
+              return {
+                ...question,
+                existingAnswer: response.data.answer_text || null,
+                teacherComments: response.data.teacher_comments || null,
+                score: response.data.score || null,
+              };
+            } catch (error) {
+              console.error(`Error fetching essay answer for question ${question.id}:`, error);
+              return { ...question, existingAnswer: null, teacherComments: null, score: null };
+            }
+          })
         );
-        setQuestions(response.data);
+        setQuestions(loadedQuestions);
       } catch (error) {
         console.error("Error fetching questions:", error);
         setQuestionsError("Could not load questions.");
@@ -39,46 +58,8 @@ const TestShow = ({ test }) => {
   }, [test]);
 
   useEffect(() => {
-    const fetchAnswersAndScore = async () => {
-      const updatedQuestions = await Promise.all(
-        questions.map(async (question) => {
-          try {
-            if (question.type === 0) {
-              const response = await authAPIs().get(
-                endpoints["question-answer"](question.id)
-              );
-              return {
-                ...question,
-                answers: response.data.answers,
-                result: response.data.result,
-              };
-            } else if (question.type === 1) {
-              const response = await authAPIs().get(
-                endpoints["get-essay-answer"](question.id)
-              );
-              return {
-                ...question,
-                existingAnswer: response.data.answer_text || null,
-                teacherComments: response.data.teacher_comments || null,
-                score: response.data.score || null,
-              };
-            }
-          } catch (error) {
-            console.error(`Error fetching answers for question ${question.id}:`, error);
-            return {
-              ...question,
-              answers: [],
-              result: "no correct answer",
-              existingAnswer: null,
-              teacherComments: null,
-              score: null,
-            };
-          }
-        })
-      );
-      setQuestions(updatedQuestions);
-
-      // Fetch score of the student
+    // Fetch score of the student
+    const fetchScore = async () => {
       try {
         const scoreResponse = await authAPIs().get(endpoints.score(test.id));
         setScore(scoreResponse.data.score);
@@ -87,10 +68,10 @@ const TestShow = ({ test }) => {
       }
     };
 
-    if (questions.length) {
-      fetchAnswersAndScore();
+    if (test) {
+      fetchScore();
     }
-  }, [questions.length, test.id]);
+  }, [test]);
 
   const handleRadioSelectionChange = (questionId, answerId) => {
     setUserSelections((prev) => ({
@@ -130,27 +111,25 @@ const TestShow = ({ test }) => {
     setSubmissionMessage(null); // Reset submission message
   
     try {
-      for (const question of questions) {
-        if (question.type === 0) {
-          const selectedAnswers = userSelections[question.id];
-          
-          if (selectedAnswers && selectedAnswers.length > 0) {
-            try {
-              // Stringify selectedAnswers before sending
-              const payload = {
-                question: question.id,
-                selected_answer: JSON.stringify(selectedAnswers),
-              };
-  
-              // Post the selected answers to the 'choice-answer' endpoint
-              await authAPIs().post(endpoints["choice-awnswer"], payload);
-            } catch (error) {
-              console.error(`Error submitting answers for question ${question.id}:`, error);
-              setSubmissionError("An error occurred during submission.");
-            }
-          }
+      // Submit all multiple-choice selections of the test in a single request
+      const choiceAnswers = questions
+        .filter((question) => question.type === 0)
+        .filter((question) => userSelections[question.id] && userSelections[question.id].length > 0)
+        .map((question) => ({
+          question: question.id,
+          selected_answer: userSelections[question.id],
+        }));
+
+      if (choiceAnswers.length > 0) {
+        try {
+          await authAPIs().post(endpoints["submit-test"](test.id), { answers: choiceAnswers });
+        } catch (error) {
+          console.error("Error submitting answers:", error);
+          setSubmissionError("An error occurred during submission.");
         }
-  
+      }
+
+      for (const question of questions) {
         if (question.type === 1) {
           // Handle essay questions
           const essayAnswer = essayAnswers[question.id];
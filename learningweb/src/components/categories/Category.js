@@ -7,6 +7,7 @@ const Category = () => {
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
   const [selectedLetter, setSelectedLetter] = useState('');
+  const [courseCounts, setCourseCounts] = useState({}); // category id -> number of courses
 
   useEffect(() => {
     const fetchCategories = async () => {
@@ -23,6 +24,24 @@ const Category = () => {
     fetchCategories();
   }, [selectedLetter]);
 
+  // Course counts per category come from the catalog facets (facets=all: every category, not only the top ones)
+  useEffect(() => {
+    const fetchCourseCounts = async () => {
+      try {
+        const response = await authAPIs().get(`${endpoints["list-course"]}?facets=all&page_size=1`);
+        const counts = {};
+        response.data.facets.categories.forEach((facet) => {
+          counts[facet.id] = facet.count;
+        });
+        setCourseCounts(counts);
+      } catch (err) {
+        // Counts are optional, the category list still works without them
+      }
+    };
+
+    fetchCourseCounts();
+  }, []);
+
   // Scroll to top function
   const scrollToTop = () => {
     window.scrollTo({
@@ -74,7 +93,7 @@ const Category = () => {
               <ul>
                 {categories.filter(category => category.name[0].toUpperCase() === letter).map((category) => (
                   <li key={category.id} className="ml-4 text-base">
-                    {category.name}
+                    {category.name} ({courseCounts[category.id] || 0})
                   </li>
                 ))}
               </ul>
@@ -1,4 +1,4 @@
-import React, { useState } from "react";
+import React, { useEffect, useState } from "react";
 import { Link } from "react-router-dom";
 import Nav from "react-bootstrap/Nav";
 import Dropdown from "react-bootstrap/Dropdown";
@@ -6,12 +6,15 @@ import Modal from "react-bootstrap/Modal";
 import Button from "react-bootstrap/Button";
 import Form from "react-bootstrap/Form";
 import Offcanvas from "react-bootstrap/Offcanvas"; // Import Offcanvas
+import Badge from "react-bootstrap/Badge";
 import { useUser } from "../Context/UserContext";
 import { authAPIs, endpoints } from "../../configs/APIs";
 import { MdNotifications } from "react-icons/md"; // Import notification icon
 import Logo from "../../assets/Image/Logo.png";
 import Notification from "./Notifications"; // Import Notification component
 
+const UNREAD_COUNT_INTERVAL = 60000;
+
 const Header = () => {
   const { user, loading, logout } = useUser();
   const [showDropdown, setShowDropdown] = useState(false);
@@ -24,6 +27,23 @@ const Header = () => {
   const [updating, setUpdating] = useState(false);
   const [error, setError] = useState(null);
   const [showOffcanvas, setShowOffcanvas] = useState(false); // State for offcanvas
+  const [unreadCount, setUnreadCount] = useState(0);
+
+  // Số thông báo chưa đọc cho badge; server trả ETag nên trình duyệt revalidate và nhận 304 khi không đổi
+  useEffect(() => {
+    if (!user) return;
+    const fetchUnreadCount = async () => {
+      try {
+        const response = await authAPIs().get(endpoints["notification-unread-count"]);
+        setUnreadCount(response.data.unread_count);
+      } catch (error) {
+        console.error("Failed to fetch unread notification count:", error);
+      }
+    };
+    fetchUnreadCount();
+    const timer = setInterval(fetchUnreadCount, UNREAD_COUNT_INTERVAL);
+    return () => clearInterval(timer);
+  }, [user, showOffcanvas]);
 
   const handleInputChange = (e) => {
     const { name, value } = e.target;
@@ -106,6 +126,9 @@ const Header = () => {
                   title="Thông báo"
                   onClick={() => setShowOffcanvas(true)} // Open offcanvas on click
                 />
+                {unreadCount > 0 && (
+                  <Badge pill bg="danger" className="mr-3">{unreadCount}</Badge>
+                )}
 
                 <Dropdown show={showDropdown} onClick={() => setShowDropdown(!showDropdown)}>
                   <Dropdown.Toggle
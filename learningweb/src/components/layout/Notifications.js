@@ -1,9 +1,13 @@
 import React, { useState, useEffect } from "react";
+import cookie from "react-cookies";
 import { useUser } from "../Context/UserContext";
-import { authAPIs, endpoints } from "../../configs/APIs";
+import { authAPIs, endpoints, BASE_URL } from "../../configs/APIs";
 import Badge from "react-bootstrap/Badge"; // Import Badge component
 import Stack from "react-bootstrap/Stack"; // Import Stack for layout
 
+const POLL_INTERVAL = 30000; // Chỉ gọi lại /notifications/ định kỳ khi không mở được kết nối stream
+const MAX_NOTIFICATIONS = 10;
+
 const Notification = () => {
   const { user } = useUser();
   const [notifications, setNotifications] = useState([]);
@@ -23,9 +27,39 @@ const Notification = () => {
       }
     };
 
-    if (user) {
-      fetchNotifications();
+    if (!user) return;
+    fetchNotifications();
+
+    // Server đẩy thông báo mới qua Server-Sent Events; EventSource tự kết nối lại khi mất mạng
+    let pollTimer = null;
+    let source = null;
+    const startPolling = () => {
+      if (!pollTimer) pollTimer = setInterval(fetchNotifications, POLL_INTERVAL);
+    };
+
+    if (window.EventSource) {
+      const token = cookie.load("authToken");
+      source = new EventSource(
+        `${BASE_URL}${endpoints["notification-stream"]}?access_token=${encodeURIComponent(token)}`
+      );
+      source.onmessage = (event) => {
+        const notification = JSON.parse(event.data);
+        setNotifications((prev) =>
+          [notification, ...prev.filter((item) => item.id !== notification.id)].slice(0, MAX_NOTIFICATIONS)
+        );
+      };
+      source.onerror = () => {
+        // Server trả lỗi (vd. chạy WSGI) thì EventSource đóng hẳn: quay về polling
+        if (source.readyState === EventSource.CLOSED) startPolling();
+      };
+    } else {
+      startPolling();
     }
+
+    return () => {
+      if (source) source.close();
+      if (pollTimer) clearInterval(pollTimer);
+    };
   }, [user]);
 
   const markAsRead = async (notificationId) => {
@@ -1,7 +1,7 @@
 import axios from "axios";
 import cookie from "react-cookies";
 
-const BASE_URL = "http://127.0.0.1:8000/";
+export const BASE_URL = "http://127.0.0.1:8000/";
 
 export const endpoints = {
     "category": "/categories",
@@ -17,15 +17,21 @@ export const endpoints = {
     "Module-list": (courseId) => `/courses/${courseId}/module/`,
     "Module-test": (moduleId) => `/modules/${moduleId}/tests/`,
     "test-question": (testId) => `/tests/${testId}/questions/`,
+    "test-full": (testId) => `/tests/${testId}/full/`,
     "question-answer": (questionId) => `/questions/${questionId}/answers/`,
     "course-member": "/user-membership-courses/",
+    "dashboard": "/me/dashboard/",
     "forum" : (courseId) => `/courses/${courseId}/forum/`,
     "forum-post" : (forumId) => `/forums/${forumId}/posts/`,
+    "forum-mark-read": (forumId) => `/forums/${forumId}/posts/mark-read/`,
     "post-reply": (postId) => `posts/${postId}/replies/`,
     "notifications" : "/notifications/",
+    "notification-stream": "notifications/stream/",
+    "notification-unread-count": "/notifications/unread-count/",
     "essay-awnswer":"/essay_answers/",
     "choice-awnswer":"/student_answers/",
     "score":(testId) => `/tests/${testId}/scores/`,
+    "submit-test": (testId) => `/tests/${testId}/submit/`,
     "get-essay-answer": (questionId) => `/essay_answers/get-student-answer/?question_id=${questionId}`,
     "course-membership": "/course-membership/",
     "join-course": "/course-membership/join/",
@@ -44,6 +50,25 @@ export const authAPIs = (includeAuth = true) => {
     });
 };
 
+// Bài Test đầy đủ (câu hỏi + lựa chọn) đã tải, theo id bài Test: { etag, data }
+const testFullCache = {};
+
+// Tải bài Test trong 1 request; lần sau gửi lại ETag, server trả 304 thì dùng bản đã lưu
+export const fetchTestFull = async (testId) => {
+    const cached = testFullCache[testId];
+    const response = await authAPIs().get(endpoints["test-full"](testId), {
+        headers: cached ? { "If-None-Match": cached.etag } : {},
+        validateStatus: (status) => status === 200 || (cached && status === 304),
+    });
+    if (response.status === 304) {
+        return cached.data;
+    }
+    if (response.headers.etag) {
+        testFullCache[testId] = { etag: response.headers.etag, data: response.data };
+    }
+    return response.data;
+};
+
 export default axios.create({
     baseURL: BASE_URL
 });